@@ -0,0 +1,64 @@
+# vim: set fileencoding=utf-8
+"""
+benchmarks/binary_codec.py
+
+This file compares the binary codec against the JSON marshalling path.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import json
+from pythoneda.shared.code_requests import CodeExecutionRequest, CodeRequestBinaryCodec
+from synthetic import SyntheticCodeRequest, build_execution_request
+import timeit
+
+
+def main():
+    """
+    Runs the benchmark and prints the per-operation timings of both paths.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument("-c", "--cells", type=int, default=2000)
+    parser.add_argument("-r", "--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    CodeRequestBinaryCodec.register(SyntheticCodeRequest)
+    request = build_execution_request(args.cells)
+    as_json = json.dumps(request.to_dict())
+    as_binary = CodeRequestBinaryCodec.encode(request)
+
+    scenarios = [
+        ("json encode", lambda: json.dumps(request.to_dict())),
+        ("json decode", lambda: CodeExecutionRequest.from_dict(json.loads(as_json))),
+        ("binary encode", lambda: CodeRequestBinaryCodec.encode(request)),
+        ("binary decode", lambda: CodeRequestBinaryCodec.decode(as_binary)),
+    ]
+    print(f"json: {len(as_json.encode('utf-8'))} bytes, binary: {len(as_binary)} bytes")
+    for label, operation in scenarios:
+        elapsed = min(timeit.repeat(operation, number=1, repeat=args.repeat))
+        print(f"{label:>14}: {elapsed * 1000:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,123 @@
+# vim: set fileencoding=utf-8
+"""
+benchmarks/cell_memory.py
+
+This file compares the memory footprint of regular and compact cells.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import gc
+from pythoneda.shared.code_requests import (
+    CodeCell,
+    CompactCodeCell,
+    CompactDependency,
+    Dependency,
+    MarkdownCell,
+)
+import tracemalloc
+
+
+def allocated(factory, count: int) -> int:
+    """
+    Measures the memory retained by given number of instances.
+    :param factory: Builds one instance out of its index.
+    :type factory: Callable[[int], object]
+    :param count: The number of instances.
+    :type count: int
+    :return: The retained bytes.
+    :rtype: int
+    """
+    gc.collect()
+    tracemalloc.start()
+    instances = [factory(index) for index in range(count)]
+    gc.collect()
+    result, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del instances
+    return result
+
+
+def dependency_name(index: int) -> str:
+    """
+    Builds a fresh dependency name, as parsing an archive would.
+    :param index: The instance index.
+    :type index: int
+    :return: The name.
+    :rtype: str
+    """
+    return f"package-{index % 50}"
+
+
+def dependency_version(index: int) -> str:
+    """
+    Builds a fresh dependency version, as parsing an archive would.
+    :param index: The instance index.
+    :type index: int
+    :return: The version.
+    :rtype: str
+    """
+    return f"1.{index % 5}.0"
+
+
+def dependency(klass, index: int):
+    """
+    Builds a fresh dependency of given class.
+    :param klass: The dependency class.
+    :type klass: type
+    :param index: The instance index.
+    :type index: int
+    :return: The dependency.
+    :rtype: pythoneda.shared.code_requests.Dependency
+    """
+    return klass(dependency_name(index), dependency_version(index), None)
+
+
+def main():
+    """
+    Runs the benchmark and prints the bytes per instance of each class.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument("-n", "--count", type=int, default=100000)
+    args = parser.parse_args()
+
+    contents = "print('hello')"
+
+    scenarios = [
+        ("Dependency", lambda i: dependency(Dependency, i)),
+        ("CompactDependency", lambda i: dependency(CompactDependency, i)),
+        ("MarkdownCell", lambda i: MarkdownCell(contents)),
+        ("CodeCell", lambda i: CodeCell(contents, [dependency(Dependency, i)])),
+        (
+            "CompactCodeCell",
+            lambda i: CompactCodeCell(contents, [dependency(Dependency, i)]),
+        ),
+    ]
+    for label, factory in scenarios:
+        total = allocated(factory, args.count)
+        print(f"{label:>20}: {total / args.count:8.1f} bytes/instance")
+
+
+if __name__ == "__main__":
+    main()
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,92 @@
+# vim: set fileencoding=utf-8
+"""
+benchmarks/import_time.py
+
+This file measures cold import times per scenario, and the heavy packages each loads.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+SCENARIOS = [
+    ("package", "import pythoneda.shared.code_requests"),
+    (
+        "request building",
+        "from pythoneda.shared.code_requests import CodeCell, CodeRequest",
+    ),
+    (
+        "flake generation",
+        "from pythoneda.shared.code_requests import CodeExecutionNixFlake",
+    ),
+]
+
+HEAVY_PACKAGES = ["pythoneda.shared.nix.flake", "pythoneda.shared.git"]
+
+
+def measure(statement: str) -> tuple:
+    """
+    Runs an import statement in a fresh interpreter.
+    :param statement: The statement.
+    :type statement: str
+    :return: The time it took, in seconds, and the heavy packages it imported.
+    :rtype: Tuple[float, List[str]]
+    """
+    probe = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "print(time.perf_counter() - start)\n"
+        f"print(','.join(p for p in {HEAVY_PACKAGES!r} if p in sys.modules))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", probe], capture_output=True, check=True, text=True
+    ).stdout.splitlines()
+    return float(output[0]), [aux for aux in output[1].split(",") if aux]
+
+
+def main():
+    """
+    Runs the benchmark and prints the cold import time of each scenario.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument("-r", "--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    for label, statement in SCENARIOS:
+        timings = []
+        for _ in range(args.repeat):
+            elapsed, heavy = measure(statement)
+            timings.append(elapsed)
+        print(
+            f"{label:>16}: min {min(timings) * 1000:8.3f} ms, "
+            f"median {statistics.median(timings) * 1000:8.3f} ms, "
+            f"imports {', '.join(heavy) or 'nothing heavy'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,226 @@
+# vim: set fileencoding=utf-8
+"""
+benchmarks/lifecycle.py
+
+This file measures each step of the code request lifecycle at several scales.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+from pythoneda.shared.code_requests import (
+    CodeExecutionNixFlake,
+    CodeExecutionRequest,
+    CodeRequestNixFlake,
+)
+import shutil
+import statistics
+import subprocess
+import sys
+from synthetic import build_execution_request, build_inputs, build_request
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+RESULTS_VERSION = 1
+
+
+def measure(setup: Callable, operation: Callable, repeat: int) -> Dict:
+    """
+    Times an operation, preparing its input anew before each run.
+    :param setup: Builds the input of the operation, untimed.
+    :type setup: Callable[[], object]
+    :param operation: The operation, taking such input.
+    :type operation: Callable[[object], object]
+    :param repeat: The number of runs.
+    :type repeat: int
+    :return: The minimum, median and mean times, in seconds.
+    :rtype: Dict[str, float]
+    """
+    timings = []
+    for _ in range(repeat):
+        state = setup()
+        gc.collect()
+        start = time.perf_counter()
+        operation(state)
+        timings.append(time.perf_counter() - start)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+    }
+
+
+def scenarios(folder: str) -> List:
+    """
+    Lists the steps to measure.
+    :param folder: The folder to generate flakes in.
+    :type folder: str
+    :return: The name, setup and operation of each step, whose setups take the scale.
+    :rtype: List[Tuple[str, Callable, Callable]]
+    """
+
+    def flake_of(cells):
+        request = build_request(cells)
+        target = tempfile.mkdtemp(prefix="flake-", dir=folder)
+        return CodeExecutionNixFlake(request, build_inputs(request)), target
+
+    return [
+        ("construction", lambda cells: cells, build_request),
+        (
+            "dependencies",
+            build_request,
+            lambda request: request.dependencies,
+        ),
+        (
+            "dict_round_trip",
+            build_execution_request,
+            lambda request: CodeExecutionRequest.from_dict(request.to_dict()),
+        ),
+        (
+            "generate_code",
+            flake_of,
+            lambda state: state[0].generate_code(state[1]),
+        ),
+        (
+            "generate_files",
+            flake_of,
+            lambda state: state[0].generate_files(state[1]),
+        ),
+    ]
+
+
+def default_folder() -> str:
+    """
+    Retrieves the folder to generate flakes in: a tmpfs when available.
+    :return: Such folder.
+    :rtype: str
+    """
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+def git_revision() -> str:
+    """
+    Retrieves the revision of the code being measured.
+    :return: The commit hash, or None outside a git repository.
+    :rtype: str
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List, baseline: Dict):
+    """
+    Prints how each result changed with respect to a previous run.
+    :param results: The current results.
+    :type results: List[Dict]
+    :param baseline: The contents of a previous results file.
+    :type baseline: Dict
+    """
+    previous = {
+        (entry["name"], entry["scale"]): entry["min"] for entry in baseline["results"]
+    }
+    for entry in results:
+        before = previous.get((entry["name"], entry["scale"]))
+        if before:
+            change = (entry["min"] - before) / before * 100
+            print(
+                f"{entry['name']:>16} {entry['scale']:>7}: {change:+7.1f}% "
+                f"({before * 1000:.3f} -> {entry['min'] * 1000:.3f} ms)"
+            )
+
+
+def main():
+    """
+    Runs the suite, prints its timings and writes them as JSON.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument(
+        "-s", "--scales", type=int, nargs="+", default=[10, 100, 1000, 10000]
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=10)
+    parser.add_argument("-o", "--output", help="the JSON file to write")
+    parser.add_argument("-b", "--baseline", help="a previous JSON file to compare to")
+    parser.add_argument("-f", "--folder", default=default_folder())
+    parser.add_argument("--no-template-cache", action="store_true")
+    parser.add_argument("-k", "--only", nargs="+", help="the steps to measure")
+    args = parser.parse_args()
+
+    if args.no_template_cache:
+        CodeRequestNixFlake.set_template_cache(None)
+    folder = tempfile.mkdtemp(prefix="pythoneda-benchmark-", dir=args.folder)
+    results = []
+    try:
+        for name, setup, operation in scenarios(folder):
+            if args.only and name not in args.only:
+                continue
+            for scale in args.scales:
+                timings = measure(lambda: setup(scale), operation, args.repeat)
+                results.append({"name": name, "scale": scale, **timings})
+                print(
+                    f"{name:>16} {scale:>7}: {timings['min'] * 1000:10.3f} ms min, "
+                    f"{timings['median'] * 1000:10.3f} ms median"
+                )
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    if args.baseline:
+        with open(args.baseline, "r") as baseline_file:
+            compare(results, json.load(baseline_file))
+    if args.output:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with open(args.output, "w") as output_file:
+            json.dump(
+                {
+                    "version": RESULTS_VERSION,
+                    "timestamp": now.isoformat(),
+                    "revision": git_revision(),
+                    "python": sys.version,
+                    "platform": platform.platform(),
+                    "repeat": args.repeat,
+                    "folder": args.folder,
+                    "template_cache": not args.no_template_cache,
+                    "results": results,
+                },
+                output_file,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
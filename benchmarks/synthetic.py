@@ -0,0 +1,141 @@
+# vim: set fileencoding=utf-8
+"""
+benchmarks/synthetic.py
+
+This file provides synthetic code requests for the benchmarks.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from pythoneda.shared.code_requests import (
+    CodeExecutionRequest,
+    CodeRequest,
+    CodeRequestNixFlakeSpec,
+    Dependency,
+    PythonedaDependency,
+)
+from pythoneda.shared.nix.flake import NixFlake
+from typing import List
+
+
+class SyntheticCodeRequest(CodeRequest):
+    """
+    A code request with synthetic contents.
+
+    Class name: SyntheticCodeRequest
+
+    Responsibilities:
+        - Provides the minimal concrete CodeRequest the benchmarks need.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeRequest
+    """
+
+    @property
+    def nix_flake_spec(self):
+        """
+        Retrieves the specification for the Nix flake.
+        :return: Such specification.
+        :rtype: pythoneda.shared.code_requests.CodeRequestNixFlakeSpec
+        """
+        return CodeRequestNixFlakeSpec(self, "synthetic")
+
+    def write(self, file):
+        """
+        Writes the code request to a file.
+        :param file: The file to write.
+        :type file: File
+        """
+        pass
+
+
+def build_request(
+    cells: int, linesPerCell: int = 5, distinctDependencies: int = 50
+) -> CodeRequest:
+    """
+    Builds a request alternating markdown and code cells, whose dependencies
+    repeat as they do in real notebooks.
+    :param cells: The number of cells.
+    :type cells: int
+    :param linesPerCell: The number of lines of each cell.
+    :type linesPerCell: int
+    :param distinctDependencies: The number of distinct dependencies across cells.
+    :type distinctDependencies: int
+    :return: The request.
+    :rtype: pythoneda.shared.code_requests.CodeRequest
+    """
+    result = SyntheticCodeRequest()
+    for index in range(cells // 2):
+        text = [f"Explanation {line} of step {index}." for line in range(linesPerCell)]
+        text[0] = f"## Step {index}"
+        result.append_markdown("\n".join(text))
+        code = [f"value_{index}_{line} = {line}" for line in range(linesPerCell)]
+        code[-1] = f"print(value_{index}_0)"
+        package = index % distinctDependencies
+        result.append_code(
+            "\n".join(code),
+            [
+                Dependency(
+                    f"package-{package}", f"1.{package % 5}.0", "github:nixos/nixpkgs"
+                ),
+                PythonedaDependency("pythoneda-shared-banner", "0.0.1"),
+            ],
+        )
+    return result
+
+
+def build_execution_request(cells: int) -> CodeExecutionRequest:
+    """
+    Builds an execution request wrapping a synthetic request.
+    :param cells: The number of cells.
+    :type cells: int
+    :return: The execution request.
+    :rtype: pythoneda.shared.code_requests.CodeExecutionRequest
+    """
+    return CodeExecutionRequest(build_request(cells))
+
+
+def build_inputs(request: CodeRequest) -> List[NixFlake]:
+    """
+    Builds the flake inputs of given request, as a resolver would.
+    :param request: The request.
+    :type request: pythoneda.shared.code_requests.CodeRequest
+    :return: The inputs.
+    :rtype: List[pythoneda.shared.nix.flake.NixFlake]
+    """
+    return [
+        NixFlake(
+            dependency.name,
+            dependency.version,
+            dependency.url,
+            [],
+            "synthetic",
+            f"Synthetic {dependency.name}",
+            "https://github.com/pythoneda-shared-code-requests/shared",
+            None,
+            [],
+            2023,
+            "rydnr",
+        )
+        for dependency in request.dependencies
+    ]
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -21,16 +21,85 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 __path__ = __import__('pkgutil').extend_path(__path__, __name__)
 
-from .cell import Cell
-from .code_cell import CodeCell
-from .markdown_cell import MarkdownCell
-from .dependency import Dependency
-from .pythoneda_dependency import PythonedaDependency
-from .code_request import CodeRequest
-from .code_request_nix_flake import CodeRequestNixFlake
-from .code_execution_request import CodeExecutionRequest
-from .code_request_nix_flake_spec import CodeRequestNixFlakeSpec
-from .code_execution_nix_flake import CodeExecutionNixFlake
+import importlib
+
+# class name -> module declaring it, imported the first time it's accessed, so
+# that building requests doesn't pull in the Nix flake and git machinery
+_LAZY_ATTRIBUTES = {
+    "Instrumentation": "instrumentation",
+    "TimingInstrumentation": "timing_instrumentation",
+    "Cell": "cell",
+    "CodeCell": "code_cell",
+    "MarkdownCell": "markdown_cell",
+    "Dependency": "dependency",
+    "PythonedaDependency": "pythoneda_dependency",
+    "CompactCell": "compact_cell",
+    "CompactCodeCell": "compact_code_cell",
+    "CompactDependency": "compact_dependency",
+    "CompactPythonedaDependency": "compact_pythoneda_dependency",
+    "CellDataflow": "cell_dataflow",
+    "ImportScanner": "import_scanner",
+    "LazyCellList": "lazy_cell_list",
+    "MappedCell": "mapped_cell",
+    "MappedCodeCell": "mapped_code_cell",
+    "MappedMarkdownCell": "mapped_markdown_cell",
+    "MappedCellStore": "mapped_cell_store",
+    "CodeRequest": "code_request",
+    "NixFlakeTemplateCache": "nix_flake_template_cache",
+    "CodeRequestNixFlake": "code_request_nix_flake",
+    "CodeExecutionRequest": "code_execution_request",
+    "CodeRequestNixFlakeSpec": "code_request_nix_flake_spec",
+    "CodeExecutionCheckpoints": "code_execution_checkpoints",
+    "CodeExecutionMemo": "code_execution_memo",
+    "CodeExecutionScheduler": "code_execution_scheduler",
+    "CodeExecutionNixFlake": "code_execution_nix_flake",
+    "CodeExecutionNixFlakeCache": "code_execution_nix_flake_cache",
+    "CodeExecutionBatchResult": "code_execution_batch_result",
+    "GitAddBatch": "git_add_batch",
+    "CodeExecutionBatchBuilder": "code_execution_batch_builder",
+    "CellOutput": "cell_output",
+    "CodeExecutionError": "code_execution_error",
+    "DependencyResolver": "dependency_resolver",
+    "DependencyEnvironmentPool": "dependency_environment_pool",
+    "CodeExecutionKernel": "code_execution_kernel",
+    "CodeExecutionKernelPool": "code_execution_kernel_pool",
+    "CodeExecutionEngine": "code_execution_engine",
+    "CodeExecutionFlight": "code_execution_flight",
+    "CodeExecutionCoalescer": "code_execution_coalescer",
+    "NotebookConverter": "notebook_converter",
+    "BinaryPacker": "binary_packer",
+    "CodeRequestBinaryCodec": "code_request_binary_codec",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name: str):
+    """
+    Imports the module declaring given attribute, on first access.
+    :param name: The attribute name.
+    :type name: str
+    :return: Its value.
+    :rtype: Any
+    """
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    result = getattr(importlib.import_module(f".{module}", __name__), name)
+    # later accesses don't go through this function
+    globals()[name] = result
+    return result
+
+
+def __dir__():
+    """
+    Lists the attributes of the package, including the ones not imported yet.
+    :return: Such attributes.
+    :rtype: List[str]
+    """
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+
 # vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
 # Local Variables:
 # mode: python
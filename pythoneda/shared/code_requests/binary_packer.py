@@ -0,0 +1,278 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/binary_packer.py
+
+This file declares the BinaryPacker class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import struct
+
+
+class BinaryPacker:
+    """
+    Pure-Python implementation of the MessagePack subset used by the binary codec.
+
+    Class name: BinaryPacker
+
+    Responsibilities:
+        - Packs None, booleans, integers, floats, strings, bytes, lists and dicts.
+        - Unpacks what it packs, and what any MessagePack library packs for those types.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeRequestBinaryCodec
+    """
+
+    _FIXED = {
+        0xCA: ">f",
+        0xCB: ">d",
+        0xCC: ">B",
+        0xCD: ">H",
+        0xCE: ">I",
+        0xCF: ">Q",
+        0xD0: ">b",
+        0xD1: ">h",
+        0xD2: ">i",
+        0xD3: ">q",
+    }
+
+    _SIZED = {
+        0xC4: ("bin", ">B"),
+        0xC5: ("bin", ">H"),
+        0xC6: ("bin", ">I"),
+        0xD9: ("str", ">B"),
+        0xDA: ("str", ">H"),
+        0xDB: ("str", ">I"),
+        0xDC: ("array", ">H"),
+        0xDD: ("array", ">I"),
+        0xDE: ("map", ">H"),
+        0xDF: ("map", ">I"),
+    }
+
+    @classmethod
+    def pack(cls, value) -> bytes:
+        """
+        Packs given value.
+        :param value: The value.
+        :type value: object
+        :return: The MessagePack bytes.
+        :rtype: bytes
+        """
+        buffer = bytearray()
+        cls._pack(value, buffer)
+        return bytes(buffer)
+
+    @classmethod
+    def _pack(cls, value, buffer: bytearray):
+        """
+        Appends the MessagePack encoding of given value to given buffer.
+        :param value: The value.
+        :type value: object
+        :param buffer: The buffer.
+        :type buffer: bytearray
+        """
+        if value is None:
+            buffer.append(0xC0)
+        elif value is True:
+            buffer.append(0xC3)
+        elif value is False:
+            buffer.append(0xC2)
+        elif isinstance(value, str):
+            data = value.encode("utf-8")
+            size = len(data)
+            if size < 32:
+                buffer.append(0xA0 | size)
+            elif size < 0x100:
+                buffer += struct.pack(">BB", 0xD9, size)
+            elif size < 0x10000:
+                buffer += struct.pack(">BH", 0xDA, size)
+            else:
+                buffer += struct.pack(">BI", 0xDB, size)
+            buffer += data
+        elif isinstance(value, int):
+            if 0 <= value < 0x80:
+                buffer.append(value)
+            elif -32 <= value < 0:
+                buffer.append(value & 0xFF)
+            elif -(1 << 63) <= value < (1 << 63):
+                buffer += struct.pack(">Bq", 0xD3, value)
+            elif 0 <= value < (1 << 64):
+                buffer += struct.pack(">BQ", 0xCF, value)
+            else:
+                raise OverflowError(f"Integer out of range: {value}")
+        elif isinstance(value, float):
+            buffer += struct.pack(">Bd", 0xCB, value)
+        elif isinstance(value, (list, tuple)):
+            cls._pack_header(len(value), 0x90, 0xDC, buffer)
+            for item in value:
+                cls._pack(item, buffer)
+        elif isinstance(value, dict):
+            cls._pack_header(len(value), 0x80, 0xDE, buffer)
+            for key, item in value.items():
+                cls._pack(key, buffer)
+                cls._pack(item, buffer)
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            data = bytes(value)
+            buffer += struct.pack(">BI", 0xC6, len(data))
+            buffer += data
+        else:
+            raise TypeError(f"Cannot pack {type(value).__name__}")
+
+    @classmethod
+    def _pack_header(cls, size: int, fix: int, wide: int, buffer: bytearray):
+        """
+        Appends the header of an array or map.
+        :param size: The number of items.
+        :type size: int
+        :param fix: The marker of the compact form.
+        :type fix: int
+        :param wide: The marker of the 16-bit form; the 32-bit one follows it.
+        :type wide: int
+        :param buffer: The buffer.
+        :type buffer: bytearray
+        """
+        if size < 16:
+            buffer.append(fix | size)
+        elif size < 0x10000:
+            buffer += struct.pack(">BH", wide, size)
+        else:
+            buffer += struct.pack(">BI", wide + 1, size)
+
+    @classmethod
+    def unpack(cls, data: bytes):
+        """
+        Unpacks given bytes.
+        :param data: The MessagePack bytes.
+        :type data: bytes
+        :return: The value.
+        :rtype: object
+        """
+        view = memoryview(data)
+        result, offset = cls._unpack(view, 0)
+        if offset != len(view):
+            raise ValueError(f"Trailing data at offset {offset}")
+        return result
+
+    @classmethod
+    def _unpack(cls, view: memoryview, offset: int):
+        """
+        Unpacks the value at given offset.
+        :param view: The data.
+        :type view: memoryview
+        :param offset: The offset.
+        :type offset: int
+        :return: The value, and the offset right after it.
+        :rtype: Tuple[object, int]
+        """
+        marker = view[offset]
+        offset += 1
+        if marker < 0x80:
+            return marker, offset
+        if marker >= 0xE0:
+            return marker - 0x100, offset
+        if 0xA0 <= marker <= 0xBF:
+            return cls._str(view, offset, marker & 0x1F)
+        if 0x90 <= marker <= 0x9F:
+            return cls._array(view, offset, marker & 0x0F)
+        if 0x80 <= marker <= 0x8F:
+            return cls._map(view, offset, marker & 0x0F)
+        if marker == 0xC0:
+            return None, offset
+        if marker == 0xC2:
+            return False, offset
+        if marker == 0xC3:
+            return True, offset
+        fixed = cls._FIXED.get(marker)
+        if fixed is not None:
+            size = struct.calcsize(fixed)
+            return struct.unpack_from(fixed, view, offset)[0], offset + size
+        sized = cls._SIZED.get(marker)
+        if sized is None:
+            raise ValueError(f"Unsupported marker 0x{marker:02x} at {offset - 1}")
+        kind, fmt = sized
+        size = struct.unpack_from(fmt, view, offset)[0]
+        offset += struct.calcsize(fmt)
+        if kind == "str":
+            return cls._str(view, offset, size)
+        if kind == "bin":
+            return bytes(view[offset : offset + size]), offset + size
+        if kind == "array":
+            return cls._array(view, offset, size)
+        return cls._map(view, offset, size)
+
+    @classmethod
+    def _str(cls, view: memoryview, offset: int, size: int):
+        """
+        Decodes a string.
+        :param view: The data.
+        :type view: memoryview
+        :param offset: The offset of its first byte.
+        :type offset: int
+        :param size: Its length in bytes.
+        :type size: int
+        :return: The string, and the offset right after it.
+        :rtype: Tuple[str, int]
+        """
+        end = offset + size
+        return str(view[offset:end], "utf-8"), end
+
+    @classmethod
+    def _array(cls, view: memoryview, offset: int, size: int):
+        """
+        Decodes an array.
+        :param view: The data.
+        :type view: memoryview
+        :param offset: The offset of its first item.
+        :type offset: int
+        :param size: The number of items.
+        :type size: int
+        :return: The list, and the offset right after it.
+        :rtype: Tuple[list, int]
+        """
+        result = []
+        for _ in range(size):
+            item, offset = cls._unpack(view, offset)
+            result.append(item)
+        return result, offset
+
+    @classmethod
+    def _map(cls, view: memoryview, offset: int, size: int):
+        """
+        Decodes a map.
+        :param view: The data.
+        :type view: memoryview
+        :param offset: The offset of its first key.
+        :type offset: int
+        :param size: The number of entries.
+        :type size: int
+        :return: The dict, and the offset right after it.
+        :rtype: Tuple[dict, int]
+        """
+        result = {}
+        for _ in range(size):
+            key, offset = cls._unpack(view, offset)
+            result[key], offset = cls._unpack(view, offset)
+        return result, offset
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
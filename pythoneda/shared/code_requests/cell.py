@@ -20,8 +20,9 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 import abc
+import hashlib
 from pythoneda.shared import primary_key_attribute, ValueObject
-from typing import List
+from typing import Iterator, List
 
 
 class Cell(ValueObject, abc.ABC):
@@ -32,11 +33,14 @@ class Cell(ValueObject, abc.ABC):
 
     Responsibilities:
         - Represents any fragment inside a CodeRequest.
+        - Provides a digest of its contents and dependencies.
 
     Collaborators:
         - None
     """
 
+    _DIGEST_KIND = "cell"
+
     def __init__(self, contents: str):
         """
         Creates a new Cell instance.
@@ -45,6 +49,7 @@ class Cell(ValueObject, abc.ABC):
         """
         super().__init__()
         self._contents = contents
+        self._digest = None
 
     @classmethod
     def empty(cls):
@@ -65,6 +70,43 @@ class Cell(ValueObject, abc.ABC):
         """
         return self._contents
 
+    def iter_lines(self) -> Iterator[str]:
+        """
+        Iterates over the lines of the cell contents, as str.splitlines() would split them.
+        :return: An iterator over such lines.
+        :rtype: Iterator[str]
+        """
+        return iter(self.contents.splitlines())
+
+    def encoded_contents(self):
+        """
+        Retrieves the cell contents, encoded as UTF-8.
+        :return: The encoded contents.
+        :rtype: bytes
+        """
+        return self.contents.encode("utf-8")
+
+    def digest(self) -> str:
+        """
+        Retrieves the digest of the kind, contents and dependencies of the
+        cell, computed once. Compact and mapped cells share the digest of
+        their in-memory counterparts, and mapped cells are hashed without
+        decoding them.
+        :return: The hex digest.
+        :rtype: str
+        """
+        if self._digest is None:
+            contents = self.encoded_contents()
+            dependencies = self.dependencies
+            digest = hashlib.sha256(f"{self._DIGEST_KIND}\0".encode("utf-8"))
+            digest.update(len(contents).to_bytes(8, "big"))
+            digest.update(contents)
+            digest.update(len(dependencies).to_bytes(8, "big"))
+            for dependency in dependencies:
+                digest.update(dependency.digest().encode("ascii"))
+            self._digest = digest.hexdigest()
+        return self._digest
+
     @property
     def dependencies(self) -> List:
         """
@@ -0,0 +1,715 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/cell_dataflow.py
+
+This file declares the CellDataflow class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .code_cell import CodeCell
+import ast
+import builtins
+import functools
+from typing import Dict, FrozenSet, List, Tuple
+
+
+class CellDataflow:
+    """
+    The global names a code cell binds, reads and mutates, and the cells it
+    must therefore run after.
+
+    Class name: CellDataflow
+
+    Responsibilities:
+        - Finds the global names a cell binds, reads and mutates, right away and when the functions it defines get called.
+        - Flags cells whose effects cannot be told statically, such as exec() or star imports.
+        - Orders each cell after the earlier ones it conflicts with.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeExecutionNixFlake
+    """
+
+    _BARRIER_CALLS = frozenset(["exec", "eval", "globals", "locals", "vars"])
+
+    # builtins that neither change their arguments nor depend on the process
+    _PURE_CALLS = frozenset(
+        [
+            "abs",
+            "bool",
+            "float",
+            "format",
+            "hash",
+            "id",
+            "int",
+            "isinstance",
+            "issubclass",
+            "len",
+            "print",
+            "repr",
+            "round",
+            "str",
+            "type",
+        ]
+    )
+
+    # builtin functions that don't depend on, nor change, the state of the
+    # process; builtin types don't either
+    _PROCESS_FREE_CALLS = _PURE_CALLS | frozenset(
+        [
+            "all",
+            "any",
+            "ascii",
+            "bin",
+            "callable",
+            "chr",
+            "delattr",
+            "dir",
+            "divmod",
+            "getattr",
+            "hasattr",
+            "hex",
+            "iter",
+            "max",
+            "min",
+            "next",
+            "oct",
+            "ord",
+            "pow",
+            "setattr",
+            "sorted",
+            "sum",
+        ]
+    )
+
+    # modules whose functions change the state of the whole process, such as
+    # the working directory or the import path
+    _PROCESS_MODULES = frozenset(
+        [
+            "atexit",
+            "builtins",
+            "gc",
+            "importlib",
+            "locale",
+            "logging",
+            "os",
+            "resource",
+            "signal",
+            "site",
+            "sys",
+            "warnings",
+        ]
+    )
+
+    # the pseudo-name standing for the state of the process, such as files,
+    # which imports depend on, and builtins such as open() change
+    PROCESS_STATE = "<process>"
+
+    _SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+
+    def __init__(
+        self,
+        binds: FrozenSet[str],
+        imports: FrozenSet[Tuple[str, str]],
+        aliases: FrozenSet[Tuple[str, str]],
+        reads: FrozenSet[str],
+        mutates: FrozenSet[str],
+        calls: FrozenSet[str],
+        callees: FrozenSet[str],
+        barrier: bool,
+        deferred=None,
+    ):
+        """
+        Creates a new CellDataflow instance.
+        :param binds: The global names the cell binds.
+        :type binds: FrozenSet[str]
+        :param imports: The global names the cell binds through imports, with what they import.
+        :type imports: FrozenSet[Tuple[str, str]]
+        :param aliases: The global names the cell binds to objects other global names refer to, with such names.
+        :type aliases: FrozenSet[Tuple[str, str]]
+        :param reads: The names the cell reads.
+        :type reads: FrozenSet[str]
+        :param mutates: The names whose objects the cell changes, through attributes or items, or by passing them to functions.
+        :type mutates: FrozenSet[str]
+        :param calls: The names whose methods the cell calls.
+        :type calls: FrozenSet[str]
+        :param callees: The names the cell calls as functions.
+        :type callees: FrozenSet[str]
+        :param barrier: Whether the cell must run after all previous cells, and before all following ones.
+        :type barrier: bool
+        :param deferred: What the functions and classes the cell defines do once called, if anything.
+        :type deferred: pythoneda.shared.code_requests.CellDataflow
+        """
+        super().__init__()
+        self._binds = binds
+        self._imports = imports
+        self._aliases = aliases
+        self._reads = reads
+        self._mutates = mutates
+        self._calls = calls
+        self._callees = callees
+        self._barrier = barrier
+        self._deferred = deferred
+
+    @property
+    def binds(self) -> FrozenSet[str]:
+        """
+        Retrieves the global names the cell binds.
+        :return: Such names.
+        :rtype: FrozenSet[str]
+        """
+        return self._binds
+
+    @property
+    def imports(self) -> FrozenSet[Tuple[str, str]]:
+        """
+        Retrieves the global names the cell binds through imports, with what they import.
+        :return: Such names and imported modules or members.
+        :rtype: FrozenSet[Tuple[str, str]]
+        """
+        return self._imports
+
+    @property
+    def aliases(self) -> FrozenSet[Tuple[str, str]]:
+        """
+        Retrieves the global names the cell binds to objects other global names refer to, with such names.
+        :return: Such pairs of names.
+        :rtype: FrozenSet[Tuple[str, str]]
+        """
+        return self._aliases
+
+    @property
+    def reads(self) -> FrozenSet[str]:
+        """
+        Retrieves the names the cell reads.
+        :return: Such names.
+        :rtype: FrozenSet[str]
+        """
+        return self._reads
+
+    @property
+    def mutates(self) -> FrozenSet[str]:
+        """
+        Retrieves the names whose objects the cell changes, through attributes or items, or by passing them to functions.
+        :return: Such names.
+        :rtype: FrozenSet[str]
+        """
+        return self._mutates
+
+    @property
+    def calls(self) -> FrozenSet[str]:
+        """
+        Retrieves the names whose methods the cell calls.
+        :return: Such names.
+        :rtype: FrozenSet[str]
+        """
+        return self._calls
+
+    @property
+    def callees(self) -> FrozenSet[str]:
+        """
+        Retrieves the names the cell calls as functions.
+        :return: Such names.
+        :rtype: FrozenSet[str]
+        """
+        return self._callees
+
+    @property
+    def barrier(self) -> bool:
+        """
+        Retrieves whether the cell must run after all previous cells, and before all following ones.
+        :return: Such condition.
+        :rtype: bool
+        """
+        return self._barrier
+
+    @property
+    def deferred(self):
+        """
+        Retrieves what the functions and classes the cell defines do once called.
+        Its binds are the names they declare global.
+        :return: Such dataflow, or None if they do nothing, or the cell defines none.
+        :rtype: pythoneda.shared.code_requests.CellDataflow
+        """
+        return self._deferred
+
+    @classmethod
+    def dependencies(cls, cells: List) -> Dict[int, List[int]]:
+        """
+        Finds, for each code cell, the earlier code cells it must run after.
+        :param cells: The cells, in notebook order.
+        :type cells: List[pythoneda.shared.code_requests.Cell]
+        :return: The positions of such cells, per position of each code cell.
+        :rtype: Dict[int, List[int]]
+        """
+        return {index: effect[0] for index, effect in cls.effects(cells).items()}
+
+    @classmethod
+    def effects(cls, cells: List) -> Dict[int, Tuple]:
+        """
+        Finds, for each code cell, the names it may read and write, including
+        through the functions and objects of other cells it uses, and the
+        earlier code cells it must therefore run after: the ones writing a
+        name it reads or writes, the ones reading a name it writes, and any
+        barrier in between.
+        Changing an object writes every name referring to it, as far as plain
+        assignments such as "b = a" tell.
+        Calling into a module writes it, as "<module>"; calling into modules
+        such as os or sys, or builtins such as open(), writes the state of the
+        process as well.
+        :param cells: The cells, in notebook order.
+        :type cells: List[pythoneda.shared.code_requests.Cell]
+        :return: The positions of such cells, the names, and whether the cell is a barrier, per position of each code cell.
+        :rtype: Dict[int, Tuple[List[int], FrozenSet[str], FrozenSet[str], bool]]
+        """
+        flows = {
+            index: cls.of(cell.contents)
+            for index, cell in enumerate(cells)
+            if isinstance(cell, CodeCell)
+        }
+        # names always importing the same thing can be imported again in any
+        # order
+        targets = {}
+        bound = set()
+        rebound = set()
+        for flow in flows.values():
+            for name, target in flow.imports:
+                targets.setdefault(name, set()).add(target)
+            bound |= flow.binds
+            rebound |= flow.binds - {name for name, _ in flow.imports}
+        stable = {
+            name
+            for name, found in targets.items()
+            if len(found) == 1 and name not in rebound
+        }
+        modules = {
+            name: {cls._module_of(target) for target in found}
+            for name, found in targets.items()
+        }
+        result = {}
+        last_writer = {}
+        readers = {}
+        # name -> the deferred dataflows its value may run once used
+        latent = {}
+        # name -> the names that may refer to the same object
+        aliases = {}
+        last_barrier = None
+        since_barrier = []
+        for index, flow in flows.items():
+            reads = set()
+            writes = set()
+            changed = set()
+            barrier = cls._apply(flow, stable, modules, bound, reads, writes, changed)
+            # the functions and objects the cell uses run code of other cells
+            pending = list(flow.reads | flow.mutates | flow.calls | flow.callees)
+            reached = []
+            if flow.deferred is not None and flow.binds & flow.reads:
+                reached.append(flow.deferred)
+                pending.extend(cls._names_of(flow.deferred))
+            seen = set(reached)
+            while pending:
+                for aux in latent.get(pending.pop(), ()):
+                    if aux not in seen:
+                        seen.add(aux)
+                        reached.append(aux)
+                        pending.extend(cls._names_of(aux))
+            for aux in reached:
+                if cls._apply(aux, stable, modules, bound, reads, writes, changed):
+                    barrier = True
+            writes |= cls._aliased(changed, aliases)
+            if barrier:
+                after = set(since_barrier)
+                since_barrier = []
+                last_barrier = index
+            else:
+                after = set()
+                for name in reads | writes:
+                    writer = last_writer.get(name)
+                    if writer is not None:
+                        after.add(writer)
+                for name in writes:
+                    after.update(readers.pop(name, ()))
+            if last_barrier is not None and last_barrier != index:
+                after.add(last_barrier)
+            for name in writes:
+                last_writer[name] = index
+            for name in flow.binds & stable:
+                last_writer.setdefault(name, index)
+            for name in reads - writes:
+                readers.setdefault(name, []).append(index)
+            since_barrier.append(index)
+            # the values the cell binds or changes may run its own functions,
+            # and the ones it used, later on
+            carried = set(reached)
+            if flow.deferred is not None:
+                carried.add(flow.deferred)
+            for name in flow.binds - stable:
+                latent[name] = frozenset(carried)
+            for name in (flow.mutates | flow.calls) - flow.binds:
+                latent[name] = latent.get(name, frozenset()) | carried
+            for name in flow.binds - stable:
+                for aux in aliases.pop(name, ()):
+                    aliases[aux].discard(name)
+            for name, aux in flow.aliases:
+                if name != aux:
+                    aliases.setdefault(name, set()).add(aux)
+                    aliases.setdefault(aux, set()).add(name)
+            result[index] = (
+                sorted(after),
+                frozenset(reads),
+                frozenset(writes),
+                barrier,
+            )
+        return result
+
+    @classmethod
+    def _apply(
+        cls,
+        flow,
+        stable: set,
+        modules: Dict,
+        bound: set,
+        reads: set,
+        writes: set,
+        changed: set,
+    ) -> bool:
+        """
+        Adds the names given dataflow reads and writes, not following the
+        functions it calls.
+        :param flow: The dataflow.
+        :type flow: pythoneda.shared.code_requests.CellDataflow
+        :param stable: The names always importing the same thing.
+        :type stable: Set[str]
+        :param modules: The modules each name bound through imports comes from.
+        :type modules: Dict[str, Set[str]]
+        :param bound: The names any cell binds.
+        :type bound: Set[str]
+        :param reads: The names read so far.
+        :type reads: Set[str]
+        :param writes: The names written so far.
+        :type writes: Set[str]
+        :param changed: The names whose objects got changed so far.
+        :type changed: Set[str]
+        :return: Whether the dataflow is a barrier.
+        :rtype: bool
+        """
+        reads.update(flow.reads)
+        # modules never rebound are changed through "<module>" instead
+        writes.update(flow.binds - stable, flow.mutates - stable, flow.calls - stable)
+        changed.update(flow.mutates - stable, flow.calls - stable)
+        if flow.imports:
+            reads.add(cls.PROCESS_STATE)
+        for name in flow.reads | flow.mutates | flow.calls | flow.callees:
+            for module in modules.get(name, ()):
+                reads.add(f"<{module}>")
+        for name in (flow.calls | flow.callees | flow.mutates) & modules.keys():
+            reads.add(cls.PROCESS_STATE)
+            for module in modules[name]:
+                writes.add(f"<{module}>")
+                if module in cls._PROCESS_MODULES:
+                    writes.add(cls.PROCESS_STATE)
+        for name in flow.callees - bound:
+            if name not in cls._PROCESS_FREE_CALLS and not isinstance(
+                getattr(builtins, name, None), type
+            ):
+                # builtins such as open()
+                reads.add(cls.PROCESS_STATE)
+                writes.add(cls.PROCESS_STATE)
+        return flow.barrier
+
+    @classmethod
+    def _aliased(cls, names: set, aliases: Dict) -> set:
+        """
+        Retrieves the names that may refer to the objects given names refer to.
+        :param names: The names.
+        :type names: Set[str]
+        :param aliases: The names that may refer to the same object, per name.
+        :type aliases: Dict[str, Set[str]]
+        :return: Such names, given ones included.
+        :rtype: Set[str]
+        """
+        result = set(names)
+        pending = list(names)
+        while pending:
+            for aux in aliases.get(pending.pop(), ()):
+                if aux not in result:
+                    result.add(aux)
+                    pending.append(aux)
+        return result
+
+    @classmethod
+    def _names_of(cls, flow) -> FrozenSet[str]:
+        """
+        Retrieves the names given dataflow uses.
+        :param flow: The dataflow.
+        :type flow: pythoneda.shared.code_requests.CellDataflow
+        :return: Such names.
+        :rtype: FrozenSet[str]
+        """
+        return flow.reads | flow.mutates | flow.calls | flow.callees
+
+    @classmethod
+    def _module_of(cls, target: str) -> str:
+        """
+        Retrieves the top-level module of an import.
+        :param target: What gets imported, as in imports.
+        :type target: str
+        :return: The module name.
+        :rtype: str
+        """
+        module = target.partition(":")[0]
+        if module.startswith("."):
+            return module
+        return module.partition(".")[0]
+
+    @classmethod
+    @functools.lru_cache(maxsize=4096)
+    def of(cls, code: str):
+        """
+        Analyzes given code.
+        :param code: The code of a cell.
+        :type code: str
+        :return: Its dataflow. Code that doesn't parse is a barrier.
+        :rtype: pythoneda.shared.code_requests.CellDataflow
+        """
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError):
+            empty = frozenset()
+            return cls(empty, empty, empty, empty, empty, empty, empty, True)
+        imports = set()
+        aliases = set()
+        # what runs right away, and what runs once the functions get called
+        now = cls._effects()
+        later = cls._effects()
+        # (node, whether it's in the global scope, whether it runs right away)
+        pending = [(tree, True, True)]
+        while pending:
+            node, top, running = pending.pop()
+            effects = now if running else later
+            if isinstance(node, cls._SCOPES):
+                if top and not isinstance(node, ast.Lambda):
+                    effects["binds"].add(node.name)
+                inner = node.body if isinstance(node.body, list) else [node.body]
+                # class bodies run right away, function bodies once called
+                inner_running = running and isinstance(node, ast.ClassDef)
+                pending.extend((child, False, inner_running) for child in inner)
+                outer = [
+                    child
+                    for child in ast.iter_child_nodes(node)
+                    if child not in inner
+                ]
+                pending.extend((child, top, running) for child in outer)
+                continue
+            if isinstance(node, ast.comprehension):
+                pending.append((node.target, False, running))
+                pending.extend(
+                    (child, top, running) for child in [node.iter, *node.ifs]
+                )
+                continue
+            if top:
+                cls._alias(node, aliases)
+            if isinstance(node, ast.Name):
+                if isinstance(node.ctx, ast.Load):
+                    effects["reads"].add(node.id)
+                elif top:
+                    effects["binds"].add(node.id)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    if alias.name == "*":
+                        effects["barrier"] = True
+                    elif top:
+                        if isinstance(node, ast.ImportFrom):
+                            module = "." * node.level + (node.module or "")
+                            target = f"{module}:{alias.name}"
+                        elif alias.asname:
+                            target = alias.name
+                        else:
+                            target = alias.name.partition(".")[0]
+                        name = alias.asname or alias.name.partition(".")[0]
+                        effects["binds"].add(name)
+                        imports.add((name, target))
+            elif isinstance(node, ast.Global):
+                effects["binds"].update(node.names)
+                effects["reads"].update(node.names)
+            elif isinstance(node, ast.NamedExpr) and top:
+                effects["binds"].add(node.target.id)
+            elif isinstance(node, ast.AugAssign):
+                root = cls._root_of(node.target)
+                if root is not None:
+                    effects["reads"].add(root)
+            elif isinstance(node, (ast.Attribute, ast.Subscript)):
+                if not isinstance(node.ctx, ast.Load):
+                    root = cls._root_of(node)
+                    if root is not None:
+                        effects["mutates"].add(root)
+            elif isinstance(node, ast.Call):
+                cls._call(node, effects)
+            pending.extend(
+                (child, top, running) for child in ast.iter_child_nodes(node)
+            )
+        deferred = None
+        if any(later.values()):
+            deferred = cls._from_effects(later, frozenset(), frozenset(), None)
+        return cls._from_effects(
+            now, frozenset(imports), frozenset(aliases), deferred
+        )
+
+    @classmethod
+    def _effects(cls) -> Dict:
+        """
+        Creates an empty collection of effects.
+        :return: Such collection.
+        :rtype: Dict
+        """
+        return {
+            "binds": set(),
+            "reads": set(),
+            "mutates": set(),
+            "calls": set(),
+            "callees": set(),
+            "barrier": False,
+        }
+
+    @classmethod
+    def _from_effects(
+        cls, effects: Dict, imports: FrozenSet, aliases: FrozenSet, deferred
+    ):
+        """
+        Builds a dataflow out of collected effects.
+        :param effects: The effects.
+        :type effects: Dict
+        :param imports: The names bound through imports, with what they import.
+        :type imports: FrozenSet[Tuple[str, str]]
+        :param aliases: The names bound to objects other names refer to, with such names.
+        :type aliases: FrozenSet[Tuple[str, str]]
+        :param deferred: What the functions and classes defined do once called, if anything.
+        :type deferred: pythoneda.shared.code_requests.CellDataflow
+        :return: The dataflow.
+        :rtype: pythoneda.shared.code_requests.CellDataflow
+        """
+        return cls(
+            frozenset(effects["binds"]),
+            imports,
+            aliases,
+            frozenset(effects["reads"]),
+            frozenset(effects["mutates"]),
+            frozenset(effects["calls"]),
+            frozenset(effects["callees"]),
+            effects["barrier"] or (deferred is not None and deferred.barrier),
+            deferred,
+        )
+
+    @classmethod
+    def _call(cls, node: ast.Call, effects: Dict):
+        """
+        Collects the effects of a call.
+        :param node: The call.
+        :type node: ast.Call
+        :param effects: The effects collected so far.
+        :type effects: Dict
+        """
+        pure = False
+        if isinstance(node.func, ast.Name):
+            effects["callees"].add(node.func.id)
+            if node.func.id in cls._BARRIER_CALLS:
+                effects["barrier"] = True
+            pure = node.func.id in cls._PURE_CALLS
+        elif isinstance(node.func, ast.Attribute):
+            root = cls._root_of(node.func.value)
+            if root is not None:
+                effects["calls"].add(root)
+        if pure:
+            return
+        # what gets passed to unknown functions may be changed by them
+        for argument in [*node.args, *(keyword.value for keyword in node.keywords)]:
+            if isinstance(argument, ast.Starred):
+                argument = argument.value
+            root = cls._root_of(argument)
+            if root is not None:
+                effects["mutates"].add(root)
+
+    @classmethod
+    def _alias(cls, node: ast.AST, aliases: set):
+        """
+        Collects the names a global assignment makes refer to the objects of other names.
+        :param node: The statement or expression.
+        :type node: ast.AST
+        :param aliases: The pairs of names collected so far.
+        :type aliases: Set[Tuple[str, str]]
+        """
+        if isinstance(node, ast.Assign):
+            targets, value = node.targets, node.value
+        elif isinstance(node, (ast.AnnAssign, ast.NamedExpr)):
+            targets, value = [node.target], node.value
+        elif isinstance(node, (ast.For, ast.AsyncFor)):
+            targets, value = [node.target], node.iter
+        elif isinstance(node, ast.withitem) and node.optional_vars is not None:
+            targets, value = [node.optional_vars], node.context_expr
+        else:
+            return
+        sources = cls._sources_of(value)
+        for target in targets:
+            for name in cls._sources_of(target):
+                aliases.update((name, source) for source in sources)
+
+    @classmethod
+    def _sources_of(cls, node: ast.expr) -> set:
+        """
+        Retrieves the names whose objects given expression may evaluate to, or contain.
+        :param node: The expression.
+        :type node: ast.expr
+        :return: Such names.
+        :rtype: Set[str]
+        """
+        if node is None:
+            return set()
+        if isinstance(node, ast.Starred):
+            return cls._sources_of(node.value)
+        if isinstance(node, (ast.Tuple, ast.List, ast.Set)):
+            elements = node.elts
+        elif isinstance(node, ast.Dict):
+            elements = node.values
+        elif isinstance(node, ast.IfExp):
+            elements = [node.body, node.orelse]
+        elif isinstance(node, ast.BoolOp):
+            elements = node.values
+        else:
+            root = cls._root_of(node)
+            return set() if root is None else {root}
+        return set().union(*(cls._sources_of(aux) for aux in elements))
+
+    @classmethod
+    def _root_of(cls, node: ast.expr) -> str:
+        """
+        Retrieves the name an attribute or subscript chain starts from.
+        :param node: The expression.
+        :type node: ast.expr
+        :return: Such name, or None if it starts from another kind of expression.
+        :rtype: str
+        """
+        while isinstance(node, (ast.Attribute, ast.Subscript)):
+            node = node.value
+        return node.id if isinstance(node, ast.Name) else None
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,87 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/cell_output.py
+
+This file declares the CellOutput class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from pythoneda.shared import attribute, ValueObject
+
+
+class CellOutput(ValueObject):
+    """
+    A line printed while executing a code request.
+
+    Class name: CellOutput
+
+    Responsibilities:
+        - Attributes a line of output to the cell that printed it.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeExecutionEngine
+    """
+
+    def __init__(self, cellIndex: int, text: str):
+        """
+        Creates a new CellOutput instance.
+        :param cellIndex: The position of the cell, or None for output before the first cell.
+        :type cellIndex: int
+        :param text: The line, without its trailing newline.
+        :type text: str
+        """
+        super().__init__()
+        self._cell_index = cellIndex
+        self._text = text
+
+    @classmethod
+    def empty(cls):
+        """
+        Builds an empty instance. Required for unmarshalling.
+        :return: An empty instance.
+        :rtype: pythoneda.shared.code_requests.CellOutput
+        """
+        return cls(None, None)
+
+    @property
+    @attribute
+    def cell_index(self) -> int:
+        """
+        Retrieves the position of the cell that printed the line.
+        :return: Such position.
+        :rtype: int
+        """
+        return self._cell_index
+
+    @property
+    @attribute
+    def text(self) -> str:
+        """
+        Retrieves the line.
+        :return: Such text.
+        :rtype: str
+        """
+        return self._text
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -39,6 +39,8 @@ class CodeCell(Cell):
         - pythoneda.shared.code_requests.Dependency
     """
 
+    _DIGEST_KIND = "code"
+
     def __init__(self, contents: str, dependencies: List):
         """
         Creates a new CodeCell instance.
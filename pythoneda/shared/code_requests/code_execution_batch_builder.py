@@ -0,0 +1,289 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/code_execution_batch_builder.py
+
+This file declares the CodeExecutionBatchBuilder class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .code_execution_batch_result import CodeExecutionBatchResult
+from .code_execution_nix_flake import CodeExecutionNixFlake
+from .code_execution_nix_flake_cache import CodeExecutionNixFlakeCache
+from .code_execution_request import CodeExecutionRequest
+from .git_add_batch import GitAddBatch
+from .instrumentation import Instrumentation
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+import os
+from pathlib import Path
+import tempfile
+from typing import Callable, Dict, Iterable, Iterator, List
+
+
+class CodeExecutionBatchBuilder:
+    """
+    Builds the flakes of many code execution requests concurrently.
+
+    Class name: CodeExecutionBatchBuilder
+
+    Responsibilities:
+        - Fans flake generation and git staging out over a thread or process pool.
+        - Alternatively, stages all flakes of a batch with a single git add.
+        - Yields each result as soon as it is available.
+        - Captures per-request errors without aborting the batch.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeExecutionBatchResult
+        - pythoneda.shared.code_requests.CodeExecutionNixFlake
+        - pythoneda.shared.code_requests.CodeExecutionNixFlakeCache
+        - pythoneda.shared.code_requests.GitAddBatch
+    """
+
+    def __init__(
+        self,
+        outputFolder: str,
+        inputsResolver: Callable,
+        maxWorkers: int = None,
+        useProcesses: bool = False,
+        gitAddFactory: Callable = GitAddBatch,
+        cache: CodeExecutionNixFlakeCache = None,
+        stagingFolder: str = None,
+    ):
+        """
+        Creates a new CodeExecutionBatchBuilder instance.
+        :param outputFolder: The folder under which each flake gets generated.
+        :type outputFolder: str
+        :param inputsResolver: Resolves a flake spec into its inputs. Must be picklable when using processes.
+        :type inputsResolver: Callable[[pythoneda.shared.code_requests.CodeRequestNixFlakeSpec], List[pythoneda.shared.nix.flake.NixFlake]]
+        :param maxWorkers: The number of workers. Defaults to the number of CPUs.
+        :type maxWorkers: int
+        :param useProcesses: Whether to use a process pool instead of a thread pool.
+        :type useProcesses: bool
+        :param gitAddFactory: Builds the GitAdd for a flake folder, or None to skip staging. The default stages each flake with a single git add.
+        :type gitAddFactory: Callable[[str], pythoneda.shared.git.GitAdd]
+        :param cache: The flake cache, if any.
+        :type cache: pythoneda.shared.code_requests.CodeExecutionNixFlakeCache
+        :param stagingFolder: A folder of the repository holding all flakes, if any. When provided,
+        the flakes of each batch get staged with a single git add once they are all built, instead of through gitAddFactory.
+        :type stagingFolder: str
+        """
+        super().__init__()
+        self._output_folder = outputFolder
+        self._inputs_resolver = inputsResolver
+        self._max_workers = maxWorkers or os.cpu_count() or 1
+        self._use_processes = useProcesses
+        self._git_add_factory = gitAddFactory
+        self._cache = cache
+        self._staging_folder = stagingFolder
+
+    @property
+    def output_folder(self) -> str:
+        """
+        Retrieves the folder under which each flake gets generated.
+        :return: Such folder.
+        :rtype: str
+        """
+        return self._output_folder
+
+    @property
+    def max_workers(self) -> int:
+        """
+        Retrieves the number of workers.
+        :return: Such number.
+        :rtype: int
+        """
+        return self._max_workers
+
+    @property
+    def staging_folder(self) -> str:
+        """
+        Retrieves the folder of the repository where whole batches get staged at once.
+        :return: Such folder, or None if each flake gets staged on its own.
+        :rtype: str
+        """
+        return self._staging_folder
+
+    @property
+    def use_processes(self) -> bool:
+        """
+        Checks whether the builder uses a process pool.
+        :return: True in such case.
+        :rtype: bool
+        """
+        return self._use_processes
+
+    @staticmethod
+    def build_one(
+        request: CodeExecutionRequest,
+        outputFolder: str,
+        inputsResolver: Callable,
+        gitAddFactory: Callable,
+        cache: CodeExecutionNixFlakeCache,
+    ) -> str:
+        """
+        Builds the flake of a single request.
+        :param request: The request.
+        :type request: pythoneda.shared.code_requests.CodeExecutionRequest
+        :param outputFolder: The folder under which the flake gets generated.
+        :type outputFolder: str
+        :param inputsResolver: Resolves a flake spec into its inputs.
+        :type inputsResolver: Callable
+        :param gitAddFactory: Builds the GitAdd for a flake folder, or None.
+        :type gitAddFactory: Callable
+        :param cache: The flake cache, if any.
+        :type cache: pythoneda.shared.code_requests.CodeExecutionNixFlakeCache
+        :return: The flake folder.
+        :rtype: str
+        """
+        instrumentation = Instrumentation.current()
+        with instrumentation.span("CodeExecutionBatchBuilder.build_one"):
+            spec = request.nix_flake_spec
+            with instrumentation.span("CodeExecutionBatchBuilder.resolve_inputs"):
+                inputs = inputsResolver(spec)
+            flake = CodeExecutionNixFlake(spec.code_request, inputs)
+            if cache is None:
+                Path(outputFolder).mkdir(parents=True, exist_ok=True)
+                result = tempfile.mkdtemp(prefix="code-execution-", dir=outputFolder)
+                flake.generate_files(result)
+            else:
+                result = str(cache.generate_files(flake))
+            if gitAddFactory is not None:
+                git_add = gitAddFactory(result)
+                flake.git_add_files(git_add)
+                if isinstance(git_add, GitAddBatch):
+                    git_add.flush()
+            return result
+
+    def build(self, requests: Iterable) -> Iterator[CodeExecutionBatchResult]:
+        """
+        Builds the flakes of given requests, yielding results as they complete.
+        With a staging folder, the results are yielded once the whole batch is
+        staged, and the flakes that couldn't be staged fail with the git error.
+        :param requests: The requests.
+        :type requests: Iterable[pythoneda.shared.code_requests.CodeExecutionRequest]
+        :return: The results, in completion order.
+        :rtype: Iterator[pythoneda.shared.code_requests.CodeExecutionBatchResult]
+        """
+        if self._staging_folder is None:
+            yield from self._build(requests, self._git_add_factory)
+            return
+        staging = GitAddBatch(self._staging_folder)
+        results = list(self._build(requests, None, staging))
+        try:
+            with Instrumentation.current().span(
+                "CodeExecutionBatchBuilder.stage", files=len(staging)
+            ):
+                staging.flush()
+        except Exception as error:
+            results = [
+                (
+                    CodeExecutionBatchResult(result.index, result.request, error=error)
+                    if result.succeeded
+                    else result
+                )
+                for result in results
+            ]
+        yield from results
+
+    def _build(
+        self, requests: Iterable, gitAddFactory: Callable, staging: GitAddBatch = None
+    ) -> Iterator[CodeExecutionBatchResult]:
+        """
+        Builds the flakes of given requests, yielding results as they complete.
+        :param requests: The requests.
+        :type requests: Iterable[pythoneda.shared.code_requests.CodeExecutionRequest]
+        :param gitAddFactory: Builds the GitAdd for a flake folder, or None to skip staging.
+        :type gitAddFactory: Callable[[str], pythoneda.shared.git.GitAdd]
+        :param staging: The batch collecting the files to stage, if any.
+        :type staging: pythoneda.shared.code_requests.GitAddBatch
+        :return: The results, in completion order.
+        :rtype: Iterator[pythoneda.shared.code_requests.CodeExecutionBatchResult]
+        """
+        if self.use_processes:
+            executor_class = ProcessPoolExecutor
+        else:
+            executor_class = ThreadPoolExecutor
+        # bounded submission keeps huge or lazy iterables from piling up
+        window = self.max_workers * 2
+        pending = {}
+        with executor_class(max_workers=self.max_workers) as executor:
+            try:
+                for index, request in enumerate(requests):
+                    if len(pending) >= window:
+                        yield from self._collect(pending, staging)
+                    future = executor.submit(
+                        self.__class__.build_one,
+                        request,
+                        self._output_folder,
+                        self._inputs_resolver,
+                        gitAddFactory,
+                        self._cache,
+                    )
+                    pending[future] = (index, request)
+                while pending:
+                    yield from self._collect(pending, staging)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def build_all(self, requests: Iterable) -> List[CodeExecutionBatchResult]:
+        """
+        Builds the flakes of given requests.
+        :param requests: The requests.
+        :type requests: Iterable[pythoneda.shared.code_requests.CodeExecutionRequest]
+        :return: The results, in request order.
+        :rtype: List[pythoneda.shared.code_requests.CodeExecutionBatchResult]
+        """
+        return sorted(self.build(requests), key=lambda result: result.index)
+
+    def _collect(
+        self, pending: Dict, staging: GitAddBatch = None
+    ) -> Iterator[CodeExecutionBatchResult]:
+        """
+        Waits for at least one pending build to complete, and yields its result.
+        :param pending: The pending futures, mapped to their index and request.
+        :type pending: Dict[concurrent.futures.Future, Tuple[int, pythoneda.shared.code_requests.CodeExecutionRequest]]
+        :param staging: The batch collecting the files to stage, if any.
+        :type staging: pythoneda.shared.code_requests.GitAddBatch
+        :return: The completed results.
+        :rtype: Iterator[pythoneda.shared.code_requests.CodeExecutionBatchResult]
+        """
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            index, request = pending.pop(future)
+            try:
+                result = CodeExecutionBatchResult(index, request, future.result())
+            except Exception as error:
+                result = CodeExecutionBatchResult(index, request, error=error)
+            if staging is not None and result.succeeded:
+                # the files to stage don't depend on the inputs
+                flake = CodeExecutionNixFlake(request.nix_flake_spec.code_request, [])
+                flake.git_add_files(staging.for_folder(result.flake_folder))
+            yield result
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
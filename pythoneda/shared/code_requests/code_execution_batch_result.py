@@ -0,0 +1,128 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/code_execution_batch_result.py
+
+This file declares the CodeExecutionBatchResult class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .code_execution_request import CodeExecutionRequest
+
+
+class CodeExecutionBatchResult:
+    """
+    The outcome of building the flake of one request in a batch.
+
+    Class name: CodeExecutionBatchResult
+
+    Responsibilities:
+        - Pairs a request with either its flake folder or the error it raised.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeExecutionBatchBuilder
+        - pythoneda.shared.code_requests.CodeExecutionRequest
+    """
+
+    def __init__(
+        self,
+        index: int,
+        request: CodeExecutionRequest,
+        flakeFolder: str = None,
+        error: BaseException = None,
+    ):
+        """
+        Creates a new CodeExecutionBatchResult instance.
+        :param index: The position of the request in the batch.
+        :type index: int
+        :param request: The request.
+        :type request: pythoneda.shared.code_requests.CodeExecutionRequest
+        :param flakeFolder: The folder of the generated flake, if any.
+        :type flakeFolder: str
+        :param error: The error preventing the flake from being built, if any.
+        :type error: BaseException
+        """
+        super().__init__()
+        self._index = index
+        self._request = request
+        self._flake_folder = flakeFolder
+        self._error = error
+
+    @property
+    def index(self) -> int:
+        """
+        Retrieves the position of the request in the batch.
+        :return: Such position.
+        :rtype: int
+        """
+        return self._index
+
+    @property
+    def request(self) -> CodeExecutionRequest:
+        """
+        Retrieves the request.
+        :return: Such request.
+        :rtype: pythoneda.shared.code_requests.CodeExecutionRequest
+        """
+        return self._request
+
+    @property
+    def flake_folder(self) -> str:
+        """
+        Retrieves the folder of the generated flake.
+        :return: Such folder, or None if the build failed.
+        :rtype: str
+        """
+        return self._flake_folder
+
+    @property
+    def error(self) -> BaseException:
+        """
+        Retrieves the error, if any.
+        :return: Such error.
+        :rtype: BaseException
+        """
+        return self._error
+
+    @property
+    def succeeded(self) -> bool:
+        """
+        Checks whether the flake was built.
+        :return: True in such case.
+        :rtype: bool
+        """
+        return self._error is None
+
+    def __repr__(self) -> str:
+        """
+        Provides a text representation of this instance.
+        :return: Such text.
+        :rtype: str
+        """
+        if self.succeeded:
+            outcome = f"flake_folder={self.flake_folder!r}"
+        else:
+            outcome = f"error={self.error!r}"
+        return f"{self.__class__.__name__}(index={self.index}, {outcome})"
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
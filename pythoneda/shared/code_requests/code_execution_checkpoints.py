@@ -0,0 +1,237 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/code_execution_checkpoints.py
+
+This file declares the CodeExecutionCheckpoints class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+class CodeExecutionCheckpoints:
+    """
+    Runtime support for resuming generated code from the last successful code cell.
+
+    Its source is copied verbatim into the generated code_request.py, so it
+    depends on the standard library only, and imports it locally.
+
+    Class name: CodeExecutionCheckpoints
+
+    Responsibilities:
+        - Snapshots the picklable globals after each code cell.
+        - Finds the latest snapshot whose preceding cells haven't changed since.
+        - Restores it right before the first cell that needs to run.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeExecutionNixFlake
+    """
+
+    FOLDER_VARIABLE = "PYTHONEDA_CHECKPOINTS_FOLDER"
+
+    RESUME_VARIABLE = "PYTHONEDA_RESUME"
+
+    DEFAULT_FOLDER = ".pythoneda-checkpoints"
+
+    def __init__(self, namespace: dict, digests: list, folder: str = None):
+        """
+        Creates a new CodeExecutionCheckpoints instance.
+        :param namespace: The globals of the running code.
+        :type namespace: dict
+        :param digests: The digest of each cell's contents, or None for non-code cells.
+        :type digests: List[str]
+        :param folder: The folder to store the snapshots in. Defaults to the PYTHONEDA_CHECKPOINTS_FOLDER variable, or to .pythoneda-checkpoints.
+        :type folder: str
+        """
+        import hashlib
+        import os
+
+        super().__init__()
+        self._namespace = namespace
+        if folder is None:
+            folder = os.environ.get(self.FOLDER_VARIABLE, self.DEFAULT_FOLDER)
+        self._folder = folder
+        # each snapshot is named after its cell and all the code cells before it
+        self._chain = {}
+        running = ""
+        for index, digest in enumerate(digests):
+            if digest is not None:
+                running = hashlib.sha256(f"{running}:{digest}".encode()).hexdigest()
+                self._chain[index] = running
+        self._resume_index = -1
+        self._restored = True
+        if os.environ.get(self.RESUME_VARIABLE, "1") != "0":
+            for index in sorted(self._chain, reverse=True):
+                if os.path.isfile(self._path_of(index)):
+                    self._resume_index = index
+                    self._restored = False
+                    break
+
+    @property
+    def folder(self) -> str:
+        """
+        Retrieves the folder with the snapshots.
+        :return: Such folder.
+        :rtype: str
+        """
+        return self._folder
+
+    @property
+    def resume_index(self) -> int:
+        """
+        Retrieves the index of the cell whose snapshot is resumed.
+        :return: Such index, or -1 if running from the first cell.
+        :rtype: int
+        """
+        return self._resume_index
+
+    def _path_of(self, index: int) -> str:
+        """
+        Retrieves the path of the snapshot taken after given cell.
+        :param index: The cell index.
+        :type index: int
+        :return: Such path.
+        :rtype: str
+        """
+        import os
+
+        return os.path.join(self._folder, f"{index}-{self._chain[index]}.pickle")
+
+    def pending(self, index: int) -> bool:
+        """
+        Checks whether given cell needs to run, restoring the snapshot
+        the first time a cell after it does.
+        :param index: The cell index.
+        :type index: int
+        :return: True if the cell needs to run.
+        :rtype: bool
+        """
+        if index <= self._resume_index:
+            return False
+        if not self._restored:
+            self._restored = True
+            self._restore()
+        return True
+
+    def _restore(self):
+        """
+        Loads the snapshot into the globals, or starts over from the first cell
+        if it cannot be loaded.
+        """
+        import importlib
+        import os
+        import pickle
+        import sys
+
+        path = self._path_of(self._resume_index)
+        try:
+            with open(path, "rb") as snapshot:
+                state = pickle.load(snapshot)
+            for name, module in state["modules"].items():
+                self._namespace[name] = importlib.import_module(module)
+            self._namespace.update(pickle.loads(state["values"]))
+        except Exception as error:
+            print(
+                f"Cannot resume from {path} ({error}), starting over",
+                file=sys.stderr,
+                flush=True,
+            )
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            sys.stdout.flush()
+            os.environ[self.RESUME_VARIABLE] = "0"
+            os.execv(sys.executable, [sys.executable] + sys.argv)
+        print(
+            f"Resumed after cell {self._resume_index} from {path}",
+            file=sys.stderr,
+            flush=True,
+        )
+        if state["skipped"]:
+            skipped = ", ".join(state["skipped"])
+            print(
+                f"Not restored, since they could not be saved: {skipped}",
+                file=sys.stderr,
+                flush=True,
+            )
+
+    def save(self, index: int):
+        """
+        Snapshots the globals after given cell has run.
+        :param index: The cell index.
+        :type index: int
+        """
+        import os
+        import pickle
+        import sys
+        import types
+
+        values = {}
+        modules = {}
+        for name, value in list(self._namespace.items()):
+            if name.startswith("__") or name.startswith("_pythoneda"):
+                continue
+            if isinstance(value, types.ModuleType):
+                modules[name] = value.__name__
+            elif value is not self.__class__:
+                values[name] = value
+        skipped = []
+        try:
+            # a single pickle keeps the objects shared between globals shared
+            data = pickle.dumps(values, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            for name in list(values):
+                try:
+                    pickle.dumps(values[name], pickle.HIGHEST_PROTOCOL)
+                except Exception:
+                    del values[name]
+                    skipped.append(name)
+            data = pickle.dumps(values, pickle.HIGHEST_PROTOCOL)
+        if skipped:
+            print(
+                f"Cell {index}: not checkpointing {', '.join(skipped)}",
+                file=sys.stderr,
+                flush=True,
+            )
+        state = {"modules": modules, "skipped": skipped, "values": data}
+        os.makedirs(self._folder, exist_ok=True)
+        path = self._path_of(index)
+        staging = f"{path}.tmp"
+        with open(staging, "wb") as snapshot:
+            pickle.dump(state, snapshot, pickle.HIGHEST_PROTOCOL)
+        os.replace(staging, path)
+        # snapshots of this cell after other versions of the code are stale
+        prefix = f"{index}-"
+        for entry in os.listdir(self._folder):
+            if (
+                entry.startswith(prefix)
+                and entry.endswith(".pickle")
+                and entry != os.path.basename(path)
+            ):
+                try:
+                    os.remove(os.path.join(self._folder, entry))
+                except OSError:
+                    pass
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,152 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/code_execution_coalescer.py
+
+This file declares the CodeExecutionCoalescer class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .cell_output import CellOutput
+from .code_execution_engine import CodeExecutionEngine
+from .code_execution_flight import CodeExecutionFlight
+from .code_request import CodeRequest
+import asyncio
+from typing import AsyncIterator
+
+
+class CodeExecutionCoalescer:
+    """
+    Runs identical code requests arriving at about the same time only once.
+
+    Class name: CodeExecutionCoalescer
+
+    Responsibilities:
+        - Identifies requests by their cells and the dependencies of each one.
+        - Attaches identical requests to the run already in progress, if any.
+        - Reuses the output of a successful run for a while after it ends.
+        - Runs the requests again after a failure.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeExecutionEngine
+        - pythoneda.shared.code_requests.CodeExecutionFlight
+    """
+
+    def __init__(self, engine: CodeExecutionEngine, reuseWindow: float = 5.0):
+        """
+        Creates a new CodeExecutionCoalescer instance.
+        :param engine: The engine running the requests.
+        :type engine: pythoneda.shared.code_requests.CodeExecutionEngine
+        :param reuseWindow: The number of seconds the output of a successful run is reused after it ends.
+        :type reuseWindow: float
+        """
+        super().__init__()
+        self._engine = engine
+        self._reuse_window = reuseWindow
+        # key -> flight, in progress or within its reuse window
+        self._flights = {}
+
+    @property
+    def engine(self) -> CodeExecutionEngine:
+        """
+        Retrieves the engine running the requests.
+        :return: Such engine.
+        :rtype: pythoneda.shared.code_requests.CodeExecutionEngine
+        """
+        return self._engine
+
+    @property
+    def reuse_window(self) -> float:
+        """
+        Retrieves the number of seconds the output of a successful run is reused after it ends.
+        :return: Such window.
+        :rtype: float
+        """
+        return self._reuse_window
+
+    @property
+    def flights(self) -> int:
+        """
+        Retrieves the number of runs in progress or within their reuse window.
+        :return: Such number.
+        :rtype: int
+        """
+        return len(self._flights)
+
+    @classmethod
+    def key_of(cls, request: CodeRequest) -> str:
+        """
+        Identifies what running given request does.
+        :param request: The request.
+        :type request: pythoneda.shared.code_requests.CodeRequest
+        :return: The digest of its flake spec, which covers the cells and their dependencies.
+        :rtype: str
+        """
+        return request.nix_flake_spec.digest()
+
+    async def run(self, request: CodeRequest) -> AsyncIterator[CellOutput]:
+        """
+        Runs given request, or follows an identical run in progress or just finished.
+        :param request: The request.
+        :type request: pythoneda.shared.code_requests.CodeRequest
+        :return: The output lines, from the start of the run.
+        :rtype: AsyncIterator[pythoneda.shared.code_requests.CellOutput]
+        """
+        key = await asyncio.to_thread(self.key_of, request)
+        flight = self._flights.get(key)
+        if flight is None or flight.abandoned:
+            flight = CodeExecutionFlight(
+                self._engine.run(request),
+                lambda landed: self._landed(key, landed),
+            )
+            self._flights[key] = flight
+        async for output in flight.follow():
+            yield output
+
+    def _landed(self, key: str, flight: CodeExecutionFlight):
+        """
+        Forgets a finished run, right away if it failed or after the reuse window otherwise.
+        :param key: The key of the run.
+        :type key: str
+        :param flight: The run.
+        :type flight: pythoneda.shared.code_requests.CodeExecutionFlight
+        """
+        if flight.error is None and not flight.abandoned and self._reuse_window > 0:
+            asyncio.get_running_loop().call_later(
+                self._reuse_window, self._forget, key, flight
+            )
+        else:
+            self._forget(key, flight)
+
+    def _forget(self, key: str, flight: CodeExecutionFlight):
+        """
+        Forgets a run, unless another one has replaced it.
+        :param key: The key of the run.
+        :type key: str
+        :param flight: The run.
+        :type flight: pythoneda.shared.code_requests.CodeExecutionFlight
+        """
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,366 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/code_execution_engine.py
+
+This file declares the CodeExecutionEngine class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .cell_output import CellOutput
+from .code_execution_error import CodeExecutionError
+from .code_execution_kernel_pool import CodeExecutionKernelPool
+from .code_execution_nix_flake import CodeExecutionNixFlake
+from .code_execution_nix_flake_cache import CodeExecutionNixFlakeCache
+from .code_request import CodeRequest
+from .dependency_environment_pool import DependencyEnvironmentPool
+import asyncio
+import contextlib
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import threading
+from typing import AsyncIterator, Callable, Iterable, List, Tuple
+
+
+class CodeExecutionEngine:
+    """
+    Runs the flakes of many code requests as subprocesses, with bounded concurrency.
+
+    Class name: CodeExecutionEngine
+
+    Responsibilities:
+        - Generates and runs the flake of each code request.
+        - Enforces a global concurrency limit, and another per dependency set.
+        - Streams the output of each request, broken down per cell.
+        - Applies timeouts, and kills the processes of cancelled runs.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CellOutput
+        - pythoneda.shared.code_requests.CodeExecutionError
+        - pythoneda.shared.code_requests.CodeExecutionKernelPool
+        - pythoneda.shared.code_requests.CodeExecutionNixFlake
+        - pythoneda.shared.code_requests.DependencyEnvironmentPool
+    """
+
+    DEFAULT_COMMAND = ["nix", "run", "."]
+
+    DEFAULT_ENVIRONMENT_COMMAND = [
+        "nix",
+        "develop",
+        "{environment}",
+        "--command",
+        "python",
+        "code_request.py",
+    ]
+
+    _LINE_LIMIT = 1 << 20
+
+    def __init__(
+        self,
+        workFolder: str,
+        inputsResolver: Callable,
+        maxConcurrency: int = 4,
+        maxConcurrencyPerDependencySet: int = 1,
+        timeout: float = None,
+        command: List = None,
+        cache: CodeExecutionNixFlakeCache = None,
+        environments: DependencyEnvironmentPool = None,
+        kernels: CodeExecutionKernelPool = None,
+    ):
+        """
+        Creates a new CodeExecutionEngine instance.
+        :param workFolder: The folder under which flakes get generated.
+        :type workFolder: str
+        :param inputsResolver: Resolves a flake spec into its inputs.
+        :type inputsResolver: Callable[[pythoneda.shared.code_requests.CodeRequestNixFlakeSpec], List[pythoneda.shared.nix.flake.NixFlake]]
+        :param maxConcurrency: The maximum number of processes running at once.
+        :type maxConcurrency: int
+        :param maxConcurrencyPerDependencySet: The maximum number of processes running at once for the same dependencies.
+        :type maxConcurrencyPerDependencySet: int
+        :param timeout: The maximum number of seconds each process can run, if any.
+        :type timeout: float
+        :param command: The command running a flake, from within its folder. When using
+        environments, "{environment}" gets replaced with the environment folder.
+        :type command: List[str]
+        :param cache: The flake cache, if any.
+        :type cache: pythoneda.shared.code_requests.CodeExecutionNixFlakeCache
+        :param environments: The shared environments, if any. When provided, only
+        code_request.py gets generated for each request, and it runs in the environment
+        of its dependency set.
+        :type environments: pythoneda.shared.code_requests.DependencyEnvironmentPool
+        :param kernels: The warm kernels, if any. When provided, requests run in the kernel
+        of their dependency set instead of in a new process.
+        :type kernels: pythoneda.shared.code_requests.CodeExecutionKernelPool
+        """
+        super().__init__()
+        self._work_folder = workFolder
+        self._inputs_resolver = inputsResolver
+        self._max_concurrency = maxConcurrency
+        self._max_concurrency_per_dependency_set = maxConcurrencyPerDependencySet
+        self._timeout = timeout
+        if command is None:
+            if environments is None:
+                command = self.DEFAULT_COMMAND
+            else:
+                command = self.DEFAULT_ENVIRONMENT_COMMAND
+        self._command = list(command)
+        self._cache = cache
+        self._environments = environments
+        self._kernels = kernels
+        self._slots = asyncio.Semaphore(maxConcurrency)
+        self._dependency_set_slots = {}
+
+    @property
+    def max_concurrency(self) -> int:
+        """
+        Retrieves the maximum number of processes running at once.
+        :return: Such limit.
+        :rtype: int
+        """
+        return self._max_concurrency
+
+    @property
+    def max_concurrency_per_dependency_set(self) -> int:
+        """
+        Retrieves the maximum number of processes running at once for the same dependencies.
+        :return: Such limit.
+        :rtype: int
+        """
+        return self._max_concurrency_per_dependency_set
+
+    @property
+    def timeout(self) -> float:
+        """
+        Retrieves the maximum number of seconds each process can run.
+        :return: Such timeout, or None if unbounded.
+        :rtype: float
+        """
+        return self._timeout
+
+    async def run(self, request: CodeRequest) -> AsyncIterator[CellOutput]:
+        """
+        Runs given request, once there are free slots for it.
+        :param request: The request.
+        :type request: pythoneda.shared.code_requests.CodeRequest
+        :return: The output lines, as they are printed.
+        :rtype: AsyncIterator[pythoneda.shared.code_requests.CellOutput]
+        """
+        spec = request.nix_flake_spec
+        async with self._slot(spec.code_request.dependency_set):
+            if self._kernels is not None:
+                async for output in self._run_in_kernel(request):
+                    yield output
+                return
+            if self._environments is None:
+                environment = None
+            else:
+                environment = await asyncio.to_thread(
+                    self._environments.acquire, spec
+                )
+            try:
+                flake_folder = await asyncio.to_thread(
+                    self._generate, spec, environment
+                )
+                command = [
+                    part.replace("{environment}", str(environment))
+                    for part in self._command
+                ]
+                try:
+                    async for output in self._execute(flake_folder, command):
+                        yield output
+                finally:
+                    if self._cache is None or environment is not None:
+                        shutil.rmtree(flake_folder, ignore_errors=True)
+            finally:
+                if environment is not None:
+                    self._environments.release(environment)
+
+    async def run_many(self, requests: Iterable) -> AsyncIterator[Tuple]:
+        """
+        Runs given requests concurrently, within the configured limits.
+        :param requests: The requests.
+        :type requests: Iterable[pythoneda.shared.code_requests.CodeRequest]
+        :return: Pairs of request and either an output line or the error that ended its run.
+        :rtype: AsyncIterator[Tuple[pythoneda.shared.code_requests.CodeRequest, pythoneda.shared.code_requests.CellOutput | Exception]]
+        """
+        queue = asyncio.Queue(maxsize=1024)
+        finished = object()
+
+        async def pump(request):
+            try:
+                async for output in self.run(request):
+                    await queue.put((request, output))
+            except Exception as error:
+                await queue.put((request, error))
+            finally:
+                await queue.put((request, finished))
+
+        tasks = [asyncio.create_task(pump(request)) for request in requests]
+        try:
+            remaining = len(tasks)
+            while remaining > 0:
+                request, item = await queue.get()
+                if item is finished:
+                    remaining -= 1
+                else:
+                    yield request, item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run_in_kernel(self, request: CodeRequest) -> AsyncIterator[CellOutput]:
+        """
+        Runs given request in a warm kernel, consuming its output in a thread of its own.
+        :param request: The request.
+        :type request: pythoneda.shared.code_requests.CodeRequest
+        :return: The output lines, as they are printed.
+        :rtype: AsyncIterator[pythoneda.shared.code_requests.CellOutput]
+        """
+        loop = asyncio.get_running_loop()
+        # (output line, error), or None once the run ends
+        queue = asyncio.Queue()
+        interruption = threading.Event()
+
+        def consume():
+            try:
+                for output in self._kernels.run(request, self._timeout, interruption):
+                    loop.call_soon_threadsafe(queue.put_nowait, (output, None))
+            except Exception as error:
+                loop.call_soon_threadsafe(queue.put_nowait, (None, error))
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+
+        consumer = threading.Thread(target=consume, daemon=True)
+        consumer.start()
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                output, error = item
+                if error is not None:
+                    raise error
+                yield output
+        finally:
+            # kills the kernel if it's still running, so that the thread ends
+            # and gives the kernel back
+            interruption.set()
+            await asyncio.to_thread(consumer.join)
+
+    @contextlib.asynccontextmanager
+    async def _slot(self, key: Tuple):
+        """
+        Waits for a slot for given dependency set, and then for a global one.
+        :param key: The dependency set.
+        :type key: Tuple[Tuple[str, str]]
+        """
+        entry = self._dependency_set_slots.get(key)
+        if entry is None:
+            entry = [asyncio.Semaphore(self._max_concurrency_per_dependency_set), 0]
+            self._dependency_set_slots[key] = entry
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._slots:
+                    yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._dependency_set_slots[key]
+
+    def _generate(self, spec, environment: Path = None) -> str:
+        """
+        Generates the flake for given spec, or just its code if it runs in a shared environment.
+        :param spec: The flake spec.
+        :type spec: pythoneda.shared.code_requests.CodeRequestNixFlakeSpec
+        :param environment: The shared environment, if any.
+        :type environment: pathlib.Path
+        :return: The flake folder.
+        :rtype: str
+        """
+        if environment is not None:
+            # the environment already provides the inputs: no need to resolve them
+            flake = CodeExecutionNixFlake(spec.code_request, [], cellMarkers=True)
+        else:
+            flake = CodeExecutionNixFlake(
+                spec.code_request, self._inputs_resolver(spec), cellMarkers=True
+            )
+            if self._cache is not None:
+                return str(self._cache.generate_files(flake))
+        Path(self._work_folder).mkdir(parents=True, exist_ok=True)
+        result = tempfile.mkdtemp(prefix="code-execution-", dir=self._work_folder)
+        if environment is None:
+            flake.generate_files(result)
+        else:
+            flake.generate_code(result)
+        return result
+
+    async def _execute(
+        self, flakeFolder: str, command: List
+    ) -> AsyncIterator[CellOutput]:
+        """
+        Runs the flake in given folder.
+        :param flakeFolder: The flake folder.
+        :type flakeFolder: str
+        :param command: The command to run.
+        :type command: List[str]
+        :return: The output lines, as they are printed.
+        :rtype: AsyncIterator[pythoneda.shared.code_requests.CellOutput]
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if self._timeout is None else loop.time() + self._timeout
+        marker = CodeExecutionNixFlake.CELL_MARKER
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            cwd=flakeFolder,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            env={**os.environ, "PYTHONUNBUFFERED": "1"},
+            limit=self._LINE_LIMIT,
+        )
+        cell_index = None
+        try:
+            while True:
+                remaining = None if deadline is None else max(0, deadline - loop.time())
+                line = await asyncio.wait_for(process.stdout.readline(), remaining)
+                if not line:
+                    break
+                text = line.decode("utf-8", errors="replace").rstrip("\r\n")
+                if text.startswith(marker) and text[len(marker) :].isdigit():
+                    cell_index = int(text[len(marker) :])
+                else:
+                    yield CellOutput(cell_index, text)
+            remaining = None if deadline is None else max(0, deadline - loop.time())
+            return_code = await asyncio.wait_for(process.wait(), remaining)
+        finally:
+            if process.returncode is None:
+                with contextlib.suppress(ProcessLookupError):
+                    process.kill()
+                await process.wait()
+        if return_code != 0:
+            raise CodeExecutionError(return_code, flakeFolder)
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,77 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/code_execution_error.py
+
+This file declares the CodeExecutionError class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+class CodeExecutionError(Exception):
+    """
+    Raised when the process running a code request exits unsuccessfully.
+
+    Class name: CodeExecutionError
+
+    Responsibilities:
+        - Reports the exit status of failed code executions.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeExecutionEngine
+    """
+
+    def __init__(self, returnCode: int, flakeFolder: str):
+        """
+        Creates a new CodeExecutionError instance.
+        :param returnCode: The exit status of the process.
+        :type returnCode: int
+        :param flakeFolder: The folder of the flake that was run.
+        :type flakeFolder: str
+        """
+        super().__init__(
+            f"Code execution in {flakeFolder} exited with status {returnCode}"
+        )
+        self._return_code = returnCode
+        self._flake_folder = flakeFolder
+
+    @property
+    def return_code(self) -> int:
+        """
+        Retrieves the exit status of the process.
+        :return: Such status.
+        :rtype: int
+        """
+        return self._return_code
+
+    @property
+    def flake_folder(self) -> str:
+        """
+        Retrieves the folder of the flake that was run.
+        :return: Such folder.
+        :rtype: str
+        """
+        return self._flake_folder
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
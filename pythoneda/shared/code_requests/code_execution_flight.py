@@ -0,0 +1,169 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/code_execution_flight.py
+
+This file declares the CodeExecutionFlight class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .cell_output import CellOutput
+import asyncio
+from typing import AsyncIterator, Callable, List
+
+
+class CodeExecutionFlight:
+    """
+    A single run of a code request, shared by everyone asking for it.
+
+    Class name: CodeExecutionFlight
+
+    Responsibilities:
+        - Consumes the output of the run in a task of its own.
+        - Keeps the output, so that late followers get it from the start.
+        - Streams the output to each follower as it arrives.
+        - Cancels the run once nobody follows it anymore.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CellOutput
+        - pythoneda.shared.code_requests.CodeExecutionCoalescer
+    """
+
+    def __init__(self, outputs: AsyncIterator, onFinished: Callable = None):
+        """
+        Creates a new CodeExecutionFlight instance, and starts consuming the output.
+        Must be called from within a running event loop.
+        :param outputs: The output of the run.
+        :type outputs: AsyncIterator[pythoneda.shared.code_requests.CellOutput]
+        :param onFinished: Called with the flight once the run ends, if any.
+        :type onFinished: Callable[[pythoneda.shared.code_requests.CodeExecutionFlight], None]
+        """
+        super().__init__()
+        self._outputs = []
+        self._error = None
+        self._finished = False
+        self._abandoned = False
+        self._followers = 0
+        self._changed = asyncio.Event()
+        self._on_finished = onFinished
+        self._task = asyncio.create_task(self._consume(outputs))
+
+    @property
+    def outputs(self) -> List[CellOutput]:
+        """
+        Retrieves the output received so far.
+        :return: A copy of such output.
+        :rtype: List[pythoneda.shared.code_requests.CellOutput]
+        """
+        return list(self._outputs)
+
+    @property
+    def error(self) -> Exception:
+        """
+        Retrieves the error that ended the run.
+        :return: Such error, or None.
+        :rtype: Exception
+        """
+        return self._error
+
+    @property
+    def finished(self) -> bool:
+        """
+        Checks whether the run has ended.
+        :return: True in such case.
+        :rtype: bool
+        """
+        return self._finished
+
+    @property
+    def abandoned(self) -> bool:
+        """
+        Checks whether the run was cancelled because nobody followed it anymore.
+        :return: True in such case.
+        :rtype: bool
+        """
+        return self._abandoned
+
+    @property
+    def followers(self) -> int:
+        """
+        Retrieves the number of followers.
+        :return: Such number.
+        :rtype: int
+        """
+        return self._followers
+
+    async def _consume(self, outputs: AsyncIterator):
+        """
+        Consumes the output of the run.
+        :param outputs: Such output.
+        :type outputs: AsyncIterator[pythoneda.shared.code_requests.CellOutput]
+        """
+        try:
+            async for output in outputs:
+                self._outputs.append(output)
+                self._notify()
+        except Exception as error:
+            self._error = error
+        finally:
+            self._finished = True
+            self._notify()
+            if self._on_finished is not None:
+                self._on_finished(self)
+
+    def _notify(self):
+        """
+        Wakes up the followers waiting for more output.
+        """
+        changed = self._changed
+        self._changed = asyncio.Event()
+        changed.set()
+
+    async def follow(self) -> AsyncIterator[CellOutput]:
+        """
+        Streams the output of the run, from the start.
+        Raises the error that ended the run, if any.
+        :return: The output lines, as they are printed.
+        :rtype: AsyncIterator[pythoneda.shared.code_requests.CellOutput]
+        """
+        self._followers += 1
+        position = 0
+        try:
+            while True:
+                if position < len(self._outputs):
+                    output = self._outputs[position]
+                    position += 1
+                    yield output
+                elif self._finished:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                else:
+                    await self._changed.wait()
+        finally:
+            self._followers -= 1
+            if self._followers == 0 and not self._finished:
+                self._abandoned = True
+                self._task.cancel()
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,205 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/code_execution_kernel.py
+
+This file declares the CodeExecutionKernel class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+class CodeExecutionKernel:
+    """
+    Long-lived worker running generated code requests one after another.
+
+    Its source is passed to the interpreter of the worker process, so it
+    depends on the standard library only, and imports it locally.
+    Each request runs in fresh globals, but the modules it imports stay loaded
+    for the next ones.
+
+    Frames are a 4-byte big-endian length followed by a UTF-8 JSON object:
+        - requests: {"code": str}
+        - replies: {"output": str}, and finally {"done": true, "error": str | null, "status": int, "rss": int}
+
+    Class name: CodeExecutionKernel
+
+    Responsibilities:
+        - Reads code from its standard input, and runs it.
+        - Streams what the code prints, line by line.
+        - Reports the outcome and the memory in use after each request.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeExecutionKernelPool
+    """
+
+    def __init__(self, channel, requests):
+        """
+        Creates a new CodeExecutionKernel instance.
+        :param channel: The binary stream to send replies to.
+        :type channel: io.BufferedIOBase
+        :param requests: The binary stream to read requests from.
+        :type requests: io.BufferedIOBase
+        """
+        super().__init__()
+        self._channel = channel
+        self._requests = requests
+        self._pending = ""
+
+    @classmethod
+    def serve(cls):
+        """
+        Serves requests until the standard input gets closed.
+        """
+        import os
+        import sys
+
+        # the protocol owns the original stdout; stray writes to it go to stderr
+        channel = os.fdopen(os.dup(1), "wb")
+        os.dup2(2, 1)
+        kernel = cls(channel, sys.stdin.buffer)
+        while True:
+            request = kernel.receive()
+            if request is None:
+                break
+            kernel.execute(request["code"])
+
+    @classmethod
+    def read_frame(cls, stream):
+        """
+        Reads a frame.
+        :param stream: The binary stream.
+        :type stream: io.BufferedIOBase
+        :return: The decoded object, or None at the end of the stream.
+        :rtype: dict
+        """
+        import json
+
+        header = stream.read(4)
+        if len(header) < 4:
+            return None
+        size = int.from_bytes(header, "big")
+        data = stream.read(size)
+        if len(data) < size:
+            return None
+        return json.loads(data.decode("utf-8"))
+
+    @classmethod
+    def write_frame(cls, stream, value: dict):
+        """
+        Writes a frame.
+        :param stream: The binary stream.
+        :type stream: io.BufferedIOBase
+        :param value: The object to send.
+        :type value: dict
+        """
+        import json
+
+        data = json.dumps(value).encode("utf-8")
+        stream.write(len(data).to_bytes(4, "big") + data)
+        stream.flush()
+
+    def receive(self) -> dict:
+        """
+        Waits for the next request.
+        :return: The request, or None if there are no more.
+        :rtype: dict
+        """
+        return self.read_frame(self._requests)
+
+    def write(self, text: str) -> int:
+        """
+        Collects what the code prints, sending each completed line.
+        :param text: The printed text.
+        :type text: str
+        :return: The number of characters written.
+        :rtype: int
+        """
+        self._pending += text
+        end = self._pending.rfind("\n")
+        if end >= 0:
+            self.write_frame(self._channel, {"output": self._pending[: end + 1]})
+            self._pending = self._pending[end + 1 :]
+        return len(text)
+
+    def flush(self):
+        """
+        Sends any incomplete line.
+        """
+        if self._pending:
+            self.write_frame(self._channel, {"output": self._pending})
+            self._pending = ""
+
+    def execute(self, code: str):
+        """
+        Runs given code in fresh globals, and sends the outcome.
+        :param code: The code.
+        :type code: str
+        """
+        import sys
+        import traceback
+
+        namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+        error = None
+        status = 0
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = self
+        try:
+            exec(compile(code, "code_request.py", "exec"), namespace)
+        except SystemExit as exit:
+            if exit.code not in (None, 0):
+                status = exit.code if isinstance(exit.code, int) else 1
+                error = f"SystemExit: {exit.code}"
+        except BaseException:
+            error = traceback.format_exc()
+            status = 1
+            self.write(error)
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+            self.flush()
+        self.write_frame(
+            self._channel,
+            {"done": True, "error": error, "status": status, "rss": self.rss()},
+        )
+
+    @classmethod
+    def rss(cls) -> int:
+        """
+        Retrieves the memory in use by this process.
+        :return: The resident set size, in bytes.
+        :rtype: int
+        """
+        import os
+
+        try:
+            with open("/proc/self/statm", "r") as statm:
+                return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            import resource
+            import sys
+
+            # the peak, as the current size isn't available here
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == "darwin" else peak * 1024
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,443 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/code_execution_kernel_pool.py
+
+This file declares the CodeExecutionKernelPool class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .cell_output import CellOutput
+from .code_execution_error import CodeExecutionError
+from .code_execution_kernel import CodeExecutionKernel
+from .code_execution_nix_flake import CodeExecutionNixFlake
+from .code_request import CodeRequest
+from .dependency_environment_pool import DependencyEnvironmentPool
+from collections import OrderedDict
+import contextlib
+import inspect
+import subprocess
+import sys
+import threading
+from typing import Iterator, List
+
+
+class CodeExecutionKernelPool:
+    """
+    Warm worker processes, one per dependency set, running code requests without paying startup costs again.
+
+    Class name: CodeExecutionKernelPool
+
+    Responsibilities:
+        - Starts a CodeExecutionKernel process per dependency set, on demand.
+        - Sends it the code of each request, and streams back its output per cell.
+        - Recycles kernels after a number of requests, or when they use too much memory.
+        - Stops the least recently used idle kernels beyond a limit.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeExecutionKernel
+        - pythoneda.shared.code_requests.CodeExecutionNixFlake
+        - pythoneda.shared.code_requests.DependencyEnvironmentPool
+    """
+
+    DEFAULT_COMMAND = [sys.executable, "-c", "{source}"]
+
+    DEFAULT_ENVIRONMENT_COMMAND = [
+        "nix",
+        "develop",
+        "{environment}",
+        "--command",
+        "python",
+        "-c",
+        "{source}",
+    ]
+
+    _source = None
+
+    def __init__(
+        self,
+        maxRequestsPerKernel: int = 100,
+        maxMemory: int = None,
+        maxKernels: int = None,
+        timeout: float = None,
+        command: List = None,
+        environments: DependencyEnvironmentPool = None,
+    ):
+        """
+        Creates a new CodeExecutionKernelPool instance.
+        :param maxRequestsPerKernel: The number of requests after which a kernel is replaced.
+        :type maxRequestsPerKernel: int
+        :param maxMemory: The resident bytes above which a kernel is replaced after a request, if any.
+        :type maxMemory: int
+        :param maxKernels: The maximum number of kernels to keep running, if any.
+        :type maxKernels: int
+        :param timeout: The maximum number of seconds each request can run, if any.
+        :type timeout: float
+        :param command: The command starting a kernel. "{source}" gets replaced with its code,
+        and "{environment}" with the environment folder when using environments.
+        :type command: List[str]
+        :param environments: The shared environments, if any. When provided, each kernel
+        runs in the environment of its dependency set.
+        :type environments: pythoneda.shared.code_requests.DependencyEnvironmentPool
+        """
+        super().__init__()
+        self._max_requests_per_kernel = maxRequestsPerKernel
+        self._max_memory = maxMemory
+        self._max_kernels = maxKernels
+        self._timeout = timeout
+        if command is None:
+            if environments is None:
+                command = self.DEFAULT_COMMAND
+            else:
+                command = self.DEFAULT_ENVIRONMENT_COMMAND
+        self._command = list(command)
+        self._environments = environments
+        self._lock = threading.Lock()
+        # key -> [process, lock, requests, environment], least recently used first
+        self._kernels = OrderedDict()
+
+    @property
+    def max_requests_per_kernel(self) -> int:
+        """
+        Retrieves the number of requests after which a kernel is replaced.
+        :return: Such number.
+        :rtype: int
+        """
+        return self._max_requests_per_kernel
+
+    @property
+    def max_memory(self) -> int:
+        """
+        Retrieves the resident bytes above which a kernel is replaced.
+        :return: Such limit, or None if unbounded.
+        :rtype: int
+        """
+        return self._max_memory
+
+    @property
+    def max_kernels(self) -> int:
+        """
+        Retrieves the maximum number of kernels to keep running.
+        :return: Such limit, or None if unbounded.
+        :rtype: int
+        """
+        return self._max_kernels
+
+    @property
+    def timeout(self) -> float:
+        """
+        Retrieves the maximum number of seconds each request can run.
+        :return: Such timeout, or None if unbounded.
+        :rtype: float
+        """
+        return self._timeout
+
+    def __len__(self) -> int:
+        """
+        Retrieves the number of kernels running.
+        :return: Such number.
+        :rtype: int
+        """
+        with self._lock:
+            return sum(
+                1
+                for entry in self._kernels.values()
+                if entry[0] is not None and entry[0].poll() is None
+            )
+
+    def __enter__(self):
+        """
+        Uses this pool as a context manager.
+        :return: This instance.
+        :rtype: pythoneda.shared.code_requests.CodeExecutionKernelPool
+        """
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        """
+        Stops all kernels when leaving the context.
+        """
+        self.close()
+
+    @classmethod
+    def kernel_source(cls) -> str:
+        """
+        Retrieves the code a kernel process runs.
+        :return: The source of CodeExecutionKernel, and the call serving requests.
+        :rtype: str
+        """
+        if cls._source is None:
+            cls._source = (
+                inspect.getsource(CodeExecutionKernel)
+                + "\n\nCodeExecutionKernel.serve()\n"
+            )
+        return cls._source
+
+    def run(
+        self,
+        request: CodeRequest,
+        timeout: float = None,
+        interruption: threading.Event = None,
+    ) -> Iterator[CellOutput]:
+        """
+        Runs given request in the kernel of its dependency set.
+        :param request: The request.
+        :type request: pythoneda.shared.code_requests.CodeRequest
+        :param timeout: The maximum number of seconds the request can run, if lower than the timeout of the pool.
+        :type timeout: float
+        :param interruption: Stops the run, killing the kernel, once set from another thread. It gets set as well once the run ends, so it can't be reused.
+        :type interruption: threading.Event
+        :return: The output lines, as they are printed.
+        :rtype: Iterator[pythoneda.shared.code_requests.CellOutput]
+        """
+        spec = request.nix_flake_spec
+        flake = CodeExecutionNixFlake(spec.code_request, [], cellMarkers=True)
+        code = "".join(flake.code_chunks())
+        if self._timeout is not None and (timeout is None or timeout > self._timeout):
+            timeout = self._timeout
+        entry = self._acquire(spec)
+        process = entry[0]
+        done = None
+        watcher = None
+        if timeout is not None or interruption is not None:
+            if interruption is None:
+                interruption = threading.Event()
+            # [whether the run ended], and the lock guarding it, so that the
+            # kernel is never killed once it may be serving another request
+            ended = [False, threading.Lock()]
+            watcher = threading.Thread(
+                target=self._watch,
+                args=(process, timeout, interruption, ended),
+                daemon=True,
+            )
+            watcher.start()
+        try:
+            CodeExecutionKernel.write_frame(process.stdin, {"code": code})
+            marker = CodeExecutionNixFlake.CELL_MARKER
+            cell_index = None
+            while True:
+                frame = CodeExecutionKernel.read_frame(process.stdout)
+                if frame is None:
+                    # the kernel died, or was killed on timeout
+                    raise CodeExecutionError(process.wait(), self._describe(process))
+                if frame.get("done"):
+                    done = frame
+                    break
+                # not splitlines(), which also breaks at the marker's separator
+                lines = frame["output"].split("\n")
+                if lines[-1] == "":
+                    lines.pop()
+                for text in lines:
+                    if text.startswith(marker) and text[len(marker) :].isdigit():
+                        cell_index = int(text[len(marker) :])
+                    else:
+                        yield CellOutput(cell_index, text)
+        except BrokenPipeError:
+            raise CodeExecutionError(process.wait(), self._describe(process))
+        finally:
+            if watcher is not None:
+                with ended[1]:
+                    ended[0] = True
+                interruption.set()
+            self._release(entry, done)
+        if done["error"] is not None:
+            raise CodeExecutionError(done["status"], self._describe(process))
+
+    @classmethod
+    def _watch(
+        cls,
+        process: subprocess.Popen,
+        timeout: float,
+        interruption: threading.Event,
+        ended: List,
+    ):
+        """
+        Kills a kernel once its run times out or gets interrupted, unless it already ended.
+        :param process: The kernel process.
+        :type process: subprocess.Popen
+        :param timeout: The maximum number of seconds the run can take, if any.
+        :type timeout: float
+        :param interruption: Set once the run gets interrupted, or ends.
+        :type interruption: threading.Event
+        :param ended: Whether the run ended, and the lock guarding it.
+        :type ended: List
+        """
+        interruption.wait(timeout)
+        with ended[1]:
+            if not ended[0]:
+                process.kill()
+
+    def close(self):
+        """
+        Stops all kernels.
+        """
+        with self._lock:
+            entries = list(self._kernels.values())
+            self._kernels.clear()
+        for entry in entries:
+            with entry[1]:
+                self._stop(entry)
+
+    def _acquire(self, spec) -> List:
+        """
+        Takes the kernel for given flake spec, starting it if needed.
+        :param spec: The flake spec.
+        :type spec: pythoneda.shared.code_requests.CodeRequestNixFlakeSpec
+        :return: The kernel entry, locked.
+        :rtype: List
+        """
+        key = spec.code_request.dependency_set
+        while True:
+            with self._lock:
+                entry = self._kernels.get(key)
+                if entry is None:
+                    entry = [None, threading.Lock(), 0, None]
+                    self._kernels[key] = entry
+                self._kernels.move_to_end(key)
+            entry[1].acquire()
+            with self._lock:
+                current = self._kernels.get(key) is entry
+            if current:
+                break
+            # stopped while waiting for it
+            entry[1].release()
+        try:
+            if entry[0] is None or entry[0].poll() is not None:
+                self._stop(entry)
+                self._start(entry, spec)
+        except BaseException:
+            entry[1].release()
+            raise
+        return entry
+
+    def _release(self, entry: List, done: dict):
+        """
+        Gives back a kernel, replacing it if it's no longer usable.
+        :param entry: The kernel entry.
+        :type entry: List
+        :param done: The outcome of its last request, or None if it didn't complete.
+        :type done: dict
+        """
+        try:
+            if done is None:
+                # the request was abandoned halfway: the kernel can't be trusted
+                self._stop(entry, kill=True)
+            else:
+                entry[2] += 1
+                if entry[2] >= self._max_requests_per_kernel or (
+                    self._max_memory is not None and done["rss"] > self._max_memory
+                ):
+                    self._stop(entry)
+        finally:
+            entry[1].release()
+        self._evict()
+
+    def _evict(self):
+        """
+        Stops the least recently used idle kernels beyond the limit.
+        """
+        if self._max_kernels is None:
+            return
+        evicted = []
+        with self._lock:
+            excess = len(self._kernels) - self._max_kernels
+            for key, entry in list(self._kernels.items()):
+                if excess <= 0:
+                    break
+                if entry[1].acquire(blocking=False):
+                    del self._kernels[key]
+                    evicted.append(entry)
+                    excess -= 1
+        for entry in evicted:
+            try:
+                self._stop(entry)
+            finally:
+                entry[1].release()
+
+    def _start(self, entry: List, spec):
+        """
+        Starts a kernel process.
+        :param entry: The kernel entry.
+        :type entry: List
+        :param spec: The flake spec.
+        :type spec: pythoneda.shared.code_requests.CodeRequestNixFlakeSpec
+        """
+        environment = None
+        if self._environments is not None:
+            environment = self._environments.acquire(spec)
+        try:
+            command = [
+                part.replace("{source}", self.kernel_source()).replace(
+                    "{environment}", str(environment)
+                )
+                for part in self._command
+            ]
+            process = subprocess.Popen(
+                command, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+            )
+        except BaseException:
+            if environment is not None:
+                self._environments.release(environment)
+            raise
+        entry[0] = process
+        entry[2] = 0
+        entry[3] = environment
+
+    def _stop(self, entry: List, kill: bool = False):
+        """
+        Stops the process of given kernel, if any.
+        :param entry: The kernel entry.
+        :type entry: List
+        :param kill: Whether to kill it right away, instead of letting it finish.
+        :type kill: bool
+        """
+        process = entry[0]
+        if process is not None:
+            if kill:
+                process.kill()
+            with contextlib.suppress(OSError):
+                process.stdin.close()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+        entry[0] = None
+        entry[2] = 0
+        if entry[3] is not None:
+            self._environments.release(entry[3])
+            entry[3] = None
+
+    @classmethod
+    def _describe(cls, process: subprocess.Popen) -> str:
+        """
+        Describes given kernel, for error messages.
+        :param process: The kernel process.
+        :type process: subprocess.Popen
+        :return: The description.
+        :rtype: str
+        """
+        return f"kernel {process.pid}"
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
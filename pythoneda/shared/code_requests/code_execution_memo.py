@@ -0,0 +1,321 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/code_execution_memo.py
+
+This file declares the CodeExecutionMemo class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+class CodeExecutionMemo:
+    """
+    Runtime support for skipping the code cells whose results are already known.
+
+    Its source is copied verbatim into the generated code_request.py, so it
+    depends on the standard library only, and imports it locally.
+
+    Class name: CodeExecutionMemo
+
+    Responsibilities:
+        - Identifies each run of a cell by its code, the code it depends on, and the values it reads, directly or through the functions it calls.
+        - Runs the cell as usual when any such value can't be pickled.
+        - Stores what the cell printed and the values it wrote, when they can be pickled.
+        - Replays them instead of running the cell again.
+        - Evicts the least recently used results beyond a size budget.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeExecutionNixFlake
+    """
+
+    FOLDER_VARIABLE = "PYTHONEDA_MEMO_FOLDER"
+
+    MAX_BYTES_VARIABLE = "PYTHONEDA_MEMO_MAX_BYTES"
+
+    DEFAULT_FOLDER = ".pythoneda-memo"
+
+    DEFAULT_MAX_BYTES = 1 << 30
+
+    def __init__(self, namespace: dict, folder: str = None, maxBytes: int = None):
+        """
+        Creates a new CodeExecutionMemo instance.
+        :param namespace: The globals of the running code.
+        :type namespace: dict
+        :param folder: The folder to store the results in. Defaults to the PYTHONEDA_MEMO_FOLDER variable, or to .pythoneda-memo.
+        :type folder: str
+        :param maxBytes: The maximum size of the stored results. Defaults to the PYTHONEDA_MEMO_MAX_BYTES variable, or to 1 GiB.
+        :type maxBytes: int
+        """
+        import os
+
+        super().__init__()
+        self._namespace = namespace
+        if folder is None:
+            folder = os.environ.get(self.FOLDER_VARIABLE, self.DEFAULT_FOLDER)
+        self._folder = folder
+        if maxBytes is None:
+            maxBytes = int(
+                os.environ.get(self.MAX_BYTES_VARIABLE) or self.DEFAULT_MAX_BYTES
+            )
+        self._max_bytes = maxBytes
+        self._path = None
+        self._entry = None
+        self._printed = None
+        self._stdout = None
+
+    @property
+    def folder(self) -> str:
+        """
+        Retrieves the folder with the stored results.
+        :return: Such folder.
+        :rtype: str
+        """
+        return self._folder
+
+    @property
+    def max_bytes(self) -> int:
+        """
+        Retrieves the maximum size of the stored results.
+        :return: Such size.
+        :rtype: int
+        """
+        return self._max_bytes
+
+    def lookup(self, key: str, reads: list):
+        """
+        Finds the stored result of the cell about to run. If any value the cell
+        reads can't be pickled, its result is neither looked up nor stored.
+        :param key: The digest of the cell code, its dependencies, and the code of the cells it depends on.
+        :type key: str
+        :param reads: The names the cell reads, including through the functions it calls.
+        :type reads: List[str]
+        """
+        import hashlib
+        import os
+        import types
+
+        digest = hashlib.sha256(key.encode("utf-8"))
+        for name in reads:
+            if name not in self._namespace:
+                continue
+            value = self._namespace[name]
+            digest.update(f"\0{name}\0".encode("utf-8"))
+            # modules are covered by the inputs of the flake, and functions,
+            # pickled by name, by the code of the cells defining them
+            if not isinstance(value, types.ModuleType):
+                try:
+                    digest.update(hashlib.sha256(self._canonical(value)).digest())
+                except Exception:
+                    # it could have changed without the key telling
+                    self._path = None
+                    self._entry = None
+                    return
+        self._path = os.path.join(self._folder, f"{digest.hexdigest()}.pickle")
+        try:
+            with open(self._path, "rb") as entry:
+                self._entry = entry.read()
+        except OSError:
+            self._entry = None
+
+    def _canonical(self, value) -> bytes:
+        """
+        Pickles given value the same way in every process. Plain pickles of
+        sets depend on the order of their elements, which varies with the hash
+        seed of the process, so sets, including the ones inside lists, tuples
+        and dicts, get pickled sorted instead.
+        :param value: The value.
+        :type value: Any
+        :return: Such pickle.
+        :rtype: bytes
+        """
+        import pickle
+
+        kind = type(value)
+        if kind in (set, frozenset):
+            value = sorted(self._canonical(aux) for aux in value)
+        elif kind in (list, tuple):
+            value = [self._stable(aux) for aux in value]
+        elif kind is dict:
+            value = [
+                (self._stable(key), self._stable(aux)) for key, aux in value.items()
+            ]
+        else:
+            return pickle.dumps(value, 4)
+        return pickle.dumps((kind.__name__, value), 4)
+
+    def _stable(self, value):
+        """
+        Retrieves an element of a container in a form pickled the same way in
+        every process: the element itself, or, for containers, their canonical
+        pickle wrapped in a tuple, which no other element becomes.
+        :param value: The element.
+        :type value: Any
+        :return: Such form.
+        :rtype: Any
+        """
+        if type(value) in (set, frozenset, list, tuple, dict):
+            return (self._canonical(value),)
+        return value
+
+    def found(self) -> bool:
+        """
+        Checks whether the cell about to run has a stored result.
+        :return: True in such case.
+        :rtype: bool
+        """
+        return self._entry is not None
+
+    def restore(self) -> bool:
+        """
+        Replays the stored result of the cell about to run, or starts
+        capturing what it prints if there is none.
+        :return: True if the result was replayed, so the cell must not run.
+        :rtype: bool
+        """
+        import contextlib
+        import os
+        import pickle
+        import sys
+
+        entry = self._entry
+        self._entry = None
+        if entry is not None:
+            try:
+                printed, values, deleted = pickle.loads(entry)
+                restored = {name: pickle.loads(data) for name, data in values.items()}
+            except Exception:
+                restored = None
+            if restored is not None:
+                self._namespace.update(restored)
+                for name in deleted:
+                    self._namespace.pop(name, None)
+                sys.stdout.write(printed)
+                with contextlib.suppress(OSError):
+                    # recently used results are evicted last
+                    os.utime(self._path)
+                return True
+        self._printed = []
+        self._stdout = sys.stdout
+        sys.stdout = self
+        return False
+
+    def write(self, text: str) -> int:
+        """
+        Writes to the standard output, keeping a copy.
+        :param text: The text.
+        :type text: str
+        :return: The number of characters written.
+        :rtype: int
+        """
+        self._printed.append(text)
+        return self._stdout.write(text)
+
+    def flush(self):
+        """
+        Flushes the standard output.
+        """
+        self._stdout.flush()
+
+    def __getattr__(self, name: str):
+        """
+        Retrieves any other attribute of the standard output.
+        :param name: The attribute name.
+        :type name: str
+        :return: Its value.
+        :rtype: Any
+        """
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._stdout, name)
+
+    def save(self, writes: list):
+        """
+        Stores the result of the cell that just ran, unless any value it read
+        or wrote cannot be pickled.
+        :param writes: The names the cell writes.
+        :type writes: List[str]
+        """
+        import contextlib
+        import os
+        import pickle
+        import sys
+        import types
+
+        sys.stdout = self._stdout
+        printed = "".join(self._printed)
+        self._printed = None
+        if self._path is None:
+            return
+        values = {}
+        deleted = []
+        for name in writes:
+            if name not in self._namespace:
+                deleted.append(name)
+                continue
+            value = self._namespace[name]
+            # restored cells import their modules again
+            if isinstance(value, types.ModuleType):
+                continue
+            try:
+                values[name] = pickle.dumps(value, 4)
+            except Exception:
+                return
+        os.makedirs(self._folder, exist_ok=True)
+        staging = f"{self._path}.{os.getpid()}.tmp"
+        try:
+            with open(staging, "wb") as entry:
+                pickle.dump((printed, values, deleted), entry, 4)
+            os.replace(staging, self._path)
+        except OSError:
+            # the cell ran fine; its result just won't be reused
+            with contextlib.suppress(OSError):
+                os.unlink(staging)
+            return
+        self._evict()
+
+    def _evict(self):
+        """
+        Removes the least recently used results until the rest fit the size budget.
+        """
+        import contextlib
+        import os
+
+        entries = []
+        total = 0
+        with os.scandir(self._folder) as found:
+            for aux in found:
+                if aux.name.endswith(".pickle"):
+                    with contextlib.suppress(OSError):
+                        stat = aux.stat()
+                        entries.append((stat.st_mtime_ns, stat.st_size, aux.path))
+                        total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self._max_bytes:
+                break
+            with contextlib.suppress(OSError):
+                os.unlink(path)
+                total -= size
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -19,13 +19,27 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
+from .cell import Cell
+from .cell_dataflow import CellDataflow
 from .code_cell import CodeCell
+from .code_execution_checkpoints import CodeExecutionCheckpoints
+from .code_execution_memo import CodeExecutionMemo
+from .code_execution_scheduler import CodeExecutionScheduler
 from .code_request import CodeRequest
 from .code_request_nix_flake import CodeRequestNixFlake
+from .instrumentation import Instrumentation
+import ast
+import contextlib
+import hashlib
+import inspect
+import io
+import itertools
+import json
+import os
 from pathlib import Path
 from pythoneda.shared.git import GitAdd
 from pythoneda.shared.nix.flake.licenses import Gpl3
-from typing import List
+from typing import Dict, Iterator, List, Tuple
 
 
 class CodeExecutionNixFlake(CodeRequestNixFlake):
@@ -42,14 +56,58 @@ class CodeExecutionNixFlake(CodeRequestNixFlake):
         - None
     """
 
-    def __init__(self, codeRequest: CodeRequest, inputs: List):
+    CELL_MARKER = "\x1epythoneda-cell:"
+
+    _WRITE_BUFFER_SIZE = 1 << 16
+
+    _LINES_PER_PIECE = 4096
+
+    _FINGERPRINTS_FILE = ".code_request.fingerprints"
+
+    _FINGERPRINT_VERSION = "2"
+
+    _DEFINITIONS = (
+        ast.Import,
+        ast.ImportFrom,
+        ast.FunctionDef,
+        ast.AsyncFunctionDef,
+        ast.ClassDef,
+    )
+
+    _checkpoints_source = None
+
+    _scheduler_source = None
+
+    _memo_source = None
+
+    def __init__(
+        self,
+        codeRequest: CodeRequest,
+        inputs: List,
+        cellMarkers: bool = False,
+        checkpoints: bool = False,
+        parallelCells: bool = False,
+        memoizeCells: bool = False,
+    ):
         """
         Creates a new CodeRequestNixFlake instance.
         :param codeRequest: The code request.
         :type codeRequest: pythoneda.shared.code_requests.CodeRequest
         :param inputs: The resolved dependencies as NixFlakes.
         :type inputs: List
+        :param cellMarkers: Whether the code announces each cell in its output.
+        :type cellMarkers: bool
+        :param checkpoints: Whether the code snapshots its globals after each code cell, and resumes from the latest valid snapshot.
+        :type checkpoints: bool
+        :param parallelCells: Whether the code runs the code cells not depending on each other at the same time.
+        :type parallelCells: bool
+        :param memoizeCells: Whether the code skips the code cells whose stored results still apply.
+        :type memoizeCells: bool
         """
+        if [checkpoints, parallelCells, memoizeCells].count(True) > 1:
+            raise ValueError(
+                "Checkpoints, parallel cells and memoized cells cannot be combined"
+            )
         super().__init__(
             codeRequest,
             "code-execution",
@@ -64,6 +122,10 @@ class CodeExecutionNixFlake(CodeRequestNixFlake):
             "rydnr",
             "code_execution",
         )
+        self._cell_markers = cellMarkers
+        self._checkpoints = checkpoints
+        self._parallel_cells = parallelCells
+        self._memoize_cells = memoizeCells
 
     @classmethod
     def empty(cls):
@@ -74,15 +136,74 @@ class CodeExecutionNixFlake(CodeRequestNixFlake):
         """
         return cls(None, [])
 
+    @property
+    def cell_markers(self) -> bool:
+        """
+        Checks whether the generated code prints a marker line
+        (CELL_MARKER followed by the cell index) before each cell's output.
+        :return: True in such case.
+        :rtype: bool
+        """
+        return self._cell_markers
+
+    @property
+    def checkpoints(self) -> bool:
+        """
+        Checks whether the generated code snapshots its globals after each code cell,
+        and skips the cells up to the latest snapshot still matching the code.
+        :return: True in such case.
+        :rtype: bool
+        """
+        return self._checkpoints
+
+    @property
+    def parallel_cells(self) -> bool:
+        """
+        Checks whether the generated code runs the code cells in a thread pool,
+        each one as soon as the cells it depends on are done.
+        :return: True in such case.
+        :rtype: bool
+        """
+        return self._parallel_cells
+
+    @property
+    def memoize_cells(self) -> bool:
+        """
+        Checks whether the generated code stores what each code cell prints and
+        writes, and replays it instead of running the cell again while its code,
+        the code it depends on and the values it reads are the same.
+        :return: True in such case.
+        :rtype: bool
+        """
+        return self._memoize_cells
+
     def generate_files(self, flakeFolder: str):
         """
         Generates the files.
         :param flakeFolder: The flake folder.
         :type flakeFolder: str
         """
-        super().generate_files(flakeFolder)
-        self.generate_code(flakeFolder)
-        self.generate_entrypoint(flakeFolder)
+        with Instrumentation.current().span(
+            "CodeExecutionNixFlake.generate_files",
+            cells=len(self.code_request.cells),
+        ):
+            super().generate_files(flakeFolder)
+            self.generate_code(flakeFolder)
+            self.generate_entrypoint(flakeFolder)
+
+    def regenerate_files(self, flakeFolder: str):
+        """
+        Generates the files again, rewriting only the changed cells of code_request.py.
+        :param flakeFolder: The flake folder.
+        :type flakeFolder: str
+        """
+        with Instrumentation.current().span(
+            "CodeExecutionNixFlake.regenerate_files",
+            cells=len(self.code_request.cells),
+        ):
+            super().generate_files(flakeFolder)
+            self.regenerate_code(flakeFolder)
+            self.generate_entrypoint(flakeFolder)
 
     def generate_code(self, flakeFolder: str):
         """
@@ -90,29 +211,537 @@ class CodeExecutionNixFlake(CodeRequestNixFlake):
         :param flakeFolder: The flake folder.
         :type flakeFolder: str
         """
-        with open(Path(flakeFolder) / "code_request.py", "w") as output_file:
-            output_file.write("_pythoneda_no_error_so_far = True\n")
-            for cell in self.code_request.cells:
-                if isinstance(cell, CodeCell):
-                    # TODO: find a non-hardcoded way to prevent the script to continue
-                    output_file.write("\nif _pythoneda_no_error_so_far:")
-                    output_file.write('\n    print("```")\n')
-                    for line in [
-                        line for line in cell.contents.splitlines() if line.rstrip()
-                    ]:
-                        output_file.write(f"    print({repr(line)})\n")
-                    output_file.write('    print("```")\n')
-                    for line in [
-                        line for line in cell.contents.splitlines() if line.rstrip()
-                    ]:
-                        output_file.write(f"    {line}\n")
-                else:
-                    first_time = True
-                    for line in cell.contents.splitlines():
-                        if first_time:
-                            output_file.write("\nif _pythoneda_no_error_so_far:")
-                            first_time = False
-                        output_file.write(f"\n    print({repr(line)})")
+        with Instrumentation.current().span("CodeExecutionNixFlake.generate_code"):
+            self._write_code_blocks(Path(flakeFolder), None)
+
+    def regenerate_code(self, flakeFolder: str) -> bool:
+        """
+        Generates the code.py file again, copying the blocks of unchanged cells
+        from the previous one. The file is not touched if no cell has changed.
+        :param flakeFolder: The flake folder.
+        :type flakeFolder: str
+        :return: True if the file was written.
+        :rtype: bool
+        """
+        folder = Path(flakeFolder)
+        with Instrumentation.current().span("CodeExecutionNixFlake.regenerate_code"):
+            previous = self._load_fingerprints(folder)
+            fingerprints = self._fingerprints()
+            if previous is not None and fingerprints == [
+                block[0] for block in previous
+            ]:
+                return False
+            self._write_code_blocks(folder, previous, fingerprints)
+            return True
+
+    def _fingerprints(self) -> List[str]:
+        """
+        Computes the fingerprints of the header and of each cell.
+        :return: Such fingerprints, in file order.
+        :rtype: List[str]
+        """
+        result = [
+            hashlib.sha256(self.header_chunk().encode("utf-8")).hexdigest()
+        ]
+        plans = self.cell_plans()
+        for index, cell in enumerate(self.code_request.cells):
+            result.append(self.cell_fingerprint(cell, index, plans.get(index)))
+        if self.parallel_cells:
+            result.append(
+                hashlib.sha256(self.footer_chunk().encode("utf-8")).hexdigest()
+            )
+        return result
+
+    def cell_fingerprint(self, cell: Cell, index: int, plan=None) -> str:
+        """
+        Computes the fingerprint of the code generated for given cell.
+        :param cell: The cell.
+        :type cell: pythoneda.shared.code_requests.Cell
+        :param index: The position of the cell in the request.
+        :type index: int
+        :param plan: How the code of the cell relates to other cells, if it does (see cell_plans()).
+        :type plan: Any
+        :return: The hex digest.
+        :rtype: str
+        """
+        digest = hashlib.sha256(self._FINGERPRINT_VERSION.encode("utf-8"))
+        if self.checkpoints:
+            digest.update(b"checkpoints\0")
+        if self.parallel_cells:
+            # the generated call names the cells to wait for
+            digest.update(f"parallel\0{plan}\0".encode("utf-8"))
+        elif self.memoize_cells:
+            digest.update(f"memo\0{plan}\0".encode("utf-8"))
+        if self.cell_markers or self.checkpoints or self.parallel_cells:
+            digest.update(f"{index}\0".encode("utf-8"))
+        # it covers the kind of cell as well, and is cached on the cell
+        digest.update(cell.digest().encode("ascii"))
+        return digest.hexdigest()
+
+    def _load_fingerprints(self, folder: Path) -> List:
+        """
+        Loads the fingerprints of the blocks of the current code_request.py.
+        :param folder: The flake folder.
+        :type folder: pathlib.Path
+        :return: The [fingerprint, offset, length] blocks, or None if they don't match the file.
+        :rtype: List[List]
+        """
+        try:
+            stat = (folder / "code_request.py").stat()
+            with open(folder / self._FINGERPRINTS_FILE, "r") as fingerprints_file:
+                contents = json.load(fingerprints_file)
+        except (OSError, ValueError):
+            return None
+        if (
+            contents.get("version") != self._FINGERPRINT_VERSION
+            or contents.get("size") != stat.st_size
+            or contents.get("mtime_ns") != stat.st_mtime_ns
+        ):
+            # code_request.py was changed behind our back
+            return None
+        return contents.get("blocks")
+
+    def _write_code_blocks(
+        self, folder: Path, previous: List, fingerprints: List = None
+    ):
+        """
+        Writes code_request.py block by block, and the fingerprints next to it.
+        :param folder: The flake folder.
+        :type folder: pathlib.Path
+        :param previous: The blocks of the current file, to reuse, if any.
+        :type previous: List[List]
+        :param fingerprints: The fingerprints of the new blocks, if already computed.
+        :type fingerprints: List[str]
+        """
+        path = folder / "code_request.py"
+        reusable = {}
+        if previous is not None:
+            reusable = {block[0]: (block[1], block[2]) for block in previous}
+        cells = self.code_request.cells
+        if fingerprints is None:
+            fingerprints = self._fingerprints()
+        plans = self.cell_plans()
+        blocks = []
+        staging = path.with_name(f".{path.name}.tmp")
+        try:
+            with contextlib.ExitStack() as stack:
+                output = stack.enter_context(
+                    open(staging, "wb", buffering=self._WRITE_BUFFER_SIZE)
+                )
+                current = stack.enter_context(open(path, "rb")) if reusable else None
+                offset = 0
+                for position, fingerprint in enumerate(fingerprints):
+                    block = reusable.get(fingerprint)
+                    if block is not None:
+                        current.seek(block[0])
+                        parts = [current.read(block[1])]
+                    elif position == 0:
+                        parts = [self.header_chunk().encode("utf-8")]
+                    elif position > len(cells):
+                        parts = [self.footer_chunk().encode("utf-8")]
+                    else:
+                        index = position - 1
+                        parts = (
+                            piece.encode("utf-8")
+                            for piece in self.cell_pieces(
+                                cells[index], index, plans.get(index)
+                            )
+                        )
+                    length = 0
+                    for part in parts:
+                        output.write(part)
+                        length += len(part)
+                    blocks.append([fingerprint, offset, length])
+                    offset += length
+            os.replace(staging, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                staging.unlink()
+            raise
+        stat = path.stat()
+        with open(folder / self._FINGERPRINTS_FILE, "w") as fingerprints_file:
+            json.dump(
+                {
+                    "version": self._FINGERPRINT_VERSION,
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "blocks": blocks,
+                },
+                fingerprints_file,
+            )
+
+    def write_code(self, output):
+        """
+        Writes the code to given file-like object.
+        :param output: The destination: a text or binary file, pipe or buffer.
+        :type output: io.IOBase
+        """
+        binary = isinstance(output, (io.RawIOBase, io.BufferedIOBase))
+        header = self.header_chunk()
+        output.write(header.encode("utf-8") if binary else header)
+        plans = self.cell_plans()
+        for index, cell in enumerate(self.code_request.cells):
+            for piece in self.cell_pieces(cell, index, plans.get(index)):
+                output.write(piece.encode("utf-8") if binary else piece)
+        if self.parallel_cells:
+            footer = self.footer_chunk()
+            output.write(footer.encode("utf-8") if binary else footer)
+
+    def code_chunks(self) -> Iterator[str]:
+        """
+        Generates the code lazily, one chunk per cell.
+        :return: An iterator over the code chunks.
+        :rtype: Iterator[str]
+        """
+        yield self.header_chunk()
+        plans = self.cell_plans()
+        for index, cell in enumerate(self.code_request.cells):
+            yield self.cell_chunk(cell, index, plans.get(index))
+        if self.parallel_cells:
+            yield self.footer_chunk()
+
+    def header_chunk(self) -> str:
+        """
+        Generates the code preceding the cells.
+        :return: The code.
+        :rtype: str
+        """
+        result = "_pythoneda_no_error_so_far = True\n"
+        if self.checkpoints:
+            digests = [
+                hashlib.sha256(cell.encoded_contents()).hexdigest()
+                if isinstance(cell, CodeCell)
+                else None
+                for cell in self.code_request.cells
+            ]
+            result += "".join(
+                [
+                    "\n\n",
+                    self.checkpoints_source(),
+                    "\n\n",
+                    "_pythoneda_checkpoints = CodeExecutionCheckpoints(",
+                    f"globals(), {repr(digests)})\n",
+                ]
+            )
+        elif self.parallel_cells:
+            marker = self.CELL_MARKER if self.cell_markers else None
+            result += "".join(
+                [
+                    "\n\n",
+                    self.scheduler_source(),
+                    "\n\n",
+                    "_pythoneda_scheduler = CodeExecutionScheduler(",
+                    f"globals(), {repr(marker)})\n",
+                ]
+            )
+        elif self.memoize_cells:
+            result += "".join(
+                [
+                    "\n\n",
+                    self.memo_source(),
+                    "\n\n",
+                    "_pythoneda_memo = CodeExecutionMemo(globals())\n",
+                ]
+            )
+        return result
+
+    def footer_chunk(self) -> str:
+        """
+        Generates the code following the cells, when running cells in parallel.
+        :return: The code.
+        :rtype: str
+        """
+        return "\n_pythoneda_scheduler.run()\n"
+
+    def cell_dependencies(self) -> Dict[int, List[int]]:
+        """
+        Finds the cells each code cell depends on, when running cells in parallel.
+        :return: The positions of such cells, per position of each code cell.
+        :rtype: Dict[int, List[int]]
+        """
+        return CellDataflow.dependencies(self.code_request.cells)
+
+    def cell_memos(self) -> Dict[int, Tuple[str, List[str], List[str]]]:
+        """
+        Identifies each code cell by its contents and dependencies, the inputs
+        of the flake, and the identities of the cells it depends on; and finds
+        the names it reads and writes, including through the functions it calls.
+        Cells whose effects reach beyond their globals, such as the ones calling
+        into modules or writing files, can't be replayed, so they get no names.
+        :return: Such identity and names, per position of each code cell.
+        :rtype: Dict[int, Tuple[str, List[str], List[str]]]
+        """
+        cells = self.code_request.cells
+        inputs = json.dumps([[aux.name, aux.version, aux.url] for aux in self.inputs])
+        result = {}
+        for index, (after, reads, writes, barrier) in CellDataflow.effects(
+            cells
+        ).items():
+            digest = hashlib.sha256(cells[index].digest().encode("ascii"))
+            digest.update(inputs.encode("utf-8"))
+            for aux in after:
+                digest.update(result[aux][0].encode("utf-8"))
+            # pseudo-names stand for the state of modules and of the process
+            if barrier or any(name.startswith("<") for name in writes):
+                result[index] = (digest.hexdigest(), None, None)
+            else:
+                result[index] = (
+                    digest.hexdigest(),
+                    sorted(name for name in reads if not name.startswith("<")),
+                    sorted(writes),
+                )
+        return result
+
+    def cell_plans(self) -> Dict:
+        """
+        Finds how the code of each code cell relates to other cells: the cells
+        it waits for when running cells in parallel, or its identity and the
+        names it reads and writes when memoizing them.
+        :return: Such plan, per position of each code cell; empty otherwise.
+        :rtype: Dict[int, Any]
+        """
+        if self.parallel_cells:
+            return self.cell_dependencies()
+        if self.memoize_cells:
+            return self.cell_memos()
+        return {}
+
+    @classmethod
+    def checkpoints_source(cls) -> str:
+        """
+        Retrieves the source of the checkpoints runtime, copied into the generated code.
+        :return: The source of the CodeExecutionCheckpoints class.
+        :rtype: str
+        """
+        if cls._checkpoints_source is None:
+            cls._checkpoints_source = inspect.getsource(CodeExecutionCheckpoints)
+        return cls._checkpoints_source
+
+    @classmethod
+    def scheduler_source(cls) -> str:
+        """
+        Retrieves the source of the scheduler runtime, copied into the generated code.
+        :return: The source of the CodeExecutionScheduler class.
+        :rtype: str
+        """
+        if cls._scheduler_source is None:
+            cls._scheduler_source = inspect.getsource(CodeExecutionScheduler)
+        return cls._scheduler_source
+
+    @classmethod
+    def memo_source(cls) -> str:
+        """
+        Retrieves the source of the memoization runtime, copied into the generated code.
+        :return: The source of the CodeExecutionMemo class.
+        :rtype: str
+        """
+        if cls._memo_source is None:
+            cls._memo_source = inspect.getsource(CodeExecutionMemo)
+        return cls._memo_source
+
+    @classmethod
+    def definitions_of(cls, contents: str) -> List[str]:
+        """
+        Retrieves the top-level imports, functions and classes of given code,
+        which need to run again when resuming after it, so that the restored
+        globals can refer to them.
+        :param contents: The code.
+        :type contents: str
+        :return: The lines of such definitions, or an empty list if the code is not valid.
+        :rtype: List[str]
+        """
+        try:
+            tree = ast.parse(contents)
+        except (SyntaxError, ValueError):
+            return []
+        lines = contents.splitlines()
+        result = []
+        for node in tree.body:
+            if isinstance(node, cls._DEFINITIONS):
+                decorators = getattr(node, "decorator_list", [])
+                start = min([node.lineno] + [aux.lineno for aux in decorators])
+                result.extend(lines[start - 1 : node.end_lineno])
+        return result
+
+    def cell_chunk(self, cell: Cell, index: int, plan=None) -> str:
+        """
+        Generates the code for given cell.
+        :param cell: The cell.
+        :type cell: pythoneda.shared.code_requests.Cell
+        :param index: The position of the cell in the request.
+        :type index: int
+        :param plan: How the code of the cell relates to other cells, if it does (see cell_plans()). Found if omitted.
+        :type plan: Any
+        :return: The code.
+        :rtype: str
+        """
+        return "".join(self.cell_pieces(cell, index, plan))
+
+    def cell_pieces(self, cell: Cell, index: int, plan=None) -> Iterator[str]:
+        """
+        Generates the code for given cell piece by piece, reading its lines
+        as they are needed, so that huge cells are never copied as a whole.
+        :param cell: The cell.
+        :type cell: pythoneda.shared.code_requests.Cell
+        :param index: The position of the cell in the request.
+        :type index: int
+        :param plan: How the code of the cell relates to other cells, if it does (see cell_plans()). Found if omitted.
+        :type plan: Any
+        :return: An iterator over the pieces of code.
+        :rtype: Iterator[str]
+        """
+        if isinstance(cell, CodeCell) and plan is None:
+            plan = self.cell_plans().get(index)
+        if self.parallel_cells:
+            yield from self._scheduled_pieces(cell, index, plan)
+            return
+        if self.cell_markers:
+            marker = f"\n    print({repr(self.CELL_MARKER + str(index))}, flush=True)"
+        else:
+            marker = ""
+        # the usual case is a cell small enough to be generated in one piece
+        limit = self._LINES_PER_PIECE
+        lines = list(itertools.islice(cell.iter_lines(), limit + 1))
+        small = len(lines) <= limit
+        if not isinstance(cell, CodeCell):
+            if not lines:
+                return
+            opening = "\nif _pythoneda_no_error_so_far:" + marker
+            if small:
+                yield opening + "".join([f"\n    print({repr(line)})" for line in lines])
+                return
+            lines = None
+            yield opening
+            for group in self._line_groups(cell, True):
+                yield "".join([f"\n    print({repr(line)})" for line in group])
+            return
+        # TODO: find a non-hardcoded way to prevent the script to continue
+        if self.checkpoints:
+            opening = [
+                "\nif _pythoneda_no_error_so_far",
+                f" and _pythoneda_checkpoints.pending({index}):",
+                marker,
+                '\n    print("```")\n',
+            ]
+            definitions = [
+                f"    {line}\n"
+                for line in self.definitions_of(cell.contents)
+                if line.rstrip()
+            ]
+            if definitions:
+                definitions.insert(0, "elif _pythoneda_no_error_so_far:\n")
+            closing = [f"    _pythoneda_checkpoints.save({index})\n", *definitions]
+            middle = []
+        else:
+            opening = [
+                "\nif _pythoneda_no_error_so_far:",
+                marker,
+                '\n    print("```")\n',
+            ]
+            closing = []
+            middle = []
+            if self.memoize_cells and plan[2] is not None:
+                key, reads, writes = plan
+                middle.append(
+                    f"    _pythoneda_memo.lookup({repr(key)}, {repr(reads)})\n"
+                )
+                definitions = [
+                    f"    {line}\n"
+                    for line in self.definitions_of(cell.contents)
+                    if line.rstrip()
+                ]
+                if definitions:
+                    # stored values can refer to the functions and classes of the cell
+                    middle.append(
+                        "if _pythoneda_no_error_so_far and _pythoneda_memo.found():\n"
+                    )
+                    middle.extend(definitions)
+                middle.append(
+                    "if _pythoneda_no_error_so_far and not _pythoneda_memo.restore():\n"
+                )
+                closing.append(f"    _pythoneda_memo.save({repr(writes)})\n")
+        if small:
+            listing = []
+            code = []
+            for line in lines:
+                if line.rstrip():
+                    listing.append(f"    print({repr(line)})\n")
+                    code.append(f"    {line}\n")
+            yield "".join(
+                [*opening, *listing, '    print("```")\n', *middle, *code, *closing]
+            )
+            return
+        lines = None
+        yield "".join(opening)
+        for group in self._line_groups(cell, False):
+            yield "".join([f"    print({repr(line)})\n" for line in group])
+        yield "".join(['    print("```")\n', *middle])
+        for group in self._line_groups(cell, False):
+            yield "".join([f"    {line}\n" for line in group])
+        yield "".join(closing)
+
+    def _scheduled_pieces(
+        self, cell: Cell, index: int, after: List[int]
+    ) -> Iterator[str]:
+        """
+        Generates the code adding given cell to the scheduler, piece by piece.
+        :param cell: The cell.
+        :type cell: pythoneda.shared.code_requests.Cell
+        :param index: The position of the cell in the request.
+        :type index: int
+        :param after: The positions of the cells it depends on, for code cells.
+        :type after: List[int]
+        :return: An iterator over the pieces of code.
+        :rtype: Iterator[str]
+        """
+        if isinstance(cell, CodeCell):
+            opening = f"\n_pythoneda_scheduler.add({index}, {repr(after)}, [\n"
+        else:
+            opening = f"\n_pythoneda_scheduler.add_text({index}, [\n"
+        blank = not isinstance(cell, CodeCell)
+        started = False
+        for group in self._line_groups(cell, blank):
+            pieces = [f"    {repr(line)},\n" for line in group]
+            if not started:
+                pieces.insert(0, opening)
+                started = True
+            yield "".join(pieces)
+        if started:
+            yield "])\n"
+        elif not blank:
+            yield opening + "])\n"
+
+    def _line_groups(self, cell: Cell, blank: bool) -> Iterator[List[str]]:
+        """
+        Splits the lines of given cell into groups of bounded size.
+        :param cell: The cell.
+        :type cell: pythoneda.shared.code_requests.Cell
+        :param blank: Whether to keep blank lines.
+        :type blank: bool
+        :return: An iterator over the groups of lines.
+        :rtype: Iterator[List[str]]
+        """
+        lines = cell.iter_lines()
+        if not blank:
+            lines = filter(str.rstrip, lines)
+        while True:
+            group = list(itertools.islice(lines, self._LINES_PER_PIECE))
+            if not group:
+                return
+            yield group
+
+    def _template_cache_key(self):
+        """
+        Retrieves what the output of the templates of this flake depends on:
+        its metadata is fixed, so only its inputs.
+        :return: Such key.
+        :rtype: Tuple
+        """
+        return (
+            f"{self.__class__.__module__}.{self.__class__.__qualname__}",
+            self.template_subfolder,
+            tuple((aux.name, aux.version, aux.url) for aux in self.inputs),
+        )
 
     def generate_entrypoint(self, flakeFolder: str):
         """
@@ -120,13 +749,16 @@ class CodeExecutionNixFlake(CodeRequestNixFlake):
         :param flakeFolder: The flake folder.
         :type flakeFolder: str
         """
-        self.process_template(
-            flakeFolder,
-            "EntrypointSh",
-            Path(self.templates_folder()) / self.template_subfolder,
-            "root",
-            "code-execution.sh",
-        )
+        with Instrumentation.current().span(
+            "CodeExecutionNixFlake.generate_entrypoint"
+        ):
+            self.process_template(
+                flakeFolder,
+                "EntrypointSh",
+                Path(self.templates_folder()) / self.template_subfolder,
+                "root",
+                "code-execution.sh",
+            )
 
     def git_add_files(self, gitAdd: GitAdd):
         """
@@ -134,9 +766,10 @@ class CodeExecutionNixFlake(CodeRequestNixFlake):
         :param gitAdd: The GitAdd instance.
         :type gitAdd: pythoneda.shared.git.GitAdd
         """
-        super().git_add_files(gitAdd)
-        self.git_add_code(gitAdd)
-        self.git_add_entrypoint(gitAdd)
+        with Instrumentation.current().span("CodeExecutionNixFlake.git_add_files"):
+            super().git_add_files(gitAdd)
+            self.git_add_code(gitAdd)
+            self.git_add_entrypoint(gitAdd)
 
     def git_add_code(self, gitAdd: GitAdd):
         """
@@ -0,0 +1,172 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/code_execution_nix_flake_cache.py
+
+This file declares the CodeExecutionNixFlakeCache class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import hashlib
+import os
+from pathlib import Path
+import shutil
+import tempfile
+
+
+class CodeExecutionNixFlakeCache:
+    """
+    Content-addressed cache of generated code-execution flake folders.
+
+    Class name: CodeExecutionNixFlakeCache
+
+    Responsibilities:
+        - Computes a stable key out of the cells, inputs and template group of a flake.
+        - Generates the flake files only once per key, and reuses the folder afterwards.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeExecutionNixFlake
+    """
+
+    _MARKER = ".pythoneda-flake-cache"
+
+    _KEY_VERSION = "2"
+
+    def __init__(self, cacheFolder: str):
+        """
+        Creates a new CodeExecutionNixFlakeCache instance.
+        :param cacheFolder: The folder holding the cached flakes.
+        :type cacheFolder: str
+        """
+        super().__init__()
+        self._cache_folder = Path(cacheFolder)
+
+    @property
+    def cache_folder(self) -> Path:
+        """
+        Retrieves the folder holding the cached flakes.
+        :return: Such folder.
+        :rtype: pathlib.Path
+        """
+        return self._cache_folder
+
+    @classmethod
+    def key_for(cls, flake) -> str:
+        """
+        Computes the cache key of given flake.
+        :param flake: The flake.
+        :type flake: pythoneda.shared.code_requests.CodeExecutionNixFlake
+        :return: The hex digest identifying the generated files.
+        :rtype: str
+        """
+        digest = hashlib.sha256()
+
+        def update(value):
+            data = b"\x00" if value is None else f"+{value}".encode("utf-8")
+            digest.update(len(data).to_bytes(8, "big"))
+            digest.update(data)
+
+        update(cls._KEY_VERSION)
+        update(f"{flake.__class__.__module__}.{flake.__class__.__qualname__}")
+        update(flake.template_subfolder)
+        update(flake.cell_markers)
+        update(flake.checkpoints)
+        if flake.parallel_cells:
+            # only then, so that the keys of the other flakes stay the same
+            update("parallel")
+        if flake.memoize_cells:
+            update("memoize")
+        update(flake.code_request.digest())
+        update(len(flake.inputs))
+        for aux in flake.inputs:
+            update(aux.name)
+            update(aux.version)
+            update(aux.url)
+
+        return digest.hexdigest()
+
+    def folder_for(self, flake) -> Path:
+        """
+        Retrieves the folder given flake is cached under.
+        :param flake: The flake.
+        :type flake: pythoneda.shared.code_requests.CodeExecutionNixFlake
+        :return: Such folder, whether it has been generated or not.
+        :rtype: pathlib.Path
+        """
+        return self.cache_folder / self.key_for(flake)
+
+    def lookup(self, flake) -> Path:
+        """
+        Retrieves the already generated folder for given flake, if any.
+        :param flake: The flake.
+        :type flake: pythoneda.shared.code_requests.CodeExecutionNixFlake
+        :return: The folder, or None if it's not cached.
+        :rtype: pathlib.Path
+        """
+        result = self.folder_for(flake)
+        if not (result / self._MARKER).is_file():
+            result = None
+        return result
+
+    def generate_files(self, flake) -> Path:
+        """
+        Generates the files of given flake, unless they are already cached.
+        :param flake: The flake.
+        :type flake: pythoneda.shared.code_requests.CodeExecutionNixFlake
+        :return: The folder containing the generated flake.
+        :rtype: pathlib.Path
+        """
+        key = self.key_for(flake)
+        result = self.cache_folder / key
+        if (result / self._MARKER).is_file():
+            return result
+
+        self.cache_folder.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=f".{key}-", dir=self.cache_folder))
+        try:
+            flake.generate_files(str(staging))
+            (staging / self._MARKER).write_text(key)
+            if result.exists() and not (result / self._MARKER).is_file():
+                # leftover of an interrupted generation
+                shutil.rmtree(result, ignore_errors=True)
+            try:
+                os.rename(staging, result)
+            except OSError:
+                if not (result / self._MARKER).is_file():
+                    raise
+                # another process generated the same flake concurrently
+        finally:
+            if staging.exists():
+                shutil.rmtree(staging, ignore_errors=True)
+
+        return result
+
+    def invalidate(self, flake):
+        """
+        Removes the cached folder of given flake, if any.
+        :param flake: The flake.
+        :type flake: pythoneda.shared.code_requests.CodeExecutionNixFlake
+        """
+        shutil.rmtree(self.folder_for(flake), ignore_errors=True)
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
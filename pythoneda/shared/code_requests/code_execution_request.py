@@ -20,8 +20,9 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 from .code_request import CodeRequest
-from .code_request_nix_flake_spec import CodeRequestNixFlakeSpec
+from .instrumentation import Instrumentation
 from pythoneda.shared import primary_key_attribute
+from typing import Dict
 
 
 class CodeExecutionRequest(CodeRequest):
@@ -55,6 +56,25 @@ class CodeExecutionRequest(CodeRequest):
         """
         return cls(None)
 
+    @classmethod
+    def from_dict(cls, data: Dict, lazyCells: bool = False):
+        """
+        Builds an instance from its dict representation.
+        :param data: Such representation.
+        :type data: Dict
+        :param lazyCells: Whether the cells of the original code request stay as dicts until they are accessed.
+        :type lazyCells: bool
+        :return: The instance.
+        :rtype: pythoneda.shared.code_requests.CodeExecutionRequest
+        """
+        if not lazyCells or data.get("code_request") is None:
+            return super().from_dict(data)
+        result = super().from_dict(
+            {key: value for key, value in data.items() if key != "code_request"}
+        )
+        result._load_code_request(data["code_request"], True)
+        return result
+
     @property
     @primary_key_attribute
     def code_request(self) -> CodeRequest:
@@ -72,8 +92,19 @@ class CodeExecutionRequest(CodeRequest):
         :return: Such specification.
         :rtype: pythoneda.shared.nix.flake.NixFlakeSpec
         """
+        # imported here, since it depends on the Nix flake machinery
+        from .code_request_nix_flake_spec import CodeRequestNixFlakeSpec
+
         return CodeRequestNixFlakeSpec(self.code_request, "code-request")
 
+    def digest(self) -> str:
+        """
+        Retrieves the digest of the original code request, whose cells this one runs.
+        :return: The hex digest.
+        :rtype: str
+        """
+        return self.code_request.digest()
+
     def write(self, file):
         """
         Writes the code request to a file.
@@ -91,10 +122,26 @@ class CodeExecutionRequest(CodeRequest):
         :type varValue: int, bool, str, type
         """
         if varName == "code_request":
-            self._code_request = CodeRequest.from_dict(varValue)
+            if varValue is None:
+                self._code_request = None
+            else:
+                self._load_code_request(varValue, False)
         else:
             super()._set_attribute_from_json(varName, varValue)
 
+    def _load_code_request(self, value: Dict, lazyCells: bool):
+        """
+        Replaces the original code request with the one in given dict representation.
+        :param value: Such representation.
+        :type value: Dict
+        :param lazyCells: Whether its cells stay as dicts until they are accessed.
+        :type lazyCells: bool
+        """
+        with Instrumentation.current().span(
+            "CodeExecutionRequest.code_request_from_json"
+        ):
+            self._code_request = CodeRequest.from_dict(value, lazyCells)
+
     def _get_attribute_to_json(self, varName) -> str:
         """
         Retrieves the value of an attribute of this instance, as Json.
@@ -104,7 +151,13 @@ class CodeExecutionRequest(CodeRequest):
         :rtype: str
         """
         if varName == "code_request":
-            result = self.code_request.to_dict()
+            if self.code_request is None:
+                result = None
+            else:
+                with Instrumentation.current().span(
+                    "CodeExecutionRequest.code_request_to_json"
+                ):
+                    result = self.code_request.to_dict()
         else:
             result = super()._get_attribute_to_json(varName)
         return result
@@ -113,7 +166,8 @@ class CodeExecutionRequest(CodeRequest):
         """
         Runs this code request.
         """
-        await self.code_request.run()
+        with Instrumentation.current().span("CodeExecutionRequest.run"):
+            await self.code_request.run()
 
 
 # vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
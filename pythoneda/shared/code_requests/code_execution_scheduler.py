@@ -0,0 +1,259 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/code_execution_scheduler.py
+
+This file declares the CodeExecutionScheduler class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+class CodeExecutionScheduler:
+    """
+    Runtime support for running the independent code cells of generated code at the same time.
+
+    Its source is copied verbatim into the generated code_request.py, so it
+    depends on the standard library only, and imports it locally.
+
+    Class name: CodeExecutionScheduler
+
+    Responsibilities:
+        - Runs each code cell in a thread pool as soon as the cells it depends on succeed.
+        - Captures what each cell prints, and prints it in notebook order.
+        - Stops scheduling the cells after the first one failing, and raises its error.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeExecutionNixFlake
+    """
+
+    WORKERS_VARIABLE = "PYTHONEDA_CELL_WORKERS"
+
+    def __init__(self, namespace: dict, marker: str = None, workers: int = None):
+        """
+        Creates a new CodeExecutionScheduler instance.
+        :param namespace: The globals of the running code.
+        :type namespace: dict
+        :param marker: The text printed, followed by its index, before each cell, if any.
+        :type marker: str
+        :param workers: The maximum number of cells running at once. Defaults to the PYTHONEDA_CELL_WORKERS variable, or to the number of CPUs plus four, up to 32.
+        :type workers: int
+        """
+        import os
+        import threading
+
+        super().__init__()
+        self._namespace = namespace
+        self._marker = marker
+        if workers is None:
+            workers = int(os.environ.get(self.WORKERS_VARIABLE) or 0)
+        # the ThreadPoolExecutor default, since cells waiting on I/O release the GIL
+        self._workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        # (index, indexes of the cells to wait for, lines, whether it's code)
+        self._cells = []
+        self._local = threading.local()
+        self._stdout = None
+
+    @property
+    def workers(self) -> int:
+        """
+        Retrieves the maximum number of cells running at once.
+        :return: Such number.
+        :rtype: int
+        """
+        return self._workers
+
+    def add(self, index: int, after: list, lines: list):
+        """
+        Adds a code cell.
+        :param index: The cell index.
+        :type index: int
+        :param after: The indexes of the code cells it depends on.
+        :type after: List[int]
+        :param lines: Its non-blank lines.
+        :type lines: List[str]
+        """
+        self._cells.append((index, after, lines, True))
+
+    def add_text(self, index: int, lines: list):
+        """
+        Adds a Markdown cell.
+        :param index: The cell index.
+        :type index: int
+        :param lines: Its lines.
+        :type lines: List[str]
+        """
+        self._cells.append((index, [], lines, False))
+
+    def write(self, text: str) -> int:
+        """
+        Writes to the output of the cell the current thread is running, if any.
+        :param text: The text.
+        :type text: str
+        :return: The number of characters written.
+        :rtype: int
+        """
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            return self._stdout.write(text)
+        buffer.append(text)
+        return len(text)
+
+    def flush(self):
+        """
+        Flushes the standard output, unless the current thread is running a cell.
+        """
+        if getattr(self._local, "buffer", None) is None:
+            self._stdout.flush()
+
+    def __getattr__(self, name: str):
+        """
+        Retrieves any other attribute of the standard output.
+        :param name: The attribute name.
+        :type name: str
+        :return: Its value.
+        :rtype: Any
+        """
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._stdout, name)
+
+    def _run(self, index: int, lines: list) -> tuple:
+        """
+        Runs a code cell, capturing what it prints.
+        :param index: The cell index.
+        :type index: int
+        :param lines: Its lines.
+        :type lines: List[str]
+        :return: The printed text, and the error raised, if any.
+        :rtype: Tuple[List[str], BaseException]
+        """
+        import linecache
+
+        filename = f"<cell {index}>"
+        source = [f"{line}\n" for line in lines]
+        # so that tracebacks show the failing line
+        linecache.cache[filename] = (len(source), None, source, filename)
+        buffer = []
+        self._local.buffer = buffer
+        try:
+            exec(compile("".join(source), filename, "exec"), self._namespace)
+        except BaseException as error:
+            return buffer, error
+        finally:
+            self._local.buffer = None
+        return buffer, None
+
+    def _text_of(self, cell: tuple, printed: list) -> str:
+        """
+        Builds the text to print for a cell.
+        :param cell: The cell.
+        :type cell: Tuple
+        :param printed: What the cell printed when run.
+        :type printed: List[str]
+        :return: The text.
+        :rtype: str
+        """
+        index, _, lines, code = cell
+        result = []
+        if self._marker is not None:
+            result.append(f"{self._marker}{index}\n")
+        if code:
+            result.append("```\n")
+        result.extend(f"{line}\n" for line in lines)
+        if code:
+            result.append("```\n")
+        result.extend(printed)
+        return "".join(result)
+
+    def run(self):
+        """
+        Runs the cells, printing their output in order.
+        Raises the error of the first failing cell, once the previous ones are done.
+        """
+        import concurrent.futures
+        import sys
+
+        results = {}
+        remaining = {}
+        dependents = {}
+        for index, after, _, code in self._cells:
+            if code:
+                remaining[index] = len(after)
+                for aux in after:
+                    dependents.setdefault(aux, []).append(index)
+            else:
+                results[index] = ([], None)
+        cells = {cell[0]: cell for cell in self._cells}
+        running = {}
+        failed = None
+        emitted = 0
+        self._stdout = sys.stdout
+        sys.stdout = self
+        try:
+            with concurrent.futures.ThreadPoolExecutor(self._workers) as executor:
+
+                def submit(index: int):
+                    future = executor.submit(self._run, index, cells[index][2])
+                    running[future] = index
+
+                for index, count in remaining.items():
+                    if count == 0:
+                        submit(index)
+                while True:
+                    while emitted < len(self._cells):
+                        cell = self._cells[emitted]
+                        if cell[0] not in results:
+                            break
+                        printed, error = results[cell[0]]
+                        self._stdout.write(self._text_of(cell, printed))
+                        self._stdout.flush()
+                        emitted += 1
+                        if error is not None:
+                            raise error
+                    if not running:
+                        break
+                    done, _ = concurrent.futures.wait(
+                        running, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        index = running.pop(future)
+                        if future.cancelled():
+                            continue
+                        results[index] = future.result()
+                        if results[index][1] is not None:
+                            if failed is None or index < failed:
+                                failed = index
+                            # what comes after a failing cell must not run
+                            for pending, aux in running.items():
+                                if aux > failed:
+                                    pending.cancel()
+                            continue
+                        for aux in dependents.get(index, ()):
+                            remaining[aux] -= 1
+                            if remaining[aux] == 0 and (failed is None or aux < failed):
+                                submit(aux)
+        finally:
+            sys.stdout = self._stdout
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
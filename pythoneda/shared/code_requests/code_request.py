@@ -21,10 +21,16 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 from .cell import Cell
 from .code_cell import CodeCell
+from .compact_cell import CompactCell
+from .import_scanner import ImportScanner
+from .instrumentation import Instrumentation
+from .lazy_cell_list import LazyCellList
+from .mapped_cell_store import MappedCellStore
+from .markdown_cell import MarkdownCell
 import abc
+import hashlib
 from pythoneda.shared import attribute, ValueObject
-from pythoneda.shared.code_requests import MarkdownCell
-from typing import List
+from typing import Dict, List, Tuple
 
 
 class CodeRequest(ValueObject, abc.ABC):
@@ -46,6 +52,8 @@ class CodeRequest(ValueObject, abc.ABC):
         """
         super().__init__()
         self._cells = []
+        self._reset_dependency_index()
+        self._reset_digest()
 
     @classmethod
     def empty(cls):
@@ -56,6 +64,25 @@ class CodeRequest(ValueObject, abc.ABC):
         """
         return cls()
 
+    @classmethod
+    def from_dict(cls, data: Dict, lazyCells: bool = False):
+        """
+        Builds an instance from its dict representation.
+        :param data: Such representation.
+        :type data: Dict
+        :param lazyCells: Whether the cells stay as dicts until they are accessed, via a LazyCellList.
+        :type lazyCells: bool
+        :return: The instance.
+        :rtype: pythoneda.shared.code_requests.CodeRequest
+        """
+        if not lazyCells or data.get("cells") is None:
+            return super().from_dict(data)
+        result = super().from_dict(
+            {key: value for key, value in data.items() if key != "cells"}
+        )
+        result._load_cells(data["cells"], True)
+        return result
+
     @property
     @attribute
     def cells(self) -> List:
@@ -87,37 +114,163 @@ class CodeRequest(ValueObject, abc.ABC):
         """
         raise NotImplementedError("write(file) should be implemented in subclasses")
 
+    def append_cell(self, cell: Cell):
+        """
+        Appends a new cell.
+        :param cell: The cell to add.
+        :type cell: pythoneda.shared.code_requests.Cell
+        """
+        self.cells.append(cell)
+
     def append_markdown(self, markdown: str):
         """
         Appends a new markdown cell.
         :param markdown: The text to add.
         :type markdown: str
         """
-        self.cells.append(MarkdownCell(markdown))
+        self.append_cell(MarkdownCell(markdown))
 
-    def append_code(self, code: str, dependencies: List):
+    def append_code(
+        self, code: str, dependencies: List = None, importScanner: ImportScanner = None
+    ):
         """
         Appends a new code cell.
         :param code: The code to add.
         :type code: str
-        :param dependencies: The code dependencies.
+        :param dependencies: The code dependencies, or None to infer them through the import scanner, if any.
         :type dependencies: List
+        :param importScanner: The scanner inferring the dependencies when not given.
+        :type importScanner: pythoneda.shared.code_requests.ImportScanner
+        """
+        if dependencies is None:
+            dependencies = (
+                [] if importScanner is None else importScanner.dependencies_of(code)
+            )
+        self.append_cell(CodeCell(code, dependencies))
+
+    def compact(self):
+        """
+        Replaces the code cells with their compact, slot-based counterparts.
+        """
+        self._cells = [CompactCell.of(cell) for cell in self._cells]
+        self._reset_dependency_index()
+
+    def map_cells(self, path: str) -> MappedCellStore:
+        """
+        Moves the contents of the cells to a memory-mapped file, and replaces
+        the cells with views of it, decoded only when accessed.
+        :param path: The file to write.
+        :type path: str
+        :return: The store mapping such file.
+        :rtype: pythoneda.shared.code_requests.MappedCellStore
         """
-        self.cells.append(CodeCell(code, dependencies))
+        MappedCellStore.write(self._cells, path)
+        result = MappedCellStore(path)
+        self.use_cell_store(result)
+        return result
+
+    def use_cell_store(self, store: MappedCellStore):
+        """
+        Replaces the cells with the ones of given memory-mapped store.
+        :param store: The store.
+        :type store: pythoneda.shared.code_requests.MappedCellStore
+        """
+        self._cells = store.cells()
+        self._reset_dependency_index()
+        self._reset_digest()
 
     @property
     def dependencies(self) -> List:
         """
-        Retrieves the dependencies of this code request.
+        Retrieves the dependencies of this code request, in first-seen order,
+        without duplicates. The list is shared until new cells get appended,
+        so it must not be modified.
         :return: Such list.
         :rtype: List[pythoneda.shared.code_requests.Dependency]
         """
-        result = set()
-        for cell in self.cells:
-            for dep in cell.dependencies:
-                result.update(dep)
+        self._index_dependencies()
+        if self._dependencies is None:
+            self._dependencies = list(self._dependency_index.values())
 
-        return list(result)
+        return self._dependencies
+
+    @property
+    def dependency_set(self) -> Tuple:
+        """
+        Retrieves the dependencies of this code request, normalized so that
+        requests needing the same packages share the same value.
+        :return: The sorted (name, version) pairs.
+        :rtype: Tuple[Tuple[str, str]]
+        """
+        return tuple(
+            sorted(
+                {(dep.name, dep.version) for dep in self.dependencies},
+                key=lambda pair: (str(pair[0]), str(pair[1])),
+            )
+        )
+
+    def digest(self) -> str:
+        """
+        Retrieves the digest of the cells, chaining the digests of each one in
+        order. Only the cells appended since the last call get hashed, so
+        cells must not be replaced in place.
+        :return: The hex digest.
+        :rtype: str
+        """
+        cells = self._cells
+        chain, count, result = self._cell_digests
+        if len(cells) == count and result is not None:
+            return result
+        if len(cells) < count:
+            chain, count = "", 0
+        # by index, so that the cells already hashed aren't even visited
+        for index in range(count, len(cells)):
+            link = f"{chain}{cells[index].digest()}".encode("ascii")
+            chain = hashlib.sha256(link).hexdigest()
+        count = len(cells)
+        result = hashlib.sha256(f"{chain}:{count}".encode("ascii")).hexdigest()
+        # a single assignment, so that concurrent calls never mix their updates
+        self._cell_digests = (chain, count, result)
+        return result
+
+    def _reset_digest(self):
+        """
+        Discards the chain of cell digests, so that it gets rebuilt on next access.
+        """
+        # the chained digest of the first cells, how many they are, and the
+        # digest of the request
+        self._cell_digests = ("", 0, None)
+
+    def _reset_dependency_index(self):
+        """
+        Discards the dependency index, so that it gets rebuilt on next access.
+        """
+        self._dependency_index = {}
+        self._indexed_cells = 0
+        self._dependencies = None
+
+    def _index_dependencies(self):
+        """
+        Indexes the dependencies of the cells appended since the last call.
+        """
+        cells = self._cells
+        if len(cells) == self._indexed_cells:
+            return
+        if len(cells) < self._indexed_cells:
+            self._reset_dependency_index()
+        # by index, so that the cells already indexed aren't even visited
+        appended = range(self._indexed_cells, len(cells))
+        if isinstance(cells, LazyCellList):
+            pending = (cells.dependencies_of(index) for index in appended)
+        else:
+            pending = (cells[index].dependencies for index in appended)
+        for dependencies in pending:
+            for dependency in dependencies:
+                key = (dependency.name, dependency.version)
+                if key not in self._dependency_index:
+                    self._dependency_index[key] = dependency
+                    self._dependencies = None
+        self._indexed_cells = len(cells)
 
     def _set_attribute_from_json(self, varName, varValue):
         """
@@ -128,10 +281,28 @@ class CodeRequest(ValueObject, abc.ABC):
         :type varValue: int, bool, str, type
         """
         if varName == "cells":
-            self._cells = [Cell.from_dict(value) for value in varValue]
+            self._load_cells(varValue, False)
         else:
             super()._set_attribute_from_json(varName, varValue)
 
+    def _load_cells(self, values: List, lazy: bool):
+        """
+        Replaces the cells with the ones in given dict representations.
+        :param values: Such representations.
+        :type values: List[Dict]
+        :param lazy: Whether to keep them as dicts until they are accessed.
+        :type lazy: bool
+        """
+        with Instrumentation.current().span(
+            "CodeRequest.cells_from_json", cells=len(values)
+        ):
+            if lazy:
+                self._cells = LazyCellList(values)
+            else:
+                self._cells = [Cell.from_dict(value) for value in values]
+        self._reset_dependency_index()
+        self._reset_digest()
+
     def _get_attribute_to_json(self, varName) -> str:
         """
         Retrieves the value of an attribute of this instance, as Json.
@@ -141,7 +312,13 @@ class CodeRequest(ValueObject, abc.ABC):
         :rtype: str
         """
         if varName == "cells":
-            result = [cell.to_dict() for cell in self._cells]
+            with Instrumentation.current().span(
+                "CodeRequest.cells_to_json", cells=len(self._cells)
+            ):
+                if isinstance(self._cells, LazyCellList):
+                    result = self._cells.to_dicts()
+                else:
+                    result = [cell.to_dict() for cell in self._cells]
         else:
             result = super()._get_attribute_to_json(varName)
         return result
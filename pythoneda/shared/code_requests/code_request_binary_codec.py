@@ -0,0 +1,300 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/code_request_binary_codec.py
+
+This file declares the CodeRequestBinaryCodec class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .binary_packer import BinaryPacker
+from .cell import Cell
+from .code_cell import CodeCell
+from .code_request import CodeRequest
+from .dependency import Dependency
+from .mapped_cell import MappedCell
+import copy
+import importlib
+from typing import Dict, List
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class CodeRequestBinaryCodec:
+    """
+    Compact binary encoding of code requests and the objects wrapping them.
+
+    Class name: CodeRequestBinaryCodec
+
+    Responsibilities:
+        - Encodes cells, dependencies and code requests positionally, without building nested dicts.
+        - Falls back to to_dict/from_dict for the remaining attributes of flakes and specs.
+        - Prefixes the payload with a magic number and a schema version.
+        - Decodes only registered classes, or the cells, dependencies, code requests, flakes and specs of PythonEDA packages.
+        - Uses msgpack when available, and BinaryPacker otherwise.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.BinaryPacker
+        - pythoneda.shared.code_requests.CodeRequest
+    """
+
+    MAGIC = b"PCRB"
+
+    SCHEMA_VERSION = 1
+
+    _OBJECT = 0
+
+    _DEPENDENCY = 1
+
+    _CODE_CELL = 2
+
+    _CELL = 3
+
+    _CODE_REQUEST_HOLDER = 4
+
+    # the packages whose classes payloads can name without registering them
+    _TRUSTED_PACKAGE = "pythoneda.shared."
+
+    _resolved_classes = {}
+
+    @classmethod
+    def register(cls, klass: type):
+        """
+        Allows decoding given class, wherever it's declared.
+        :param klass: The class.
+        :type klass: type
+        """
+        cls._resolved_classes[f"{klass.__module__}:{klass.__qualname__}"] = klass
+
+    @classmethod
+    def encode(cls, value) -> bytes:
+        """
+        Encodes given object graph.
+        :param value: The root object, such as a CodeRequest, a CodeExecutionRequest, or a flake or spec wrapping one.
+        :type value: object
+        :return: The encoded bytes.
+        :rtype: bytes
+        """
+        classes = {}
+        root = cls._encode(value, classes)
+        return (
+            cls.MAGIC
+            + bytes([cls.SCHEMA_VERSION])
+            + cls._pack([list(classes.keys()), root])
+        )
+
+    @classmethod
+    def decode(cls, data: bytes):
+        """
+        Decodes given bytes.
+        :param data: The encoded bytes.
+        :type data: bytes
+        :return: The root object.
+        :rtype: object
+        """
+        header = len(cls.MAGIC)
+        if bytes(data[:header]) != cls.MAGIC:
+            raise ValueError("Not a binary-encoded code request")
+        version = data[header]
+        if version != cls.SCHEMA_VERSION:
+            raise ValueError(f"Unsupported schema version: {version}")
+        class_names, root = cls._unpack(memoryview(data)[header + 1 :])
+        classes = [cls._resolve(name) for name in class_names]
+        return cls._decode(root, classes)
+
+    @classmethod
+    def _pack(cls, value) -> bytes:
+        """
+        Packs given value into MessagePack.
+        :param value: The value.
+        :type value: object
+        :return: The bytes.
+        :rtype: bytes
+        """
+        if msgpack is None:
+            return BinaryPacker.pack(value)
+        return msgpack.packb(value, use_bin_type=True)
+
+    @classmethod
+    def _unpack(cls, data):
+        """
+        Unpacks given MessagePack bytes.
+        :param data: The bytes.
+        :type data: bytes
+        :return: The value.
+        :rtype: object
+        """
+        if msgpack is None:
+            return BinaryPacker.unpack(data)
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+    @classmethod
+    def _class_index(cls, value, classes: Dict) -> int:
+        """
+        Retrieves the position of the class of given object in the class table.
+        :param value: The object.
+        :type value: object
+        :param classes: The class table, mapping names to positions.
+        :type classes: Dict[str, int]
+        :return: Such position.
+        :rtype: int
+        """
+        klass = value.__class__
+        name = f"{klass.__module__}:{klass.__qualname__}"
+        result = classes.get(name)
+        if result is None:
+            result = len(classes)
+            classes[name] = result
+        return result
+
+    @classmethod
+    def _resolve(cls, name: str) -> type:
+        """
+        Resolves given class name. Payloads come from elsewhere, so nothing
+        outside the PythonEDA packages gets imported, and only registered
+        classes, or cells, dependencies, code requests, and their flakes and
+        specs, get decoded.
+        :param name: The name, as module:qualname.
+        :type name: str
+        :return: The class.
+        :rtype: type
+        """
+        result = cls._resolved_classes.get(name)
+        if result is None:
+            module_name, _, qualname = name.partition(":")
+            if not module_name.startswith(cls._TRUSTED_PACKAGE):
+                raise ValueError(f"Not a decodable class: {name}")
+            try:
+                result = importlib.import_module(module_name)
+                for part in qualname.split("."):
+                    result = getattr(result, part)
+            except (ImportError, AttributeError):
+                raise ValueError(f"Not a decodable class: {name}")
+            if not cls._decodable(result):
+                raise ValueError(f"Not a decodable class: {name}")
+            cls._resolved_classes[name] = result
+        return result
+
+    @classmethod
+    def _decodable(cls, klass) -> bool:
+        """
+        Checks whether given object is a class payloads can name.
+        :param klass: The object.
+        :type klass: object
+        :return: True in such case.
+        :rtype: bool
+        """
+        if not isinstance(klass, type):
+            return False
+        if issubclass(klass, (Cell, Dependency, CodeRequest)):
+            return True
+        # imported here, since they depend on the Nix flake machinery
+        from .code_request_nix_flake import CodeRequestNixFlake
+        from .code_request_nix_flake_spec import CodeRequestNixFlakeSpec
+
+        return issubclass(klass, (CodeRequestNixFlake, CodeRequestNixFlakeSpec))
+
+    @classmethod
+    def _encode(cls, value, classes: Dict):
+        """
+        Encodes given object.
+        :param value: The object.
+        :type value: object
+        :param classes: The class table.
+        :type classes: Dict[str, int]
+        :return: Its positional representation.
+        :rtype: List
+        """
+        if value is None:
+            return None
+        if isinstance(value, MappedCell):
+            value = value.detached()
+        index = cls._class_index(value, classes)
+        if isinstance(value, Dependency):
+            return [cls._DEPENDENCY, index, value.name, value.version, value.url]
+        if isinstance(value, CodeCell):
+            return [
+                cls._CODE_CELL,
+                index,
+                value.contents,
+                [cls._encode(dep, classes) for dep in value.dependencies],
+            ]
+        if isinstance(value, Cell):
+            return [cls._CELL, index, value.contents]
+        is_code_request = isinstance(value, CodeRequest)
+        if is_code_request or hasattr(value, "_code_request"):
+            # the rest of the attributes go through to_dict, without the heavy parts
+            rest = copy.copy(value)
+            cells = None
+            if is_code_request:
+                cells = [cls._encode(cell, classes) for cell in value.cells]
+                rest._cells = []
+            code_request = getattr(value, "_code_request", None)
+            if hasattr(value, "_code_request"):
+                rest._code_request = None
+            return [
+                cls._CODE_REQUEST_HOLDER,
+                index,
+                cells,
+                cls._encode(code_request, classes),
+                rest.to_dict(),
+            ]
+        return [cls._OBJECT, index, value.to_dict()]
+
+    @classmethod
+    def _decode(cls, encoded: List, classes: List):
+        """
+        Decodes given object.
+        :param encoded: The positional representation.
+        :type encoded: List
+        :param classes: The class table.
+        :type classes: List[type]
+        :return: The object.
+        :rtype: object
+        """
+        if encoded is None:
+            return None
+        tag = encoded[0]
+        klass = classes[encoded[1]]
+        if tag == cls._DEPENDENCY:
+            return klass(encoded[2], encoded[3], encoded[4])
+        if tag == cls._CODE_CELL:
+            return klass(encoded[2], [cls._decode(dep, classes) for dep in encoded[3]])
+        if tag == cls._CELL:
+            return klass(encoded[2])
+        if tag == cls._CODE_REQUEST_HOLDER:
+            result = klass.from_dict(encoded[4])
+            if encoded[2] is not None:
+                result._cells = [cls._decode(cell, classes) for cell in encoded[2]]
+                result._reset_dependency_index()
+            if encoded[3] is not None:
+                result._code_request = cls._decode(encoded[3], classes)
+            return result
+        if tag == cls._OBJECT:
+            return klass.from_dict(encoded[2])
+        raise ValueError(f"Unknown tag: {tag}")
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
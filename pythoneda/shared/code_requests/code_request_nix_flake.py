@@ -20,6 +20,8 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 from .code_request import CodeRequest
+from .instrumentation import Instrumentation
+from .nix_flake_template_cache import NixFlakeTemplateCache
 from pathlib import Path
 from pythoneda.shared import attribute
 from pythoneda.shared.nix.flake import NixFlake
@@ -37,8 +39,11 @@ class CodeRequestNixFlake(NixFlake):
 
     Collaborators:
         - pythoneda.shared.nix.flake.NixFlake
+        - pythoneda.shared.code_requests.NixFlakeTemplateCache
     """
 
+    _template_cache = NixFlakeTemplateCache()
+
     def __init__(
         self,
         codeRequest: CodeRequest,
@@ -129,6 +134,88 @@ class CodeRequestNixFlake(NixFlake):
             if aux.name != "nixos" and aux.name != "flake-utils"
         ]
 
+    @classmethod
+    def template_cache(cls) -> NixFlakeTemplateCache:
+        """
+        Retrieves the cache of templates shared by all code request flakes.
+        :return: Such cache, or None if disabled.
+        :rtype: pythoneda.shared.code_requests.NixFlakeTemplateCache
+        """
+        return CodeRequestNixFlake._template_cache
+
+    @classmethod
+    def set_template_cache(cls, cache: NixFlakeTemplateCache):
+        """
+        Replaces the cache of templates shared by all code request flakes.
+        :param cache: The new cache, or None to disable caching.
+        :type cache: pythoneda.shared.code_requests.NixFlakeTemplateCache
+        """
+        CodeRequestNixFlake._template_cache = cache
+
+    def templates_folder(self) -> str:
+        """
+        Retrieves the templates folder, looking it up once per class.
+        :return: Such folder.
+        :rtype: str
+        """
+        cache = self.template_cache()
+        if cache is None:
+            return super().templates_folder()
+        return cache.templates_folder(self, super().templates_folder)
+
+    def process_template(
+        self,
+        flakeFolder: str,
+        templateName: str,
+        templatesFolder: str,
+        rootTemplate: str,
+        outputFileName: str,
+    ):
+        """
+        Generates a file from a template, reusing its cached output when possible.
+        :param flakeFolder: The flake folder.
+        :type flakeFolder: str
+        :param templateName: The name of the template.
+        :type templateName: str
+        :param templatesFolder: The folder of the template group.
+        :type templatesFolder: str
+        :param rootTemplate: The root template.
+        :type rootTemplate: str
+        :param outputFileName: The name of the generated file.
+        :type outputFileName: str
+        """
+        cache = self.template_cache()
+        with Instrumentation.current().span(
+            "CodeRequestNixFlake.process_template", template=templateName
+        ):
+            if cache is None:
+                super().process_template(
+                    flakeFolder,
+                    templateName,
+                    templatesFolder,
+                    rootTemplate,
+                    outputFileName,
+                )
+            else:
+                cache.process_template(
+                    self,
+                    super().process_template,
+                    flakeFolder,
+                    templateName,
+                    templatesFolder,
+                    rootTemplate,
+                    outputFileName,
+                )
+
+    def _template_cache_key(self):
+        """
+        Retrieves what the output of the templates of this flake depends on.
+        Subclasses with fixed metadata can return it, so that the output gets reused.
+        :return: Such key, or None if the output cannot be reused.
+        :rtype: Tuple
+        """
+        return None
+
     def generate_files(self, flakeFolder: str):
         """
         Generates the files.
@@ -178,7 +265,10 @@ class CodeRequestNixFlake(NixFlake):
         :type varValue: int, bool, str, type
         """
         if varName == "code_request":
-            self._code_request = CodeRequest.from_dict(varValue)
+            if varValue is None:
+                self._code_request = None
+            else:
+                self._code_request = CodeRequest.from_dict(varValue)
         else:
             super()._set_attribute_from_json(varName, varValue)
 
@@ -191,7 +281,10 @@ class CodeRequestNixFlake(NixFlake):
         :rtype: str
         """
         if varName == "code_request":
-            result = self.code_request.to_dict()
+            if self.code_request is None:
+                result = None
+            else:
+                result = self.code_request.to_dict()
         else:
             result = super()._get_attribute_to_json(varName)
         return result
@@ -20,6 +20,7 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 from .code_request import CodeRequest
+import hashlib
 from pythoneda.shared import attribute
 from pythoneda.shared.nix.flake import NixFlakeSpec
 from typing import List
@@ -81,6 +82,22 @@ class CodeRequestNixFlakeSpec(NixFlakeSpec):
         """
         return self._code_request
 
+    def digest(self) -> str:
+        """
+        Retrieves the digest of the kind and name of the spec, and of its code request.
+        :return: The hex digest.
+        :rtype: str
+        """
+        digest = hashlib.sha256()
+        kind = f"{self.__class__.__module__}.{self.__class__.__qualname__}"
+        for value in (kind, self.name):
+            data = b"\x00" if value is None else f"+{value}".encode("utf-8")
+            digest.update(len(data).to_bytes(8, "big"))
+            digest.update(data)
+        if self._code_request is not None:
+            digest.update(self._code_request.digest().encode("ascii"))
+        return digest.hexdigest()
+
     def _set_attribute_from_json(self, varName, varValue):
         """
         Changes the value of an attribute of this instance.
@@ -90,7 +107,10 @@ class CodeRequestNixFlakeSpec(NixFlakeSpec):
         :type varValue: int, bool, str, type
         """
         if varName == "code_request":
-            self._code_request = CodeRequest.from_dict(varValue)
+            if varValue is None:
+                self._code_request = None
+            else:
+                self._code_request = CodeRequest.from_dict(varValue)
         else:
             super()._set_attribute_from_json(varName, varValue)
 
@@ -103,7 +123,10 @@ class CodeRequestNixFlakeSpec(NixFlakeSpec):
         :rtype: str
         """
         if varName == "code_request":
-            result = self._code_request.to_dict()
+            if self._code_request is None:
+                result = None
+            else:
+                result = self._code_request.to_dict()
         else:
             result = super()._get_attribute_to_json(varName)
         return result
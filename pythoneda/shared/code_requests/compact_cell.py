@@ -0,0 +1,76 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/compact_cell.py
+
+This file declares the CompactCell class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .cell import Cell
+
+
+class CompactCell(Cell):
+    """
+    A Cell stored in slots.
+
+    Class name: CompactCell
+
+    Responsibilities:
+        - Represents a Cell with a smaller memory footprint.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.Cell
+    """
+
+    __slots__ = ("_contents", "_digest")
+
+    def __init__(self, contents: str):
+        """
+        Creates a new CompactCell instance.
+        :param contents: The cell contents.
+        :type contents: str
+        """
+        super().__init__(contents)
+
+    @classmethod
+    def of(cls, cell: Cell):
+        """
+        Retrieves the compact version of given cell.
+        :param cell: The cell.
+        :type cell: pythoneda.shared.code_requests.Cell
+        :return: The compact cell, or the cell itself if it has no compact version.
+        :rtype: pythoneda.shared.code_requests.Cell
+        """
+        if isinstance(cell, CompactCell):
+            return cell
+        from .code_cell import CodeCell
+        from .compact_code_cell import CompactCodeCell
+
+        if isinstance(cell, CodeCell):
+            return CompactCodeCell(cell.contents, cell.dependencies)
+        # Markdown cells hold nothing but their contents, so slots don't make
+        # them any smaller
+        return cell
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
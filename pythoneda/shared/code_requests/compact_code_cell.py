@@ -0,0 +1,83 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/compact_code_cell.py
+
+This file declares the CompactCodeCell class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .code_cell import CodeCell
+from .compact_cell import CompactCell
+from .compact_dependency import CompactDependency
+from .dependency import Dependency
+from typing import List
+
+
+class CompactCodeCell(CompactCell, CodeCell):
+    """
+    A code cell stored in slots, whose dependencies are compact as well.
+
+    Class name: CompactCodeCell
+
+    Responsibilities:
+        - Represents a CodeCell with a smaller memory footprint.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeCell
+        - pythoneda.shared.code_requests.CompactCell
+        - pythoneda.shared.code_requests.CompactDependency
+    """
+
+    __slots__ = ("_dependencies",)
+
+    def __init__(self, contents: str, dependencies: List):
+        """
+        Creates a new CompactCodeCell instance.
+        :param contents: The cell contents.
+        :type contents: str
+        :param dependencies: The dependencies.
+        :type dependencies: List[pythoneda.shared.code_requests.Dependency]
+        """
+        CodeCell.__init__(
+            self,
+            contents,
+            [CompactDependency.of(dependency) for dependency in dependencies],
+        )
+
+    def _set_attribute_from_json(self, varName, varValue):
+        """
+        Changes the value of an attribute of this instance.
+        :param varName: The name of the attribute.
+        :type varName: str
+        :param varValue: The value of the attribute.
+        :type varValue: int, bool, str, type
+        """
+        if varName == "dependencies":
+            self._dependencies = [
+                CompactDependency.of(Dependency.from_dict(value)) for value in varValue
+            ]
+        else:
+            super()._set_attribute_from_json(varName, varValue)
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,108 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/compact_dependency.py
+
+This file declares the CompactDependency class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .dependency import Dependency
+import sys
+
+
+class CompactDependency(Dependency):
+    """
+    A Dependency stored in slots, with interned name, version and url.
+
+    Class name: CompactDependency
+
+    Responsibilities:
+        - Represents a Dependency with a smaller memory footprint.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.Dependency
+    """
+
+    __slots__ = ("_name", "_version", "_url", "_digest")
+
+    def __init__(self, name: str, version: str, url: str):
+        """
+        Creates a new CompactDependency instance.
+        :param name: The name of the dependency.
+        :type name: str
+        :param version: The version of the dependency.
+        :type version: str
+        :param url: The url of the dependency.
+        :type url: str
+        """
+        super().__init__(
+            self.__class__._intern(name),
+            self.__class__._intern(version),
+            self.__class__._intern(url),
+        )
+
+    @classmethod
+    def _intern(cls, value: str) -> str:
+        """
+        Interns given value, so that equal names and versions share storage.
+        :param value: The value.
+        :type value: str
+        :return: The interned value.
+        :rtype: str
+        """
+        if type(value) is str:
+            return sys.intern(value)
+        return value
+
+    @classmethod
+    def of(cls, dependency: Dependency):
+        """
+        Retrieves the compact version of given dependency.
+        :param dependency: The dependency.
+        :type dependency: pythoneda.shared.code_requests.Dependency
+        :return: The compact dependency.
+        :rtype: pythoneda.shared.code_requests.CompactDependency
+        """
+        if isinstance(dependency, CompactDependency):
+            return dependency
+        from .compact_pythoneda_dependency import CompactPythonedaDependency
+        from .pythoneda_dependency import PythonedaDependency
+
+        if isinstance(dependency, PythonedaDependency):
+            return CompactPythonedaDependency(
+                dependency.name, dependency.version, dependency.url
+            )
+        return CompactDependency(dependency.name, dependency.version, dependency.url)
+
+    def _set_attribute_from_json(self, varName, varValue):
+        """
+        Changes the value of an attribute of this instance.
+        :param varName: The name of the attribute.
+        :type varName: str
+        :param varValue: The value of the attribute.
+        :type varValue: int, bool, str, type
+        """
+        super()._set_attribute_from_json(varName, self.__class__._intern(varValue))
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
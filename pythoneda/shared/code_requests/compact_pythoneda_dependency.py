@@ -0,0 +1,62 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/compact_pythoneda_dependency.py
+
+This file declares the CompactPythonedaDependency class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .compact_dependency import CompactDependency
+from .pythoneda_dependency import PythonedaDependency
+
+
+class CompactPythonedaDependency(CompactDependency, PythonedaDependency):
+    """
+    A PythonEDA dependency stored in slots.
+
+    Class name: CompactPythonedaDependency
+
+    Responsibilities:
+        - Represents a PythonedaDependency with a smaller memory footprint.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CompactDependency
+        - pythoneda.shared.code_requests.PythonedaDependency
+    """
+
+    __slots__ = ()
+
+    def __init__(self, name: str, version: str, url: str = None):
+        """
+        Creates a new CompactPythonedaDependency instance.
+        :param name: The name of the dependency.
+        :type name: str
+        :param version: The version of the dependency.
+        :type version: str
+        :param url: The url of the dependency.
+        :type url: str
+        """
+        super().__init__(name, version, url)
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -19,8 +19,12 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
+import hashlib
 from pythoneda.shared import attribute, primary_key_attribute, ValueObject
-from pythoneda.shared.nix.flake import NixFlake
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pythoneda.shared.nix.flake import NixFlake
 
 
 class Dependency(ValueObject):
@@ -31,11 +35,14 @@ class Dependency(ValueObject):
 
     Responsibilities:
         - Contains metadata about a dependency required by a code cell.
+        - Provides a digest of such metadata.
 
     Collaborators:
         - pythoneda.shared.ValueObject
     """
 
+    _DIGEST_KIND = "dependency"
+
     def __init__(self, name: str, version: str, url: str):
         """
         Creates a new Dependency instance.
@@ -50,6 +57,7 @@ class Dependency(ValueObject):
         self._name = name
         self._version = version
         self._url = url
+        self._digest = None
 
     @classmethod
     def empty(cls):
@@ -90,8 +98,25 @@ class Dependency(ValueObject):
         """
         return self._url
 
+    def digest(self) -> str:
+        """
+        Retrieves the digest of the kind, name, version and url of the
+        dependency, computed once. Compact dependencies share the digest of
+        their counterparts.
+        :return: The hex digest.
+        :rtype: str
+        """
+        if self._digest is None:
+            digest = hashlib.sha256()
+            for value in (self._DIGEST_KIND, self.name, self.version, self.url):
+                data = b"\x00" if value is None else f"+{value}".encode("utf-8")
+                digest.update(len(data).to_bytes(8, "big"))
+                digest.update(data)
+            self._digest = digest.hexdigest()
+        return self._digest
+
     @classmethod
-    def from_nix_flake(cls, flake: NixFlake):
+    def from_nix_flake(cls, flake: "NixFlake"):
         """
         Creates a dependency for given Nix flake.
         :param flake: The Nix flake.
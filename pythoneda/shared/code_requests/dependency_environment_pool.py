@@ -0,0 +1,363 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/dependency_environment_pool.py
+
+This file declares the DependencyEnvironmentPool class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .code_execution_nix_flake import CodeExecutionNixFlake
+from .code_request import CodeRequest
+from collections import OrderedDict
+import contextlib
+import hashlib
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import threading
+from typing import Callable, List
+
+
+class DependencyEnvironmentPool:
+    """
+    Pre-built runtime environments, one per dependency set, shared by all requests needing it.
+
+    Class name: DependencyEnvironmentPool
+
+    Responsibilities:
+        - Groups code requests by their normalized dependency set.
+        - Builds the environment of each group once, even under concurrent demand.
+        - Keeps a garbage collector root per environment, so that its closure stays in the store.
+        - Evicts the least recently used environments not in use, to honor a count and a disk budget.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeExecutionNixFlake
+        - pythoneda.shared.code_requests.CodeRequest
+    """
+
+    _MARKER = ".pythoneda-environment"
+
+    # the garbage collector root of each environment, within its folder
+    PROFILE = "profile"
+
+    def __init__(
+        self,
+        poolFolder: str,
+        inputsResolver: Callable,
+        buildCommand: List = [
+            "nix",
+            "develop",
+            ".",
+            "--profile",
+            PROFILE,
+            "--command",
+            "true",
+        ],
+        maxEnvironments: int = None,
+        diskBudget: int = None,
+    ):
+        """
+        Creates a new DependencyEnvironmentPool instance.
+        :param poolFolder: The folder holding the environments.
+        :type poolFolder: str
+        :param inputsResolver: Resolves a flake spec into its inputs.
+        :type inputsResolver: Callable[[pythoneda.shared.code_requests.CodeRequestNixFlakeSpec], List[pythoneda.shared.nix.flake.NixFlake]]
+        :param buildCommand: The command realizing an environment, from within its folder. It should leave a garbage collector root named after PROFILE; otherwise, the environment can be collected, and only its folder counts towards the disk budget.
+        :type buildCommand: List[str]
+        :param maxEnvironments: The maximum number of environments to keep, if any.
+        :type maxEnvironments: int
+        :param diskBudget: The maximum number of bytes the environments can take, counting the closure of each one, if any.
+        :type diskBudget: int
+        """
+        super().__init__()
+        self._pool_folder = Path(poolFolder)
+        self._inputs_resolver = inputsResolver
+        self._build_command = list(buildCommand)
+        self._max_environments = maxEnvironments
+        self._disk_budget = diskBudget
+        self._lock = threading.Lock()
+        # key -> [folder, size, users], least recently used first
+        self._environments = OrderedDict()
+        self._building = {}
+        self._load()
+
+    @property
+    def pool_folder(self) -> Path:
+        """
+        Retrieves the folder holding the environments.
+        :return: Such folder.
+        :rtype: pathlib.Path
+        """
+        return self._pool_folder
+
+    @property
+    def max_environments(self) -> int:
+        """
+        Retrieves the maximum number of environments to keep.
+        :return: Such limit, or None if unbounded.
+        :rtype: int
+        """
+        return self._max_environments
+
+    @property
+    def disk_budget(self) -> int:
+        """
+        Retrieves the maximum number of bytes the environments can take.
+        :return: Such limit, or None if unbounded.
+        :rtype: int
+        """
+        return self._disk_budget
+
+    @property
+    def disk_usage(self) -> int:
+        """
+        Retrieves the number of bytes the environments take, counting the closure of each one.
+        :return: Such size.
+        :rtype: int
+        """
+        with self._lock:
+            return sum(entry[1] for entry in self._environments.values())
+
+    def __len__(self) -> int:
+        """
+        Retrieves the number of environments available.
+        :return: Such number.
+        :rtype: int
+        """
+        return len(self._environments)
+
+    @classmethod
+    def key_for(cls, codeRequest: CodeRequest) -> str:
+        """
+        Computes the key of the environment given request runs in.
+        :param codeRequest: The code request.
+        :type codeRequest: pythoneda.shared.code_requests.CodeRequest
+        :return: The hex digest of its normalized dependency set.
+        :rtype: str
+        """
+        return hashlib.sha256(
+            repr(codeRequest.dependency_set).encode("utf-8")
+        ).hexdigest()
+
+    def acquire(self, spec) -> Path:
+        """
+        Retrieves the environment for given flake spec, building it if needed.
+        It remains in use, and therefore not evictable, until it's released.
+        :param spec: The flake spec.
+        :type spec: pythoneda.shared.code_requests.CodeRequestNixFlakeSpec
+        :return: The environment folder.
+        :rtype: pathlib.Path
+        """
+        key = self.key_for(spec.code_request)
+        while True:
+            with self._lock:
+                entry = self._environments.get(key)
+                if entry is not None:
+                    self._environments.move_to_end(key)
+                    entry[2] += 1
+                    break
+                event = self._building.get(key)
+                building = event is None
+                if building:
+                    event = threading.Event()
+                    self._building[key] = event
+            if not building:
+                # somebody else is building it: wait, and check again
+                event.wait()
+                continue
+            try:
+                folder = self._build(key, spec)
+                entry = [folder, self._disk_usage_of(folder), 1]
+                with self._lock:
+                    self._environments[key] = entry
+            finally:
+                with self._lock:
+                    del self._building[key]
+                event.set()
+            self.evict()
+            break
+
+        with contextlib.suppress(OSError):
+            os.utime(entry[0] / self._MARKER)
+        return entry[0]
+
+    def release(self, folder: Path):
+        """
+        Declares the environment in given folder is no longer used by a request.
+        :param folder: The environment folder.
+        :type folder: pathlib.Path
+        """
+        with self._lock:
+            entry = self._environments.get(Path(folder).name)
+            if entry is not None and entry[2] > 0:
+                entry[2] -= 1
+        self.evict()
+
+    @contextlib.contextmanager
+    def environment(self, spec):
+        """
+        Acquires the environment for given flake spec, and releases it afterwards.
+        :param spec: The flake spec.
+        :type spec: pythoneda.shared.code_requests.CodeRequestNixFlakeSpec
+        :return: The environment folder.
+        :rtype: pathlib.Path
+        """
+        folder = self.acquire(spec)
+        try:
+            yield folder
+        finally:
+            self.release(folder)
+
+    def evict(self):
+        """
+        Removes the least recently used environments not in use, until the budgets are met.
+        """
+        evicted = []
+        with self._lock:
+            count = len(self._environments)
+            size = sum(entry[1] for entry in self._environments.values())
+            for key, entry in list(self._environments.items()):
+                if not self._over_budget(count, size):
+                    break
+                if entry[2] == 0:
+                    del self._environments[key]
+                    evicted.append(entry[0])
+                    count -= 1
+                    size -= entry[1]
+        for folder in evicted:
+            self._remove(folder)
+
+    def _over_budget(self, count: int, size: int) -> bool:
+        """
+        Checks whether given usage exceeds the budgets.
+        :param count: The number of environments.
+        :type count: int
+        :param size: The bytes they take.
+        :type size: int
+        :return: True in such case.
+        :rtype: bool
+        """
+        if self._max_environments is not None and count > self._max_environments:
+            return True
+        return self._disk_budget is not None and size > self._disk_budget
+
+    def _build(self, key: str, spec) -> Path:
+        """
+        Generates and realizes the environment for given flake spec.
+        :param key: The environment key.
+        :type key: str
+        :param spec: The flake spec.
+        :type spec: pythoneda.shared.code_requests.CodeRequestNixFlakeSpec
+        :return: The environment folder.
+        :rtype: pathlib.Path
+        """
+        result = self._pool_folder / key
+        # built in place, so that the garbage collector roots point to the final folder
+        self._remove(result)
+        result.mkdir(parents=True)
+        try:
+            flake = CodeExecutionNixFlake(
+                spec.code_request, self._inputs_resolver(spec)
+            )
+            flake.generate_files(str(result))
+            subprocess.run(
+                self._build_command,
+                cwd=result,
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+            (result / self._MARKER).write_text(key)
+        except BaseException:
+            self._remove(result)
+            raise
+        return result
+
+    def _load(self):
+        """
+        Indexes the environments already built in the pool folder, by last use.
+        """
+        if not self._pool_folder.is_dir():
+            return
+        found = []
+        for folder in self._pool_folder.iterdir():
+            marker = folder / self._MARKER
+            if not marker.is_file():
+                continue
+            profile = folder / self.PROFILE
+            if profile.is_symlink() and not profile.exists():
+                # its closure is gone, so it has to be built again
+                self._remove(folder)
+                continue
+            found.append((marker.stat().st_mtime, folder))
+        for _, folder in sorted(found):
+            self._environments[folder.name] = [
+                folder,
+                self._disk_usage_of(folder),
+                0,
+            ]
+
+    @classmethod
+    def _remove(cls, folder: Path):
+        """
+        Removes given environment folder, garbage collector root included.
+        :param folder: The folder.
+        :type folder: pathlib.Path
+        """
+        # the root goes first, so that a partial removal doesn't keep the closure alive
+        for root in Path(folder).glob(f"{cls.PROFILE}*"):
+            with contextlib.suppress(OSError):
+                if root.is_symlink():
+                    root.unlink()
+        shutil.rmtree(folder, ignore_errors=True)
+
+    @classmethod
+    def _disk_usage_of(cls, folder: Path) -> int:
+        """
+        Computes the bytes taken by given environment: its folder, without
+        following symlinks, and the closure of its garbage collector root, if any.
+        Paths shared with other environments count towards each of them.
+        :param folder: The environment folder.
+        :type folder: pathlib.Path
+        :return: Such size.
+        :rtype: int
+        """
+        result = 0
+        for root, _, files in os.walk(folder):
+            for name in files:
+                with contextlib.suppress(OSError):
+                    result += os.lstat(os.path.join(root, name)).st_size
+        profile = Path(folder) / cls.PROFILE
+        if profile.exists():
+            with contextlib.suppress(OSError, ValueError, subprocess.SubprocessError):
+                output = subprocess.run(
+                    ["nix", "path-info", "--closure-size", str(profile)],
+                    capture_output=True,
+                    check=True,
+                    text=True,
+                ).stdout
+                # one "<store path> <size>" line
+                result += int(output.split()[-1])
+        return result
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,362 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/dependency_resolver.py
+
+This file declares the DependencyResolver class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .dependency import Dependency
+from collections import OrderedDict
+import contextlib
+import importlib
+import json
+import os
+from pathlib import Path
+from pythoneda.shared.nix.flake import NixFlake
+import tempfile
+import threading
+import time
+from typing import Callable, Iterable, List, Tuple
+
+
+class DependencyResolver:
+    """
+    Caches the resolution of dependencies into the Nix flakes used as inputs.
+
+    Class name: DependencyResolver
+
+    Responsibilities:
+        - Resolves each dependency through a given function, once per time-to-live.
+        - Keeps the most recently used resolutions in memory.
+        - Persists resolutions in an index file shared by all processes using it.
+        - Remembers failed resolutions for a shorter time-to-live.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.Dependency
+        - pythoneda.shared.nix.flake.NixFlake
+    """
+
+    _INDEX_VERSION = 1
+
+    def __init__(
+        self,
+        resolver: Callable,
+        indexFile: str = None,
+        maxEntries: int = 1024,
+        ttl: float = 86400,
+        negativeTtl: float = 300,
+        baseInputs: List = [],
+        clock: Callable = time.time,
+    ):
+        """
+        Creates a new DependencyResolver instance.
+        :param resolver: Resolves a dependency into its flake, or None if it cannot be resolved.
+        :type resolver: Callable[[pythoneda.shared.code_requests.Dependency], pythoneda.shared.nix.flake.NixFlake]
+        :param indexFile: The file persisting the resolutions, if any.
+        :type indexFile: str
+        :param maxEntries: The maximum number of resolved flakes to keep in memory.
+        :type maxEntries: int
+        :param ttl: The number of seconds a resolution is valid for.
+        :type ttl: float
+        :param negativeTtl: The number of seconds a failed resolution is remembered for.
+        :type negativeTtl: float
+        :param baseInputs: The inputs every flake needs, besides its dependencies.
+        :type baseInputs: List[pythoneda.shared.nix.flake.NixFlake]
+        :param clock: Provides the current time, in seconds.
+        :type clock: Callable[[], float]
+        """
+        super().__init__()
+        self._resolver = resolver
+        self._index_file = None if indexFile is None else Path(indexFile)
+        self._max_entries = maxEntries
+        self._ttl = ttl
+        self._negative_ttl = negativeTtl
+        self._base_inputs = list(baseInputs)
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (expiration, flake or None), least recently used first
+        self._memory = OrderedDict()
+        # "name\0version" -> {"expires": float, "class": str, "flake": dict or None}
+        self._index = self._load_index()
+        self._dirty = False
+
+    @property
+    def index_file(self) -> Path:
+        """
+        Retrieves the file persisting the resolutions.
+        :return: Such file, or None if they are kept in memory only.
+        :rtype: pathlib.Path
+        """
+        return self._index_file
+
+    @property
+    def max_entries(self) -> int:
+        """
+        Retrieves the maximum number of resolved flakes kept in memory.
+        :return: Such number.
+        :rtype: int
+        """
+        return self._max_entries
+
+    @property
+    def ttl(self) -> float:
+        """
+        Retrieves the number of seconds a resolution is valid for.
+        :return: Such time.
+        :rtype: float
+        """
+        return self._ttl
+
+    @property
+    def negative_ttl(self) -> float:
+        """
+        Retrieves the number of seconds a failed resolution is remembered for.
+        :return: Such time.
+        :rtype: float
+        """
+        return self._negative_ttl
+
+    @classmethod
+    def key_for(cls, dependency: Dependency) -> Tuple[str, str]:
+        """
+        Retrieves the key of given dependency: its primary key.
+        :param dependency: The dependency.
+        :type dependency: pythoneda.shared.code_requests.Dependency
+        :return: Its name and version.
+        :rtype: Tuple[str, str]
+        """
+        return (dependency.name, dependency.version)
+
+    def resolve(self, dependency: Dependency) -> NixFlake:
+        """
+        Resolves given dependency.
+        :param dependency: The dependency.
+        :type dependency: pythoneda.shared.code_requests.Dependency
+        :return: Its flake, or None if it cannot be resolved.
+        :rtype: pythoneda.shared.nix.flake.NixFlake
+        """
+        try:
+            return self._resolve(dependency)
+        finally:
+            self.flush()
+
+    def resolve_all(self, dependencies: Iterable) -> List[NixFlake]:
+        """
+        Resolves given dependencies, once each.
+        :param dependencies: The dependencies.
+        :type dependencies: Iterable[pythoneda.shared.code_requests.Dependency]
+        :return: Their flakes, in order, without duplicates.
+        :rtype: List[pythoneda.shared.nix.flake.NixFlake]
+        :raise LookupError: If any of them cannot be resolved.
+        """
+        result = []
+        unresolved = []
+        seen = set()
+        try:
+            for dependency in dependencies:
+                key = self.key_for(dependency)
+                if key in seen:
+                    continue
+                seen.add(key)
+                flake = self._resolve(dependency)
+                if flake is None:
+                    unresolved.append(f"{key[0]}-{key[1]}")
+                else:
+                    result.append(flake)
+        finally:
+            self.flush()
+        if unresolved:
+            raise LookupError(f"Cannot resolve {', '.join(unresolved)}")
+        return result
+
+    def inputs_for(self, spec) -> List[NixFlake]:
+        """
+        Resolves the inputs of the flake for given spec.
+        Can be used as the inputs resolver of the flake builders.
+        :param spec: The flake spec.
+        :type spec: pythoneda.shared.code_requests.CodeRequestNixFlakeSpec
+        :return: The base inputs, followed by the flakes of the dependencies.
+        :rtype: List[pythoneda.shared.nix.flake.NixFlake]
+        :raise LookupError: If any dependency cannot be resolved.
+        """
+        return self._base_inputs + self.resolve_all(spec.code_request.dependencies)
+
+    def invalidate(self, dependency: Dependency = None):
+        """
+        Forgets the resolution of given dependency, or of all of them.
+        :param dependency: The dependency, or None for all.
+        :type dependency: pythoneda.shared.code_requests.Dependency
+        """
+        with self._lock:
+            if dependency is None:
+                self._memory.clear()
+                self._index.clear()
+            else:
+                key = self.key_for(dependency)
+                self._memory.pop(key, None)
+                self._index.pop(self._index_key(key), None)
+            self._dirty = True
+        self.flush(replace=True)
+
+    def flush(self, replace: bool = False):
+        """
+        Writes the new resolutions to the index file, merging those other processes wrote.
+        :param replace: Whether to discard the entries of the file instead of merging them.
+        :type replace: bool
+        """
+        if self._index_file is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            entries = dict(self._index)
+        if not replace:
+            for key, entry in self._load_index().items():
+                if key not in entries or entries[key]["expires"] < entry["expires"]:
+                    entries[key] = entry
+        with self._lock:
+            for key, entry in entries.items():
+                self._index.setdefault(key, entry)
+        self._index_file.parent.mkdir(parents=True, exist_ok=True)
+        descriptor, staging = tempfile.mkstemp(
+            prefix=f".{self._index_file.name}.", dir=self._index_file.parent
+        )
+        try:
+            with os.fdopen(descriptor, "w") as index_file:
+                json.dump(
+                    {"version": self._INDEX_VERSION, "entries": entries}, index_file
+                )
+            os.replace(staging, self._index_file)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(staging)
+            raise
+
+    def _resolve(self, dependency: Dependency) -> NixFlake:
+        """
+        Resolves given dependency, without persisting the result.
+        :param dependency: The dependency.
+        :type dependency: pythoneda.shared.code_requests.Dependency
+        :return: Its flake, or None if it cannot be resolved.
+        :rtype: pythoneda.shared.nix.flake.NixFlake
+        """
+        key = self.key_for(dependency)
+        now = self._clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                self._memory.move_to_end(key)
+                return entry[1]
+            stored = self._index.get(self._index_key(key))
+        if stored is not None and stored["expires"] > now:
+            flake = self._from_stored(stored)
+            if flake is not None or stored["flake"] is None:
+                self._remember(key, stored["expires"], flake)
+                return flake
+
+        flake = self._resolver(dependency)
+        expires = now + (self._negative_ttl if flake is None else self._ttl)
+        self._remember(key, expires, flake)
+        stored = {"expires": expires, "class": None, "flake": None}
+        if flake is not None:
+            klass = flake.__class__
+            stored["class"] = f"{klass.__module__}:{klass.__qualname__}"
+            stored["flake"] = flake.to_dict()
+        with self._lock:
+            self._index[self._index_key(key)] = stored
+            self._dirty = True
+        return flake
+
+    def _remember(self, key: Tuple, expires: float, flake: NixFlake):
+        """
+        Keeps given resolution in memory, evicting the least recently used ones.
+        :param key: The dependency key.
+        :type key: Tuple[str, str]
+        :param expires: When the resolution expires.
+        :type expires: float
+        :param flake: The flake, or None if it cannot be resolved.
+        :type flake: pythoneda.shared.nix.flake.NixFlake
+        """
+        with self._lock:
+            self._memory[key] = (expires, flake)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self._max_entries:
+                self._memory.popitem(last=False)
+
+    @classmethod
+    def _index_key(cls, key: Tuple) -> str:
+        """
+        Converts given dependency key into a key of the index file.
+        :param key: The dependency key.
+        :type key: Tuple[str, str]
+        :return: The index key.
+        :rtype: str
+        """
+        return f"{key[0]}\0{key[1]}"
+
+    @classmethod
+    def _from_stored(cls, stored: dict) -> NixFlake:
+        """
+        Rebuilds the flake of given index entry.
+        :param stored: The index entry.
+        :type stored: dict
+        :return: The flake, or None if there's none, or it cannot be rebuilt.
+        :rtype: pythoneda.shared.nix.flake.NixFlake
+        """
+        if stored["flake"] is None:
+            return None
+        try:
+            module_name, _, qualname = stored["class"].partition(":")
+            klass = importlib.import_module(module_name)
+            for part in qualname.split("."):
+                klass = getattr(klass, part)
+            return klass.from_dict(stored["flake"])
+        except Exception:
+            return None
+
+    def _load_index(self) -> dict:
+        """
+        Reads the index file.
+        :return: Its unexpired entries.
+        :rtype: dict
+        """
+        if self._index_file is None:
+            return {}
+        try:
+            with open(self._index_file, "r") as index_file:
+                contents = json.load(index_file)
+        except (OSError, ValueError):
+            return {}
+        if contents.get("version") != self._INDEX_VERSION:
+            return {}
+        now = self._clock()
+        return {
+            key: entry
+            for key, entry in contents.get("entries", {}).items()
+            if entry.get("expires", 0) > now
+        }
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,173 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/git_add_batch.py
+
+This file declares the GitAddBatch class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import os
+import subprocess
+import threading
+from typing import List
+
+
+class GitAddBatch:
+    """
+    Collects the files to stage, and stages them all with a single git add.
+
+    Class name: GitAddBatch
+
+    Responsibilities:
+        - Can be used wherever a GitAdd is expected.
+        - Collects the files of one or many folders within a repository.
+        - Stages them with one git process, and therefore one index update.
+
+    Collaborators:
+        - pythoneda.shared.git.GitAdd
+        - pythoneda.shared.code_requests.CodeRequestNixFlake
+    """
+
+    # git fails instead of waiting when another process holds index.lock
+    _git_lock = threading.Lock()
+
+    def __init__(self, folder: str, parent=None):
+        """
+        Creates a new GitAddBatch instance.
+        :param folder: The folder the added files are relative to. For the batch itself, a folder within the repository.
+        :type folder: str
+        :param parent: The batch collecting the files, if this one is just a view of it.
+        :type parent: pythoneda.shared.code_requests.GitAddBatch
+        """
+        super().__init__()
+        self._folder = os.path.abspath(folder)
+        self._parent = parent
+        if parent is None:
+            self._lock = threading.Lock()
+            self._paths = []
+
+    @property
+    def folder(self) -> str:
+        """
+        Retrieves the folder the added files are relative to.
+        :return: Such folder.
+        :rtype: str
+        """
+        return self._folder
+
+    @property
+    def paths(self) -> List[str]:
+        """
+        Retrieves the files collected so far.
+        :return: Their absolute paths.
+        :rtype: List[str]
+        """
+        root = self._root()
+        with root._lock:
+            return list(root._paths)
+
+    def __len__(self) -> int:
+        """
+        Retrieves the number of files collected so far.
+        :return: Such number.
+        :rtype: int
+        """
+        return len(self.paths)
+
+    def __enter__(self):
+        """
+        Uses this batch as a context manager.
+        :return: This instance.
+        :rtype: pythoneda.shared.code_requests.GitAddBatch
+        """
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        """
+        Stages the collected files when leaving the context without errors.
+        """
+        if excType is None:
+            self.flush()
+
+    def _root(self):
+        """
+        Retrieves the batch collecting the files.
+        :return: Such batch.
+        :rtype: pythoneda.shared.code_requests.GitAddBatch
+        """
+        result = self
+        while result._parent is not None:
+            result = result._parent
+        return result
+
+    def for_folder(self, folder: str):
+        """
+        Retrieves a view of this batch whose added files are relative to given folder.
+        :param folder: The folder, such as the one of a flake.
+        :type folder: str
+        :return: Such view.
+        :rtype: pythoneda.shared.code_requests.GitAddBatch
+        """
+        return self.__class__(folder, self._root())
+
+    def add(self, file: str):
+        """
+        Collects a file to stage.
+        :param file: The file, relative to the folder of this batch.
+        :type file: str
+        """
+        path = os.path.join(self._folder, file)
+        root = self._root()
+        with root._lock:
+            root._paths.append(path)
+
+    def flush(self):
+        """
+        Stages all files collected so far, in a single git add.
+        :raise subprocess.CalledProcessError: If git fails.
+        """
+        root = self._root()
+        with root._lock:
+            paths = list(dict.fromkeys(root._paths))
+            root._paths.clear()
+        if not paths:
+            return
+        try:
+            # the pathspecs go through stdin, so their number is not bounded by ARG_MAX
+            with GitAddBatch._git_lock:
+                subprocess.run(
+                    ["git", "add", "--pathspec-from-file=-", "--pathspec-file-nul"],
+                    cwd=root._folder,
+                    input="\0".join(paths).encode("utf-8"),
+                    check=True,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                )
+        except BaseException:
+            # kept for another attempt
+            with root._lock:
+                root._paths[:0] = paths
+            raise
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,274 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/import_scanner.py
+
+This file declares the ImportScanner class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .dependency import Dependency
+import ast
+from collections import OrderedDict
+import hashlib
+import json
+import sys
+import threading
+from typing import Dict, List, Tuple
+
+
+class ImportScanner:
+    """
+    Infers the dependencies of code from the modules it imports.
+
+    Class name: ImportScanner
+
+    Responsibilities:
+        - Finds the absolute imports of code, at any nesting level.
+        - Maps each imported module to its dependency, through the longest
+          registered prefix of its dotted name.
+        - Leaves out the standard library, unless the index says otherwise.
+        - Caches the outcome per hash of the code.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.Dependency
+        - pythoneda.shared.code_requests.CodeRequest
+    """
+
+    STANDARD_MODULES = frozenset(
+        [
+            *getattr(sys, "stdlib_module_names", ()),
+            *sys.builtin_module_names,
+            "__future__",
+            "__main__",
+        ]
+    )
+
+    _DYNAMIC_IMPORTS = ("import_module", "__import__")
+
+    def __init__(self, index: Dict = None, maxEntries: int = 4096):
+        """
+        Creates a new ImportScanner instance.
+        :param index: The dependency providing each module or package, by dotted name.
+        :type index: Dict[str, pythoneda.shared.code_requests.Dependency]
+        :param maxEntries: The maximum number of scanned codes to remember.
+        :type maxEntries: int
+        """
+        super().__init__()
+        self._index = dict(index or {})
+        self._max_entries = maxEntries
+        self._lock = threading.Lock()
+        # code hash -> (dependencies, unknown modules), least recently used first
+        self._scans = OrderedDict()
+
+    @classmethod
+    def from_file(cls, indexFile: str, maxEntries: int = 4096):
+        """
+        Builds a scanner whose index is read from a JSON file, mapping each
+        module to the dict of its dependency.
+        :param indexFile: The file.
+        :type indexFile: str
+        :param maxEntries: The maximum number of scanned codes to remember.
+        :type maxEntries: int
+        :return: The scanner.
+        :rtype: pythoneda.shared.code_requests.ImportScanner
+        """
+        with open(indexFile, "r") as index_file:
+            stored = json.load(index_file)
+        return cls(
+            {module: Dependency.from_dict(value) for module, value in stored.items()},
+            maxEntries,
+        )
+
+    @property
+    def index(self) -> Dict:
+        """
+        Retrieves the dependency providing each module.
+        :return: A copy of the index.
+        :rtype: Dict[str, pythoneda.shared.code_requests.Dependency]
+        """
+        with self._lock:
+            return dict(self._index)
+
+    @property
+    def max_entries(self) -> int:
+        """
+        Retrieves the maximum number of scanned codes remembered.
+        :return: Such number.
+        :rtype: int
+        """
+        return self._max_entries
+
+    def register(self, module: str, dependency: Dependency):
+        """
+        Declares which dependency provides a module, and its submodules.
+        :param module: The dotted name of the module or package.
+        :type module: str
+        :param dependency: The dependency.
+        :type dependency: pythoneda.shared.code_requests.Dependency
+        """
+        with self._lock:
+            # a new dict, so that scans in progress don't cache stale outcomes
+            self._index = {**self._index, module: dependency}
+            self._scans.clear()
+
+    def dependencies_of(self, code: str) -> List:
+        """
+        Infers the dependencies of given code.
+        :param code: The code.
+        :type code: str
+        :return: The dependencies of its non-standard imports, in order of appearance.
+        :rtype: List[pythoneda.shared.code_requests.Dependency]
+        """
+        return list(self.scan(code)[0])
+
+    def unknown_modules(self, code: str) -> List[str]:
+        """
+        Retrieves the modules imported by given code no registered dependency provides.
+        :param code: The code.
+        :type code: str
+        :return: Such modules.
+        :rtype: List[str]
+        """
+        return list(self.scan(code)[1])
+
+    def scan(self, code: str) -> Tuple[Tuple, Tuple]:
+        """
+        Infers the dependencies of given code, reusing the outcome for code scanned before.
+        :param code: The code.
+        :type code: str
+        :return: Its dependencies, and the imported modules no dependency provides.
+        :rtype: Tuple[Tuple[pythoneda.shared.code_requests.Dependency], Tuple[str]]
+        """
+        key = hashlib.sha256(code.encode("utf-8")).digest()
+        with self._lock:
+            result = self._scans.get(key)
+            if result is not None:
+                self._scans.move_to_end(key)
+                return result
+            index = self._index
+        dependencies = {}
+        unknown = {}
+        for module in self.imported_modules(code):
+            dependency = self._lookup(index, module)
+            if dependency is not None:
+                dependencies[dependency] = None
+            elif module.partition(".")[0] not in self.STANDARD_MODULES:
+                unknown[module] = None
+        result = (tuple(dependencies), tuple(unknown))
+        with self._lock:
+            if index is self._index:
+                self._scans[key] = result
+                while len(self._scans) > self._max_entries:
+                    self._scans.popitem(last=False)
+        return result
+
+    @classmethod
+    def _lookup(cls, index: Dict, module: str) -> Dependency:
+        """
+        Finds the dependency registered for the longest prefix of given module.
+        :param index: The index.
+        :type index: Dict[str, pythoneda.shared.code_requests.Dependency]
+        :param module: The dotted name of the module.
+        :type module: str
+        :return: Such dependency, or None.
+        :rtype: pythoneda.shared.code_requests.Dependency
+        """
+        prefix = module
+        while True:
+            result = index.get(prefix)
+            if result is not None or "." not in prefix:
+                return result
+            prefix = prefix.rpartition(".")[0]
+
+    @classmethod
+    def imported_modules(cls, code: str) -> List[str]:
+        """
+        Finds the absolute imports of given code, including the ones within
+        functions, conditionals and try blocks, and the calls to
+        importlib.import_module() or __import__() with a literal name.
+        Lines with IPython magics or shell escapes are ignored.
+        :param code: The code.
+        :type code: str
+        :return: The imported modules, in order of appearance.
+        :rtype: List[str]
+        """
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            try:
+                tree = ast.parse(cls._without_magics(code))
+            except SyntaxError:
+                return []
+        found = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    found.append((node.lineno, node.col_offset, alias.name))
+            elif isinstance(node, ast.ImportFrom):
+                if node.level == 0 and node.module:
+                    found.append((node.lineno, node.col_offset, node.module))
+            elif (
+                isinstance(node, ast.Call)
+                and node.args
+                and isinstance(node.args[0], ast.Constant)
+                and isinstance(node.args[0].value, str)
+                and cls._called_name(node.func) in cls._DYNAMIC_IMPORTS
+                and not node.args[0].value.startswith(".")
+            ):
+                found.append((node.lineno, node.col_offset, node.args[0].value))
+        # ast.walk() goes breadth-first, not in source order
+        return list(dict.fromkeys(module for *_, module in sorted(found)))
+
+    @classmethod
+    def _called_name(cls, function: ast.expr) -> str:
+        """
+        Retrieves the name of a called function.
+        :param function: The function expression.
+        :type function: ast.expr
+        :return: Its name or attribute name, if any.
+        :rtype: str
+        """
+        if isinstance(function, ast.Name):
+            return function.id
+        if isinstance(function, ast.Attribute):
+            return function.attr
+        return None
+
+    @classmethod
+    def _without_magics(cls, code: str) -> str:
+        """
+        Replaces the lines starting with an IPython magic or a shell escape.
+        :param code: The code.
+        :type code: str
+        :return: The code, with such lines replaced by "pass".
+        :rtype: str
+        """
+        lines = code.splitlines()
+        for position, line in enumerate(lines):
+            stripped = line.lstrip()
+            if stripped.startswith(("%", "!")):
+                lines[position] = line[: len(line) - len(stripped)] + "pass"
+        return "\n".join(lines)
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,98 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/instrumentation.py
+
+This file declares the Instrumentation class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import contextlib
+
+
+class Instrumentation:
+    """
+    Extension point to observe where the time of code requests goes. This one does nothing.
+
+    Class name: Instrumentation
+
+    Responsibilities:
+        - Provides the spans wrapping each step of the lifecycle of code requests.
+        - Keeps the instrumentation installed in the process.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.TimingInstrumentation
+    """
+
+    _NO_SPAN = contextlib.nullcontext()
+
+    _current = None
+
+    @classmethod
+    def current(cls):
+        """
+        Retrieves the instrumentation installed in the process.
+        :return: Such instrumentation.
+        :rtype: pythoneda.shared.code_requests.Instrumentation
+        """
+        result = Instrumentation._current
+        if result is None:
+            result = Instrumentation()
+            Instrumentation._current = result
+        return result
+
+    @classmethod
+    def install(cls, instrumentation=None):
+        """
+        Installs given instrumentation in the process.
+        :param instrumentation: The instrumentation, or None to go back to doing nothing.
+        :type instrumentation: pythoneda.shared.code_requests.Instrumentation
+        :return: The instrumentation installed before.
+        :rtype: pythoneda.shared.code_requests.Instrumentation
+        """
+        result = cls.current()
+        Instrumentation._current = instrumentation
+        return result
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Checks whether this instrumentation records anything.
+        :return: False, as this one does nothing.
+        :rtype: bool
+        """
+        return False
+
+    def span(self, name: str, **attributes):
+        """
+        Wraps a step.
+        :param name: The name of the step.
+        :type name: str
+        :param attributes: Details about the step.
+        :type attributes: Dict
+        :return: A context manager covering the step.
+        :rtype: contextlib.AbstractContextManager
+        """
+        return self._NO_SPAN
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,181 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/lazy_cell_list.py
+
+This file declares the LazyCellList class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .cell import Cell
+from .dependency import Dependency
+from collections.abc import MutableSequence
+from typing import Dict, List
+
+
+class LazyCellList(MutableSequence):
+    """
+    A list of cells kept in their unmarshalled form until they are accessed.
+
+    Class name: LazyCellList
+
+    Responsibilities:
+        - Behaves like the list of cells of a CodeRequest.
+        - Builds each cell from its dict on first access only.
+        - Provides the dependencies and dicts of cells without building them.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.Cell
+        - pythoneda.shared.code_requests.CodeRequest
+    """
+
+    def __init__(self, items: List):
+        """
+        Creates a new LazyCellList instance.
+        :param items: The cells, either built or as dicts. Dicts are kept, not copied.
+        :type items: List
+        """
+        super().__init__()
+        self._items = list(items)
+
+    def __len__(self) -> int:
+        """
+        Retrieves the number of cells.
+        :return: Such number.
+        :rtype: int
+        """
+        return len(self._items)
+
+    def __getitem__(self, index):
+        """
+        Retrieves the cell at given position, building it if needed.
+        :param index: The position, or a slice.
+        :type index: int
+        :return: The cell, or a list of cells for slices.
+        :rtype: pythoneda.shared.code_requests.Cell
+        """
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        result = self._items[index]
+        if isinstance(result, dict):
+            result = Cell.from_dict(result)
+            self._items[index] = result
+        return result
+
+    def __setitem__(self, index, value):
+        """
+        Replaces the cell at given position.
+        :param index: The position, or a slice.
+        :type index: int
+        :param value: The cell, or an iterable of cells for slices.
+        :type value: pythoneda.shared.code_requests.Cell
+        """
+        self._items[index] = value
+
+    def __delitem__(self, index):
+        """
+        Removes the cell at given position.
+        :param index: The position, or a slice.
+        :type index: int
+        """
+        del self._items[index]
+
+    def insert(self, index: int, value: Cell):
+        """
+        Inserts a cell at given position.
+        :param index: The position.
+        :type index: int
+        :param value: The cell.
+        :type value: pythoneda.shared.code_requests.Cell
+        """
+        self._items.insert(index, value)
+
+    def __eq__(self, other) -> bool:
+        """
+        Checks whether this list contains the same cells as another sequence.
+        :param other: The other sequence.
+        :type other: Sequence
+        :return: True in such case.
+        :rtype: bool
+        """
+        if not isinstance(other, (list, LazyCellList)):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            mine == theirs for mine, theirs in zip(self, other)
+        )
+
+    def __repr__(self) -> str:
+        """
+        Provides a text representation of this instance.
+        :return: Such text.
+        :rtype: str
+        """
+        return f"{self.__class__.__name__}({len(self)} cells, {self.built} built)"
+
+    @property
+    def built(self) -> int:
+        """
+        Retrieves how many cells have already been built.
+        :return: Such number.
+        :rtype: int
+        """
+        return sum(1 for item in self._items if not isinstance(item, dict))
+
+    def is_built(self, index: int) -> bool:
+        """
+        Checks whether the cell at given position has already been built.
+        :param index: The position.
+        :type index: int
+        :return: True in such case.
+        :rtype: bool
+        """
+        return not isinstance(self._items[index], dict)
+
+    def dependencies_of(self, index: int) -> List:
+        """
+        Retrieves the dependencies of the cell at given position, without building it.
+        :param index: The position.
+        :type index: int
+        :return: The dependencies.
+        :rtype: List[pythoneda.shared.code_requests.Dependency]
+        """
+        item = self._items[index]
+        if isinstance(item, dict):
+            if "dependencies" in item:
+                return [Dependency.from_dict(value) for value in item["dependencies"]]
+            if "contents" in item:
+                # a cell with no dependencies attribute, such as a markdown one
+                return []
+        return self[index].dependencies
+
+    def to_dicts(self) -> List[Dict]:
+        """
+        Retrieves the cells as dicts, reusing the original ones for unbuilt cells.
+        :return: Such dicts.
+        :rtype: List[Dict]
+        """
+        return [
+            item if isinstance(item, dict) else item.to_dict() for item in self._items
+        ]
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
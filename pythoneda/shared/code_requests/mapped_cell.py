@@ -0,0 +1,150 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/mapped_cell.py
+
+This file declares the MappedCell class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import abc
+from .cell import Cell
+from pythoneda.shared import ValueObject
+from typing import Dict, Iterator
+
+
+class MappedCell(Cell, abc.ABC):
+    """
+    A Cell whose contents stay in a memory-mapped file until they are accessed.
+
+    Class name: MappedCell
+
+    Responsibilities:
+        - Represents a Cell as an offset/length view of a MappedCellStore.
+        - Decodes its contents on each access, without keeping them.
+        - Provides its lines and encoded contents straight from the mapping.
+        - Turns into an in-memory cell when copied, pickled or marshalled.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.Cell
+        - pythoneda.shared.code_requests.MappedCellStore
+    """
+
+    def __init__(self, store, offset: int, length: int):
+        """
+        Creates a new MappedCell instance.
+        :param store: The store holding the contents.
+        :type store: pythoneda.shared.code_requests.MappedCellStore
+        :param offset: The position of the encoded contents in the store.
+        :type offset: int
+        :param length: The size of the encoded contents.
+        :type length: int
+        """
+        # the contents live in the store, so Cell.__init__ has nothing to keep
+        ValueObject.__init__(self)
+        self._store = store
+        self._offset = offset
+        self._length = length
+        self._digest = None
+
+    @property
+    def _contents(self) -> str:
+        """
+        Decodes the cell contents from the store.
+        :return: Such contents.
+        :rtype: str
+        """
+        return self._store.text(self._offset, self._length)
+
+    @property
+    def store(self):
+        """
+        Retrieves the store holding the contents.
+        :return: Such store.
+        :rtype: pythoneda.shared.code_requests.MappedCellStore
+        """
+        return self._store
+
+    @property
+    def offset(self) -> int:
+        """
+        Retrieves the position of the encoded contents in the store.
+        :return: Such position.
+        :rtype: int
+        """
+        return self._offset
+
+    @property
+    def length(self) -> int:
+        """
+        Retrieves the size of the encoded contents.
+        :return: Such size, in bytes.
+        :rtype: int
+        """
+        return self._length
+
+    def iter_lines(self) -> Iterator[str]:
+        """
+        Iterates over the lines of the cell contents, decoding one at a time.
+        :return: An iterator over such lines.
+        :rtype: Iterator[str]
+        """
+        return self._store.lines(self._offset, self._length)
+
+    def encoded_contents(self):
+        """
+        Retrieves the cell contents, encoded as UTF-8, without copying them.
+        :return: A view of the mapping.
+        :rtype: memoryview
+        """
+        return self._store.view(self._offset, self._length)
+
+    @abc.abstractmethod
+    def detached(self) -> Cell:
+        """
+        Retrieves an in-memory copy of this cell.
+        :return: Such copy.
+        :rtype: pythoneda.shared.code_requests.Cell
+        """
+        raise NotImplementedError("detached() should be implemented in subclasses")
+
+    def to_dict(self) -> Dict:
+        """
+        Retrieves the dict of this cell, as the one of its in-memory copy.
+        :return: Such dict.
+        :rtype: Dict
+        """
+        return self.detached().to_dict()
+
+    def __reduce_ex__(self, protocol):
+        """
+        Reduces this cell to its in-memory copy, since mappings cannot be pickled.
+        :param protocol: The pickle protocol.
+        :type protocol: int
+        :return: How to rebuild the copy.
+        :rtype: Tuple
+        """
+        detached = self.detached()
+        return (detached.__class__.from_dict, (detached.to_dict(),))
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
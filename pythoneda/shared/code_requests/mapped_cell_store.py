@@ -0,0 +1,243 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/mapped_cell_store.py
+
+This file declares the MappedCellStore class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .code_cell import CodeCell
+from .dependency import Dependency
+from .mapped_code_cell import MappedCodeCell
+from .mapped_markdown_cell import MappedMarkdownCell
+import contextlib
+import json
+import mmap
+import os
+import struct
+from typing import Iterable, Iterator, List
+
+
+class MappedCellStore:
+    """
+    A file holding the contents of many cells, memory-mapped so that they are
+    only read and decoded when accessed.
+
+    Class name: MappedCellStore
+
+    Responsibilities:
+        - Writes the contents of cells back to back, followed by an index of them.
+        - Maps such file read-only, and provides a view cell per entry.
+        - Decodes contents, or single lines of them, straight from the mapping.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.MappedCell
+        - pythoneda.shared.code_requests.CodeRequest
+    """
+
+    MAGIC = b"PCRM"
+
+    VERSION = 1
+
+    # the offset of the index, then the magic number again
+    _FOOTER = struct.Struct(">Q4s")
+
+    def __init__(self, path: str):
+        """
+        Creates a new MappedCellStore instance, mapping given file.
+        :param path: The file, as written by MappedCellStore.write().
+        :type path: str
+        """
+        super().__init__()
+        self._path = path
+        self._file = open(path, "rb")
+        try:
+            self._mapping = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._entries = self._read_index()
+        except BaseException:
+            self._file.close()
+            raise
+
+    @property
+    def path(self) -> str:
+        """
+        Retrieves the mapped file.
+        :return: Such file.
+        :rtype: str
+        """
+        return self._path
+
+    def __len__(self) -> int:
+        """
+        Retrieves the number of cells.
+        :return: Such number.
+        :rtype: int
+        """
+        return len(self._entries)
+
+    def __enter__(self):
+        """
+        Uses this store as a context manager.
+        :return: This instance.
+        :rtype: pythoneda.shared.code_requests.MappedCellStore
+        """
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        """
+        Unmaps the file when leaving the context.
+        """
+        self.close()
+
+    def close(self):
+        """
+        Unmaps the file. The cells of this store cannot be accessed afterwards.
+        """
+        self._mapping.close()
+        self._file.close()
+
+    def _read_index(self) -> List:
+        """
+        Reads the index at the end of the mapped file.
+        :return: The [code, offset, length, dependencies] entries.
+        :rtype: List[List]
+        """
+        mapping = self._mapping
+        header = len(self.MAGIC) + 1
+        footer = len(mapping) - self._FOOTER.size
+        if (
+            footer < header
+            or mapping[: len(self.MAGIC)] != self.MAGIC
+            or mapping[len(self.MAGIC)] != self.VERSION
+        ):
+            raise ValueError(f"Not a cell store: {self._path}")
+        index_offset, magic = self._FOOTER.unpack_from(mapping, footer)
+        if magic != self.MAGIC or not header <= index_offset <= footer:
+            raise ValueError(f"Truncated cell store: {self._path}")
+        return json.loads(mapping[index_offset:footer])
+
+    @classmethod
+    def write(cls, cells: Iterable, path: str):
+        """
+        Writes given cells to a new store file, replacing it atomically.
+        :param cells: The cells. Only code and Markdown cells are distinguished.
+        :type cells: Iterable[pythoneda.shared.code_requests.Cell]
+        :param path: The file.
+        :type path: str
+        """
+        staging = f"{path}.tmp"
+        try:
+            with open(staging, "wb") as output:
+                output.write(cls.MAGIC + bytes([cls.VERSION]))
+                offset = output.tell()
+                entries = []
+                for cell in cells:
+                    data = cell.encoded_contents()
+                    output.write(data)
+                    if isinstance(cell, CodeCell):
+                        dependencies = [aux.to_dict() for aux in cell.dependencies]
+                        entries.append([1, offset, len(data), dependencies])
+                    else:
+                        entries.append([0, offset, len(data), None])
+                    offset += len(data)
+                output.write(json.dumps(entries).encode("utf-8"))
+                output.write(cls._FOOTER.pack(offset, cls.MAGIC))
+            os.replace(staging, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(staging)
+            raise
+
+    def cells(self) -> List:
+        """
+        Retrieves a view cell for each entry of this store.
+        :return: Such cells.
+        :rtype: List[pythoneda.shared.code_requests.MappedCell]
+        """
+        result = []
+        for code, offset, length, dependencies in self._entries:
+            if code:
+                result.append(
+                    MappedCodeCell(
+                        self,
+                        offset,
+                        length,
+                        [Dependency.from_dict(aux) for aux in dependencies],
+                    )
+                )
+            else:
+                result.append(MappedMarkdownCell(self, offset, length))
+        return result
+
+    def view(self, offset: int, length: int) -> memoryview:
+        """
+        Retrieves a region of the mapping, without copying it.
+        :param offset: The start of the region.
+        :type offset: int
+        :param length: The size of the region.
+        :type length: int
+        :return: A view of such region.
+        :rtype: memoryview
+        """
+        return memoryview(self._mapping)[offset : offset + length]
+
+    def text(self, offset: int, length: int) -> str:
+        """
+        Decodes a region of the mapping.
+        :param offset: The start of the region.
+        :type offset: int
+        :param length: The size of the region.
+        :type length: int
+        :return: The decoded text.
+        :rtype: str
+        """
+        with self.view(offset, length) as region:
+            return str(region, "utf-8")
+
+    def lines(self, offset: int, length: int) -> Iterator[str]:
+        """
+        Decodes a region of the mapping line by line, as str.splitlines() would split it.
+        :param offset: The start of the region.
+        :type offset: int
+        :param length: The size of the region.
+        :type length: int
+        :return: An iterator over the lines.
+        :rtype: Iterator[str]
+        """
+        mapping = self._mapping
+        end = offset + length
+        position = offset
+        with memoryview(mapping) as region:
+            while position < end:
+                # UTF-8 never uses the newline byte within a multibyte character
+                newline = mapping.find(b"\n", position, end)
+                stop = end if newline < 0 else newline
+                segment = str(region[position:stop], "utf-8")
+                if newline >= 0:
+                    # other line boundaries, such as \r, can precede or share it
+                    segment += "\n"
+                yield from segment.splitlines()
+                position = stop + 1
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
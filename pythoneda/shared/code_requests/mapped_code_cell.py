@@ -0,0 +1,72 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/mapped_code_cell.py
+
+This file declares the MappedCodeCell class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .code_cell import CodeCell
+from .mapped_cell import MappedCell
+from typing import List
+
+
+class MappedCodeCell(MappedCell, CodeCell):
+    """
+    A code cell whose contents stay in a memory-mapped file.
+
+    Class name: MappedCodeCell
+
+    Responsibilities:
+        - Represents a CodeCell backed by a MappedCellStore.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeCell
+        - pythoneda.shared.code_requests.MappedCell
+    """
+
+    def __init__(self, store, offset: int, length: int, dependencies: List):
+        """
+        Creates a new MappedCodeCell instance.
+        :param store: The store holding the contents.
+        :type store: pythoneda.shared.code_requests.MappedCellStore
+        :param offset: The position of the encoded contents in the store.
+        :type offset: int
+        :param length: The size of the encoded contents.
+        :type length: int
+        :param dependencies: The dependencies.
+        :type dependencies: List[pythoneda.shared.code_requests.Dependency]
+        """
+        MappedCell.__init__(self, store, offset, length)
+        self._dependencies = dependencies
+
+    def detached(self) -> CodeCell:
+        """
+        Retrieves an in-memory copy of this cell.
+        :return: Such copy.
+        :rtype: pythoneda.shared.code_requests.CodeCell
+        """
+        return CodeCell(self.contents, self.dependencies)
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
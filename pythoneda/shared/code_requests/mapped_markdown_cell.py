@@ -0,0 +1,68 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/mapped_markdown_cell.py
+
+This file declares the MappedMarkdownCell class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .mapped_cell import MappedCell
+from .markdown_cell import MarkdownCell
+
+
+class MappedMarkdownCell(MappedCell, MarkdownCell):
+    """
+    A Markdown cell whose contents stay in a memory-mapped file.
+
+    Class name: MappedMarkdownCell
+
+    Responsibilities:
+        - Represents a MarkdownCell backed by a MappedCellStore.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.MappedCell
+        - pythoneda.shared.code_requests.MarkdownCell
+    """
+
+    def __init__(self, store, offset: int, length: int):
+        """
+        Creates a new MappedMarkdownCell instance.
+        :param store: The store holding the contents.
+        :type store: pythoneda.shared.code_requests.MappedCellStore
+        :param offset: The position of the encoded contents in the store.
+        :type offset: int
+        :param length: The size of the encoded contents.
+        :type length: int
+        """
+        super().__init__(store, offset, length)
+
+    def detached(self) -> MarkdownCell:
+        """
+        Retrieves an in-memory copy of this cell.
+        :return: Such copy.
+        :rtype: pythoneda.shared.code_requests.MarkdownCell
+        """
+        return MarkdownCell(self.contents)
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -35,6 +35,8 @@ class MarkdownCell(Cell):
         - pythoneda.shared.code_requests.Cell
     """
 
+    _DIGEST_KIND = "markdown"
+
     def __init__(self, contents: str):
         """
         Creates a new MarkdownCell instance.
@@ -0,0 +1,228 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/nix_flake_template_cache.py
+
+This file declares the NixFlakeTemplateCache class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from collections import OrderedDict
+import os
+from pathlib import Path
+import stat
+import tempfile
+import threading
+import time
+from typing import Callable, Iterable, Tuple
+
+
+class NixFlakeTemplateCache:
+    """
+    Per-process cache of template lookups and rendered templates of code request flakes.
+
+    Class name: NixFlakeTemplateCache
+
+    Responsibilities:
+        - Looks up the templates folder of each flake class once.
+        - Reuses the output of a template for flakes rendering it identically.
+        - Invalidates rendered templates when the files of their template group change.
+        - Prewarms itself from sample flakes.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeRequestNixFlake
+    """
+
+    def __init__(self, maxEntries: int = 256, checkInterval: float = 1.0):
+        """
+        Creates a new NixFlakeTemplateCache instance.
+        :param maxEntries: The maximum number of rendered templates to keep.
+        :type maxEntries: int
+        :param checkInterval: The number of seconds between checks of the modification times of a template group.
+        :type checkInterval: float
+        """
+        super().__init__()
+        self._max_entries = maxEntries
+        self._check_interval = checkInterval
+        self._lock = threading.Lock()
+        self._templates_folders = {}
+        # templates folder -> (checked at, signature)
+        self._signatures = {}
+        # key -> (signature, contents, mode), least recently used first
+        self._rendered = OrderedDict()
+
+    @property
+    def max_entries(self) -> int:
+        """
+        Retrieves the maximum number of rendered templates to keep.
+        :return: Such number.
+        :rtype: int
+        """
+        return self._max_entries
+
+    @property
+    def check_interval(self) -> float:
+        """
+        Retrieves the number of seconds between checks of the modification times.
+        :return: Such interval.
+        :rtype: float
+        """
+        return self._check_interval
+
+    def __len__(self) -> int:
+        """
+        Retrieves the number of rendered templates kept.
+        :return: Such number.
+        :rtype: int
+        """
+        return len(self._rendered)
+
+    def templates_folder(self, flake, lookup: Callable) -> str:
+        """
+        Retrieves the templates folder of given flake, looking it up once per class.
+        :param flake: The flake.
+        :type flake: pythoneda.shared.code_requests.CodeRequestNixFlake
+        :param lookup: The uncached lookup.
+        :type lookup: Callable[[], str]
+        :return: The templates folder.
+        :rtype: str
+        """
+        klass = flake.__class__
+        result = self._templates_folders.get(klass)
+        if result is None or not os.path.isdir(result):
+            result = lookup()
+            self._templates_folders[klass] = result
+        return result
+
+    def process_template(
+        self,
+        flake,
+        render: Callable,
+        flakeFolder: str,
+        templateName: str,
+        templatesFolder: str,
+        rootTemplate: str,
+        outputFileName: str,
+    ):
+        """
+        Writes the output of a template, rendering it only if it's not cached.
+        :param flake: The flake.
+        :type flake: pythoneda.shared.code_requests.CodeRequestNixFlake
+        :param render: The uncached rendering, taking the remaining parameters.
+        :type render: Callable
+        :param flakeFolder: The flake folder.
+        :type flakeFolder: str
+        :param templateName: The name of the template.
+        :type templateName: str
+        :param templatesFolder: The folder of the template group.
+        :type templatesFolder: str
+        :param rootTemplate: The root template.
+        :type rootTemplate: str
+        :param outputFileName: The name of the generated file.
+        :type outputFileName: str
+        """
+        flake_key = flake._template_cache_key()
+        if flake_key is None:
+            # the output depends on more than this cache can tell
+            render(
+                flakeFolder, templateName, templatesFolder, rootTemplate, outputFileName
+            )
+            return
+        key = (
+            str(templatesFolder),
+            templateName,
+            rootTemplate,
+            outputFileName,
+            flake_key,
+        )
+        signature = self._signature(str(templatesFolder))
+        output = Path(flakeFolder) / outputFileName
+        with self._lock:
+            entry = self._rendered.get(key)
+            if entry is not None and entry[0] == signature:
+                self._rendered.move_to_end(key)
+            else:
+                entry = None
+        if entry is not None:
+            output.write_bytes(entry[1])
+            os.chmod(output, entry[2])
+            return
+
+        render(
+            flakeFolder, templateName, templatesFolder, rootTemplate, outputFileName
+        )
+        entry = (signature, output.read_bytes(), stat.S_IMODE(output.stat().st_mode))
+        with self._lock:
+            self._rendered[key] = entry
+            self._rendered.move_to_end(key)
+            while len(self._rendered) > self._max_entries:
+                self._rendered.popitem(last=False)
+
+    def prewarm(self, flakes: Iterable):
+        """
+        Fills the cache by generating given flakes in a scratch folder.
+        :param flakes: Sample flakes, one per kind of flake to generate.
+        :type flakes: Iterable[pythoneda.shared.code_requests.CodeRequestNixFlake]
+        """
+        for flake in flakes:
+            with tempfile.TemporaryDirectory(prefix="template-cache-") as folder:
+                flake.generate_files(folder)
+
+    def clear(self):
+        """
+        Forgets everything cached.
+        """
+        with self._lock:
+            self._templates_folders.clear()
+            self._signatures.clear()
+            self._rendered.clear()
+
+    def _signature(self, templatesFolder: str) -> Tuple:
+        """
+        Retrieves the modification times of the files in given template group,
+        checking them at most once per interval.
+        :param templatesFolder: The folder of the template group.
+        :type templatesFolder: str
+        :return: The sorted paths, sizes and modification times.
+        :rtype: Tuple
+        """
+        now = time.monotonic()
+        with self._lock:
+            checked = self._signatures.get(templatesFolder)
+        if checked is not None and now - checked[0] < self._check_interval:
+            return checked[1]
+        files = []
+        for root, _, names in os.walk(templatesFolder):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                files.append((path, info.st_size, info.st_mtime_ns))
+        result = tuple(sorted(files))
+        with self._lock:
+            self._signatures[templatesFolder] = (now, result)
+        return result
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,338 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/notebook_converter.py
+
+This file declares the NotebookConverter class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .cell import Cell
+from .code_cell import CodeCell
+from .code_request import CodeRequest
+from .dependency import Dependency
+from .import_scanner import ImportScanner
+from .markdown_cell import MarkdownCell
+import contextlib
+import json
+import os
+from typing import Dict, Iterable, Iterator, List
+
+
+class NotebookConverter:
+    """
+    Converts code requests from and to Jupyter notebooks (.ipynb, nbformat 4).
+
+    Class name: NotebookConverter
+
+    Responsibilities:
+        - Reads the cells of a notebook incrementally, one cell at a time.
+        - Writes the cells of a code request as a notebook, one cell at a time.
+        - Attaches the output captured while running the request to its code cells.
+        - Keeps the dependencies of code cells in their notebook metadata.
+        - Infers the dependencies of code cells lacking such metadata, if told how.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CellOutput
+        - pythoneda.shared.code_requests.CodeRequest
+        - pythoneda.shared.code_requests.ImportScanner
+    """
+
+    NBFORMAT = 4
+
+    NBFORMAT_MINOR = 4
+
+    METADATA_KEY = "pythoneda"
+
+    _WHITESPACE = " \t\n\r"
+
+    def __init__(
+        self, chunkSize: int = 1 << 16, importScanner: ImportScanner = None
+    ):
+        """
+        Creates a new NotebookConverter instance.
+        :param chunkSize: The number of characters to read at once.
+        :type chunkSize: int
+        :param importScanner: The scanner inferring the dependencies of code cells without pythoneda metadata, if any.
+        :type importScanner: pythoneda.shared.code_requests.ImportScanner
+        """
+        super().__init__()
+        self._chunk_size = chunkSize
+        self._import_scanner = importScanner
+        self._decoder = json.JSONDecoder()
+
+    @property
+    def chunk_size(self) -> int:
+        """
+        Retrieves the number of characters read at once.
+        :return: Such number.
+        :rtype: int
+        """
+        return self._chunk_size
+
+    @property
+    def import_scanner(self) -> ImportScanner:
+        """
+        Retrieves the scanner inferring the dependencies of code cells without pythoneda metadata.
+        :return: Such scanner, or None.
+        :rtype: pythoneda.shared.code_requests.ImportScanner
+        """
+        return self._import_scanner
+
+    def import_notebook(self, path: str, codeRequest: CodeRequest) -> CodeRequest:
+        """
+        Appends the cells of a notebook to given code request.
+        :param path: The notebook file.
+        :type path: str
+        :param codeRequest: The code request.
+        :type codeRequest: pythoneda.shared.code_requests.CodeRequest
+        :return: The same code request.
+        :rtype: pythoneda.shared.code_requests.CodeRequest
+        """
+        with open(path, "r", encoding="utf-8") as notebook:
+            for cell in self.read_cells(notebook):
+                codeRequest.append_cell(cell)
+        return codeRequest
+
+    def read_cells(self, notebook) -> Iterator[Cell]:
+        """
+        Reads the cells of a notebook, decoding each one as soon as it is complete.
+        Pass them to MappedCellStore.write() to convert notebooks larger than memory.
+        :param notebook: The notebook, as a text file.
+        :type notebook: io.TextIOBase
+        :return: An iterator over the cells.
+        :rtype: Iterator[pythoneda.shared.code_requests.Cell]
+        """
+        for item in self._cell_dicts(notebook):
+            yield self.cell_of(item)
+
+    def cell_of(self, item: Dict) -> Cell:
+        """
+        Builds the cell for a notebook cell. Raw cells become Markdown cells.
+        :param item: The notebook cell.
+        :type item: Dict
+        :return: The cell.
+        :rtype: pythoneda.shared.code_requests.Cell
+        """
+        if not isinstance(item, dict):
+            raise ValueError(f"Not a notebook cell: {item!r}")
+        source = item.get("source", "")
+        if isinstance(source, list):
+            source = "".join(source)
+        if item.get("cell_type") == "code":
+            metadata = item.get("metadata", {}).get(self.METADATA_KEY)
+            if metadata is not None:
+                dependencies = [
+                    Dependency.from_dict(value)
+                    for value in metadata.get("dependencies", [])
+                ]
+            elif self._import_scanner is not None:
+                dependencies = self._import_scanner.dependencies_of(source)
+            else:
+                dependencies = []
+            return CodeCell(source, dependencies)
+        return MarkdownCell(source)
+
+    def _cell_dicts(self, notebook) -> Iterator[Dict]:
+        """
+        Parses the top-level notebook object, decoding the elements of its
+        "cells" array one by one and skipping any other value.
+        :param notebook: The notebook, as a text file.
+        :type notebook: io.TextIOBase
+        :return: An iterator over the notebook cells.
+        :rtype: Iterator[Dict]
+        """
+        buffer = ""
+        position = 0
+        eof = False
+
+        def read(minimum: int) -> bool:
+            nonlocal buffer, position, eof
+            if eof:
+                return False
+            chunk = notebook.read(max(self._chunk_size, minimum))
+            if not chunk:
+                eof = True
+                return False
+            buffer = buffer[position:] + chunk
+            position = 0
+            return True
+
+        def next_char() -> str:
+            nonlocal position
+            while True:
+                while position < len(buffer) and buffer[position] in self._WHITESPACE:
+                    position += 1
+                if position < len(buffer):
+                    return buffer[position]
+                if not read(0):
+                    raise ValueError("Unexpected end of notebook")
+
+        def expect(characters: str) -> str:
+            nonlocal position
+            result = next_char()
+            if result not in characters:
+                raise ValueError(f"Expected one of {characters!r} at {result!r}")
+            position += 1
+            return result
+
+        def value():
+            nonlocal position
+            next_char()
+            while True:
+                try:
+                    result, end = self._decoder.raw_decode(buffer, position)
+                    # a number could still go on in the next chunk
+                    if end < len(buffer) or not read(0):
+                        position = end
+                        return result
+                except json.JSONDecodeError:
+                    # reading as much as is pending keeps retries linear overall
+                    if not read(len(buffer) - position):
+                        raise
+
+        found = False
+        expect("{")
+        if next_char() == "}":
+            position += 1
+        else:
+            while True:
+                key = value()
+                expect(":")
+                if key == "cells":
+                    found = True
+                    expect("[")
+                    if next_char() == "]":
+                        position += 1
+                    else:
+                        while True:
+                            yield value()
+                            if expect(",]") == "]":
+                                break
+                else:
+                    value()
+                if expect(",}") == "}":
+                    break
+        if not found:
+            raise ValueError(f"Not an nbformat {self.NBFORMAT} notebook")
+
+    def export_notebook(
+        self, codeRequest: CodeRequest, path: str, outputs: Iterable = None
+    ):
+        """
+        Writes given code request as a notebook, replacing the file atomically.
+        :param codeRequest: The code request.
+        :type codeRequest: pythoneda.shared.code_requests.CodeRequest
+        :param path: The notebook file.
+        :type path: str
+        :param outputs: The output captured while running the request, with cell markers, if any.
+        :type outputs: Iterable[pythoneda.shared.code_requests.CellOutput]
+        """
+        staging = f"{path}.tmp"
+        try:
+            with open(staging, "w", encoding="utf-8") as notebook:
+                self.write_cells(codeRequest.cells, notebook, outputs)
+            os.replace(staging, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(staging)
+            raise
+
+    def write_cells(self, cells: Iterable, notebook, outputs: Iterable = None):
+        """
+        Writes given cells as a notebook, one cell at a time.
+        :param cells: The cells.
+        :type cells: Iterable[pythoneda.shared.code_requests.Cell]
+        :param notebook: The destination, as a text file.
+        :type notebook: io.TextIOBase
+        :param outputs: The output captured while running the cells, if any.
+        :type outputs: Iterable[pythoneda.shared.code_requests.CellOutput]
+        """
+        lines_per_cell = {}
+        for output in outputs or []:
+            if output.cell_index is not None:
+                lines_per_cell.setdefault(output.cell_index, []).append(output.text)
+        notebook.write('{\n "cells": [')
+        for index, cell in enumerate(cells):
+            if index > 0:
+                notebook.write(",")
+            notebook.write("\n  ")
+            item = self.item_of(cell, lines_per_cell.pop(index, []))
+            notebook.write(json.dumps(item, ensure_ascii=False, sort_keys=True))
+        notebook.write("\n ],\n")
+        notebook.write(
+            ' "metadata": {"kernelspec": {"display_name": "Python 3", '
+            '"language": "python", "name": "python3"}, '
+            '"language_info": {"name": "python"}},\n'
+        )
+        notebook.write(
+            f' "nbformat": {self.NBFORMAT},\n'
+            f' "nbformat_minor": {self.NBFORMAT_MINOR}\n}}\n'
+        )
+
+    def item_of(self, cell: Cell, lines: List[str]) -> Dict:
+        """
+        Builds the notebook cell for given cell.
+        :param cell: The cell.
+        :type cell: pythoneda.shared.code_requests.Cell
+        :param lines: The lines it printed when run, if any.
+        :type lines: List[str]
+        :return: The notebook cell.
+        :rtype: Dict
+        """
+        source = cell.contents.splitlines(keepends=True)
+        if not isinstance(cell, CodeCell):
+            return {"cell_type": "markdown", "metadata": {}, "source": source}
+        outputs = []
+        text = [f"{line}\n" for line in self._printed_by_code(cell, lines)]
+        if text:
+            outputs.append({"output_type": "stream", "name": "stdout", "text": text})
+        return {
+            "cell_type": "code",
+            "execution_count": None,
+            "metadata": {
+                self.METADATA_KEY: {
+                    "dependencies": [aux.to_dict() for aux in cell.dependencies]
+                }
+            },
+            "outputs": outputs,
+            "source": source,
+        }
+
+    def _printed_by_code(self, cell: CodeCell, lines: List[str]) -> List[str]:
+        """
+        Removes the listing the generated code prints before running a code cell.
+        :param cell: The code cell.
+        :type cell: pythoneda.shared.code_requests.CodeCell
+        :param lines: The lines it printed.
+        :type lines: List[str]
+        :return: The lines printed by the code itself.
+        :rtype: List[str]
+        """
+        if not lines or lines[0] != "```":
+            return lines
+        # the opening and closing fences, and each non-blank line in between
+        listing = 2 + sum(1 for line in cell.iter_lines() if line.rstrip())
+        return lines[listing:]
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -35,6 +35,8 @@ class PythonedaDependency(Dependency):
         - None
     """
 
+    _DIGEST_KIND = "pythoneda"
+
     def __init__(self, name: str, version: str, url: str = None):
         """
         Creates a new PythonedaDependency instance.
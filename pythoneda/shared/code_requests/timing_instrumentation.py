@@ -0,0 +1,149 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/code_requests/timing_instrumentation.py
+
+This file declares the TimingInstrumentation class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .instrumentation import Instrumentation
+import contextlib
+import contextvars
+import json
+import threading
+import time
+from typing import Callable, Dict
+
+
+class TimingInstrumentation(Instrumentation):
+    """
+    Instrumentation timing each step, and exporting the breakdown of each outermost one.
+
+    Class name: TimingInstrumentation
+
+    Responsibilities:
+        - Times nested spans, per thread and per asyncio task.
+        - Exports each completed tree of spans to a JSON lines file, a callback, or both.
+        - Sums the time of each step within a tree.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.Instrumentation
+    """
+
+    def __init__(self, exportFile: str = None, callback: Callable = None):
+        """
+        Creates a new TimingInstrumentation instance.
+        :param exportFile: The file to append each tree of spans to, as a JSON line, if any.
+        :type exportFile: str
+        :param callback: The function receiving each tree of spans, if any.
+        :type callback: Callable[[Dict], None]
+        """
+        super().__init__()
+        self._export_file = exportFile
+        self._callback = callback
+        self._lock = threading.Lock()
+        self._open_span = contextvars.ContextVar("open_span", default=None)
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Checks whether this instrumentation records anything.
+        :return: True.
+        :rtype: bool
+        """
+        return True
+
+    @property
+    def export_file(self) -> str:
+        """
+        Retrieves the file the trees of spans get appended to.
+        :return: Such file, or None.
+        :rtype: str
+        """
+        return self._export_file
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Times a step.
+        :param name: The name of the step.
+        :type name: str
+        :param attributes: Details about the step.
+        :type attributes: Dict
+        :return: The span, with its name, attributes, start, duration and children.
+        :rtype: Dict
+        """
+        parent = self._open_span.get()
+        record = {
+            "name": name,
+            "attributes": attributes,
+            "start": time.time(),
+            "duration": None,
+            "children": [],
+        }
+        token = self._open_span.set(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["duration"] = time.perf_counter() - started
+            self._open_span.reset(token)
+            if parent is None:
+                self.export(record)
+            else:
+                parent["children"].append(record)
+
+    def export(self, record: Dict):
+        """
+        Exports a completed tree of spans.
+        :param record: The outermost span.
+        :type record: Dict
+        """
+        if self._callback is not None:
+            self._callback(record)
+        if self._export_file is not None:
+            line = json.dumps(record, default=str) + "\n"
+            with self._lock:
+                with open(self._export_file, "a") as export_file:
+                    export_file.write(line)
+
+    @classmethod
+    def totals(cls, record: Dict) -> Dict[str, float]:
+        """
+        Sums the time spent in each step of a tree of spans.
+        :param record: The outermost span.
+        :type record: Dict
+        :return: The seconds per step name.
+        :rtype: Dict[str, float]
+        """
+        result = {}
+        pending = [record]
+        while pending:
+            current = pending.pop()
+            name = current["name"]
+            result[name] = result.get(name, 0) + current["duration"]
+            pending.extend(current["children"])
+        return result
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
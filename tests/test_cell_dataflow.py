@@ -0,0 +1,107 @@
+# vim: set fileencoding=utf-8
+"""
+tests/test_cell_dataflow.py
+
+This file tests the CellDataflow class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from pythoneda.shared.code_requests import CellDataflow, CodeCell
+
+
+def dependencies(*codes):
+    """
+    Finds the dependencies among code cells with given contents.
+    :param codes: The contents of each cell.
+    :type codes: List[str]
+    :return: The positions of the cells each cell must run after.
+    :rtype: Dict[int, List[int]]
+    """
+    return CellDataflow.dependencies([CodeCell(code, []) for code in codes])
+
+
+def test_independent_cells():
+    assert dependencies("a = 1", "b = 2", "c = a + 1", "d = b + 1") == {
+        0: [],
+        1: [],
+        2: [0],
+        3: [1],
+    }
+
+
+def test_function_reading_data_defined_later():
+    assert dependencies("def f(): return data", "data = [1, 2]", "print(f())") == {
+        0: [],
+        1: [],
+        2: [0, 1],
+    }
+
+
+def test_module_state():
+    assert dependencies("import sys", "sys.path.append('x')", "import mymod")[2] == [
+        1
+    ]
+    assert dependencies(
+        "import random", "random.seed(0)", "print(random.random())"
+    )[2] == [0, 1]
+    assert dependencies("import os", "os.chdir('/tmp')", "open('f')")[2] == [1]
+
+
+def test_file_writer_before_reader():
+    assert dependencies(
+        'with open("x.txt", "w") as f: f.write("a")',
+        'print(open("x.txt").read())',
+    ) == {0: [], 1: [0]}
+
+
+def test_function_writing_files():
+    assert dependencies(
+        'def save(path):\n    open(path, "w").write("x")',
+        'save("x.txt")',
+        'print(open("x.txt").read())',
+    ) == {0: [], 1: [0], 2: [1]}
+
+
+def test_process_free_builtins():
+    assert dependencies(
+        "x = list(range(3))", "y = sorted([3, 1])", "z = sum([1, 2])"
+    ) == {0: [], 1: [], 2: []}
+
+
+def test_writes_through_aliases():
+    assert dependencies("a = []", "b = a", "b.append(1)", "print(a)") == {
+        0: [],
+        1: [0],
+        2: [0, 1],
+        3: [2],
+    }
+    assert dependencies("a = {}", "b = [a]", "b[0]['k'] = 1", "print(a)")[3] == [2]
+
+
+def test_rebinding_drops_aliases():
+    assert dependencies("a = []", "b = a", "b = []", "b.append(1)", "print(a)")[
+        4
+    ] == [0]
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,152 @@
+# vim: set fileencoding=utf-8
+"""
+tests/test_code_execution_memo.py
+
+This file tests the memoization of code cells.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import os
+from pythoneda.shared.code_requests import (
+    CodeExecutionMemo,
+    CodeExecutionNixFlake,
+    CodeRequest,
+    CodeRequestNixFlakeSpec,
+)
+import subprocess
+import sys
+
+
+class NotebookRequest(CodeRequest):
+    """
+    A code request to memoize.
+
+    Class name: NotebookRequest
+
+    Responsibilities:
+        - Provides the minimal concrete CodeRequest the tests need.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeRequest
+    """
+
+    @property
+    def nix_flake_spec(self):
+        """
+        Retrieves the specification for the Nix flake.
+        :return: Such specification.
+        :rtype: pythoneda.shared.code_requests.CodeRequestNixFlakeSpec
+        """
+        return CodeRequestNixFlakeSpec(self, "notebook")
+
+    def write(self, file):
+        """
+        Writes the code request to a file.
+        :param file: The file to write.
+        :type file: File
+        """
+        pass
+
+
+def memoized(tmp_path, *codes):
+    """
+    Generates the memoizing code for code cells with given contents.
+    :param tmp_path: The folder to generate the code in.
+    :type tmp_path: pathlib.Path
+    :param codes: The contents of each cell.
+    :type codes: List[str]
+    :return: The flake, and the environment to run its code with.
+    :rtype: Tuple[pythoneda.shared.code_requests.CodeExecutionNixFlake, Dict]
+    """
+    request = NotebookRequest()
+    for code in codes:
+        request.append_code(code, [])
+    flake = CodeExecutionNixFlake(request, [], memoizeCells=True)
+    flake.generate_code(str(tmp_path))
+    env = dict(os.environ)
+    env[CodeExecutionMemo.FOLDER_VARIABLE] = str(tmp_path / "memo")
+    return flake, env
+
+
+def run(tmp_path, env: dict, seed: int = 0) -> str:
+    """
+    Runs the generated code.
+    :param tmp_path: The folder with the generated code.
+    :type tmp_path: pathlib.Path
+    :param env: The environment.
+    :type env: Dict
+    :param seed: The hash seed of the process.
+    :type seed: int
+    :return: What it printed.
+    :rtype: str
+    """
+    env = dict(env, PYTHONHASHSEED=str(seed), PYTHONPATH=os.pathsep.join(sys.path))
+    return subprocess.run(
+        [sys.executable, "code_request.py"],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+
+def test_file_writing_cells_are_not_memoized(tmp_path):
+    flake, _ = memoized(
+        tmp_path,
+        'with open("x.txt", "w") as f: f.write("a")',
+        'def save(path):\n    open(path, "w").write("b")',
+        'save("y.txt")',
+        "z = 1",
+    )
+    memos = flake.cell_memos()
+    assert memos[0][2] is None
+    assert memos[2][2] is None
+    assert memos[3][2] is not None
+
+
+def test_file_writing_cells_run_every_time(tmp_path):
+    _, env = memoized(
+        tmp_path,
+        'def save(path):\n    open(path, "w").write("b")',
+        'save("y.txt")',
+    )
+    run(tmp_path, env)
+    (tmp_path / "y.txt").unlink()
+    run(tmp_path, env)
+    assert (tmp_path / "y.txt").read_text() == "b"
+
+
+def test_sets_hit_across_processes(tmp_path):
+    _, env = memoized(
+        tmp_path,
+        'names = {"alpha", "beta", "gamma", "delta"}',
+        "print(sorted(names))",
+    )
+    run(tmp_path, env, 1)
+    stored = sorted(os.listdir(tmp_path / "memo"))
+    run(tmp_path, env, 2)
+    assert sorted(os.listdir(tmp_path / "memo")) == stored
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
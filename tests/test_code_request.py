@@ -0,0 +1,109 @@
+# vim: set fileencoding=utf-8
+"""
+tests/test_code_request.py
+
+This file tests the CodeRequest class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from pythoneda.shared.code_requests import (
+    CodeExecutionRequest,
+    CodeRequest,
+    CodeRequestNixFlakeSpec,
+    Dependency,
+    ImportScanner,
+    LazyCellList,
+)
+
+
+class NotebookRequest(CodeRequest):
+    """
+    A code request to marshal.
+
+    Class name: NotebookRequest
+
+    Responsibilities:
+        - Provides the minimal concrete CodeRequest the tests need.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeRequest
+    """
+
+    @property
+    def nix_flake_spec(self):
+        """
+        Retrieves the specification for the Nix flake.
+        :return: Such specification.
+        :rtype: pythoneda.shared.code_requests.CodeRequestNixFlakeSpec
+        """
+        return CodeRequestNixFlakeSpec(self, "notebook")
+
+    def write(self, file):
+        """
+        Writes the code request to a file.
+        :param file: The file to write.
+        :type file: File
+        """
+        pass
+
+
+def notebook() -> NotebookRequest:
+    """
+    Builds a code request with a few cells.
+    :return: The request.
+    :rtype: NotebookRequest
+    """
+    result = NotebookRequest()
+    result.append_markdown("# Title")
+    result.append_code("import numpy", [Dependency("numpy", "1.26", "u")])
+    return result
+
+
+def test_lazy_cells_are_opted_in_per_call():
+    request = notebook()
+    lazy = NotebookRequest.from_dict(request.to_dict(), lazyCells=True)
+    eager = NotebookRequest.from_dict(request.to_dict())
+    assert isinstance(lazy.cells, LazyCellList)
+    assert not isinstance(eager.cells, LazyCellList)
+    assert lazy.digest() == eager.digest() == request.digest()
+
+
+def test_lazy_cells_of_execution_requests():
+    request = CodeExecutionRequest(notebook())
+    lazy = CodeExecutionRequest.from_dict(request.to_dict(), lazyCells=True)
+    eager = CodeExecutionRequest.from_dict(request.to_dict())
+    assert isinstance(lazy.code_request.cells, LazyCellList)
+    assert not isinstance(eager.code_request.cells, LazyCellList)
+
+
+def test_import_scanner_is_opted_in_per_call():
+    numpy = Dependency("numpy", "1.26", "u")
+    scanner = ImportScanner({"numpy": numpy})
+    request = NotebookRequest()
+    request.append_code("import numpy", importScanner=scanner)
+    request.append_code("import numpy")
+    assert request.cells[0].dependencies == [numpy]
+    assert request.cells[1].dependencies == []
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
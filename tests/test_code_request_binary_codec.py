@@ -0,0 +1,115 @@
+# vim: set fileencoding=utf-8
+"""
+tests/test_code_request_binary_codec.py
+
+This file tests the CodeRequestBinaryCodec class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-code-requests/shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from pythoneda.shared.code_requests import (
+    CodeCell,
+    CodeRequest,
+    CodeRequestBinaryCodec,
+    CodeRequestNixFlakeSpec,
+)
+import pytest
+import sys
+
+
+class NotebookRequest(CodeRequest):
+    """
+    A code request to encode.
+
+    Class name: NotebookRequest
+
+    Responsibilities:
+        - Provides the minimal concrete CodeRequest the tests need.
+
+    Collaborators:
+        - pythoneda.shared.code_requests.CodeRequest
+    """
+
+    @property
+    def nix_flake_spec(self):
+        """
+        Retrieves the specification for the Nix flake.
+        :return: Such specification.
+        :rtype: pythoneda.shared.code_requests.CodeRequestNixFlakeSpec
+        """
+        return CodeRequestNixFlakeSpec(self, "notebook")
+
+    def write(self, file):
+        """
+        Writes the code request to a file.
+        :param file: The file to write.
+        :type file: File
+        """
+        pass
+
+
+def payload(className: str) -> bytes:
+    """
+    Builds a payload whose root object is of given class.
+    :param className: The class name, as module:qualname.
+    :type className: str
+    :return: The encoded bytes.
+    :rtype: bytes
+    """
+    return (
+        CodeRequestBinaryCodec.MAGIC
+        + bytes([CodeRequestBinaryCodec.SCHEMA_VERSION])
+        + CodeRequestBinaryCodec._pack(
+            [[className], [CodeRequestBinaryCodec._CELL, 0, "x"]]
+        )
+    )
+
+
+def test_registered_classes_round_trip():
+    CodeRequestBinaryCodec.register(NotebookRequest)
+    request = NotebookRequest()
+    request.append_code("print(1)", [])
+    decoded = CodeRequestBinaryCodec.decode(CodeRequestBinaryCodec.encode(request))
+    assert isinstance(decoded, NotebookRequest)
+    assert isinstance(decoded.cells[0], CodeCell)
+    assert decoded.cells[0].contents == "print(1)"
+
+
+def test_foreign_modules_are_not_imported():
+    sys.modules.pop("this", None)
+    with pytest.raises(ValueError):
+        CodeRequestBinaryCodec.decode(payload("this:Zen"))
+    assert "this" not in sys.modules
+
+
+def test_other_package_classes_are_rejected():
+    with pytest.raises(ValueError):
+        CodeRequestBinaryCodec.decode(
+            payload("pythoneda.shared.code_requests.binary_packer:BinaryPacker")
+        )
+    with pytest.raises(ValueError):
+        CodeRequestBinaryCodec.decode(
+            payload("pythoneda.shared.code_requests.missing:Cell")
+        )
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End: